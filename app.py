@@ -1,5 +1,5 @@
 from flask import Flask, current_app
-from pymongo import MongoClient
+from utils.mongo import ProcessLocalDatabase
 from config import config
 import os
 
@@ -11,18 +11,54 @@ class DBProxy:
         except (AttributeError, RuntimeError):
             raise RuntimeError("Working outside of application context or database not initialized.")
 
+    def __getitem__(self, name):
+        return self.__getattr__(name)
+
 db = DBProxy()
 
-def create_app(config_name='default'):
-    """Create Flask application"""
+# Heavy dependencies the views import on first use, so a worker boots
+# without them. A gunicorn master imports them up front (see
+# gunicorn.conf.py) and forked workers share the loaded modules
+# copy-on-write. google.generativeai is left out: gRPC must not be
+# initialized before fork.
+LAZY_MODULES = ('numpy', 'PyPDF2', 'docx', 'markdown', 'openpyxl',
+                'utils.pdf_exporter', 'utils.exam_variants', 'utils.report_cards')
+
+def preload_modules():
+    """Import LAZY_MODULES now"""
+    import importlib
+    for name in LAZY_MODULES:
+        importlib.import_module(name)
+
+def create_app(config_name=None):
+    """Create Flask application; the config defaults to FLASK_ENV (development)"""
     app = Flask(__name__)
     
     # Load configuration
-    app.config.from_object(config[config_name])
+    app.config.from_object(config[config_name or os.getenv('FLASK_ENV') or 'default'])
+    
+    # Behind nginx, take the client address from X-Forwarded-For (login throttling is per IP)
+    if app.config.get('TRUSTED_PROXIES'):
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        proxies = app.config['TRUSTED_PROXIES']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
+    
+    # Request instrumentation; the MongoDB listeners must be passed to the client
+    listeners = []
+    if app.config.get('QUERY_STATS_ENABLED'):
+        from utils.query_stats import QueryListener, init_query_stats
+        listeners.append(QueryListener())
+        init_query_stats(app)
+    if app.config.get('METRICS_ENABLED'):
+        from utils.metrics import PoolListener, init_metrics
+        listeners.append(PoolListener())
+        init_metrics(app)
+    from utils.profiler import init_profiler
+    init_profiler(app)
     
-    # Initialize MongoDB and attach to app
-    mongo_client = MongoClient(app.config['MONGO_URI'])
-    app.db = mongo_client.get_database()
+    # MongoDB: one client per process, created on first use (fork-safe)
+    app.db = ProcessLocalDatabase(app.config['MONGO_URI'], event_listeners=listeners,
+                                  maxPoolSize=app.config.get('MONGO_MAX_POOL_SIZE', 100))
     
     # Ensure upload folder exists
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
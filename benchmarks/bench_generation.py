@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Offline load test of AI question generation using the fake LLM provider.
+
+Usage:
+    python benchmarks/bench_generation.py --requests 20 --concurrency 4 --latency 0.5
+    python benchmarks/bench_generation.py --mongo-uri mongodb://localhost:27017/bench_cache  # with response cache
+
+Measures end-to-end time and questions/second of
+GeminiAI.generate_mixed_difficulty_questions for several pool sizes, and
+the effect of the response cache when a MongoDB URI is given.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.gemini_service as gemini_service
+from utils.gemini_service import GeminiAI
+from utils.llm_providers import FakeProvider
+
+DOCUMENT = '\n\n'.join(
+    f"Chương {i}. Nội dung bài học số {i} về hàm số, đạo hàm và tích phân. " * 20 for i in range(40)
+)
+
+def run(provider, workers, requests, concurrency, cache=None, fresh=False):
+    """Run `requests` generations, `concurrency` at a time; returns (seconds, questions)"""
+    # Each configuration gets its own pool size
+    gemini_service._executor = None
+    gemini = GeminiAI(None, max_workers=workers, provider=provider, cache=cache)
+
+    def one(i):
+        return len(gemini.generate_mixed_difficulty_questions(DOCUMENT, 3, 5, 2, fresh=fresh))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        total = sum(pool.map(one, range(requests)))
+    return time.perf_counter() - start, total
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark AI question generation offline')
+    parser.add_argument('--requests', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=2, help='simultaneous generate requests')
+    parser.add_argument('--latency', type=float, default=0.5, help='fake model seconds per call')
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='GEMINI_MAX_WORKERS values')
+    parser.add_argument('--mongo-uri', default='', help='enable the response cache on this database')
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'seconds':>9} {'questions':>10} {'q/s':>8} {'calls':>6}")
+    for workers in args.workers:
+        provider = FakeProvider(latency=args.latency, failure_rate=args.failure_rate)
+        seconds, questions = run(provider, workers, args.requests, args.concurrency, fresh=True)
+        print(f"{workers:>8} {seconds:>9.2f} {questions:>10} {questions / seconds:>8.1f} {provider.calls:>6}")
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        from utils.ai_cache import ResponseCache
+
+        cache = ResponseCache(MongoClient(args.mongo_uri).get_database(), collection='bench_ai_cache')
+        cache.clear()
+        for label, fresh in (('cold', True), ('warm', False)):
+            provider = FakeProvider(latency=args.latency)
+            seconds, questions = run(provider, max(args.workers), args.requests, args.concurrency, cache, fresh)
+            print(f"cache {label}: {seconds:.2f}s, {questions} questions, {provider.calls} model calls")
+        cache.clear()
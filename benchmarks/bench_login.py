@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Login storm benchmark: latency of logins arriving at a fixed rate.
+
+Usage:
+    python benchmarks/bench_login.py --rate 500 --logins 500 --threads 8
+    python benchmarks/bench_login.py --methods scrypt pbkdf2:sha256:100000
+    python benchmarks/bench_login.py --mongo-uri mongodb://localhost:27017/bench_login  # full login view
+
+Logins arrive open-loop at --rate per minute (as when a class starts an
+exam) and are served by --threads request threads, like one gthread
+worker. Latency is measured from arrival, so time spent queueing counts.
+Without --mongo-uri only password verification is timed; with it each
+login is a POST to /auth/login against throwaway users. Reports p50, p95,
+p99 and how many logins were answered "busy" (503) by the hashing pool.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.passwords as passwords
+
+PASSWORD = 'bench-password'
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def make_users(db, count, method):
+    """Create count throwaway users hashed with method; returns their usernames"""
+    db.users.delete_many({'username': {'$regex': '^bench_'}})
+    db.login_throttle.delete_many({})
+    hashed = passwords.generate_password_hash(PASSWORD, method)  # same hash for all: setup cost only
+    usernames = [f'bench_{i}' for i in range(count)]
+    db.users.insert_many([{'username': name, 'email': f'{name}@bench.local', 'password': hashed,
+                           'role': 'student', 'full_name': name} for name in usernames])
+    return usernames
+
+def run(app, method, logins, rate, threads, use_db):
+    """Replay logins arriving at rate per minute; returns (latencies, busy)"""
+    app.config['PASSWORD_HASH_METHOD'] = method
+    # A fresh hashing pool per configuration
+    passwords._executor = None
+
+    usernames = make_users(app.db, logins, method) if use_db else None
+    stored = passwords.generate_password_hash(PASSWORD, method)
+    client = app.test_client()
+
+    def one(i, arrival):
+        busy = False
+        if use_db:
+            response = client.post('/auth/login', data={'username': usernames[i], 'password': PASSWORD})
+            busy = response.status_code == 503
+        else:
+            with app.app_context():
+                try:
+                    passwords.verify_password(stored, PASSWORD)
+                except passwords.PasswordHasherBusy:
+                    busy = True
+        return time.perf_counter() - arrival, busy
+
+    interval = 60.0 / rate
+    start = time.perf_counter()
+    futures = []
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for i in range(logins):
+            arrival = start + i * interval
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(one, i, arrival))
+        results = [future.result() for future in futures]
+    if use_db:
+        app.db.users.delete_many({'username': {'$regex': '^bench_'}})
+    return [latency for latency, _ in results], sum(busy for _, busy in results)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark login latency under a login storm')
+    parser.add_argument('--logins', type=int, default=500)
+    parser.add_argument('--rate', type=float, default=500, help='logins per minute')
+    parser.add_argument('--threads', type=int, default=8, help='request threads of the worker')
+    parser.add_argument('--methods', nargs='+', default=['scrypt', 'scrypt:16384:8:1', 'pbkdf2:sha256:100000'])
+    parser.add_argument('--hash-workers', type=int, default=0, help='PASSWORD_HASH_WORKERS (default: CPUs)')
+    parser.add_argument('--queue', type=int, default=32, help='PASSWORD_HASH_QUEUE')
+    parser.add_argument('--mongo-uri', default='', help='run the full login view on this database')
+    args = parser.parse_args()
+
+    if args.mongo_uri:
+        os.environ['MONGO_URI'] = args.mongo_uri
+    from app import create_app  # after MONGO_URI is set: config reads it on import
+    app = create_app('default')
+    app.config.update(PASSWORD_HASH_WORKERS=args.hash_workers or None, PASSWORD_HASH_QUEUE=args.queue,
+                      LOGIN_MAX_FAILURES_PER_IP=10 ** 9)
+
+    print(f"{args.logins} logins at {args.rate:.0f}/min, {args.threads} request threads, "
+          f"{'login view' if args.mongo_uri else 'hash only'}")
+    print(f"{'method':<24} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'busy':>5}")
+    for method in args.methods:
+        latencies, busy = run(app, method, args.logins, args.rate, args.threads, bool(args.mongo_uri))
+        p50, p95, p99 = (percentile(latencies, p) * 1000 for p in (50, 95, 99))
+        print(f"{method:<24} {p50:>8.0f} {p95:>8.0f} {p99:>8.0f} {max(latencies) * 1000:>8.0f} {busy:>5}")
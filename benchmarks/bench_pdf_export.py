@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark PDF export setup cost.
+
+Usage:
+    python benchmarks/bench_pdf_export.py --questions 50 --repeat 10
+
+Reports the one-time warm-up (font registration, styles, first render) and
+the time of repeated exports with the shared exporter.
+"""
+
+from io import BytesIO
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.pdf_exporter import get_exporter, warm_up
+
+def sample(num_questions):
+    exam = {'title': 'Đề kiểm tra mẫu', 'duration': 45, 'description': 'Bài kiểm tra benchmark'}
+    questions = [{
+        'question_text': f'Câu hỏi số {i + 1}: đạo hàm của hàm số y = x^{i + 2} là gì?',
+        'question_type': 'multiple_choice',
+        'options': [f'A. {i + 2}x^{i + 1}', f'B. x^{i + 1}', f'C. {i + 2}x', 'D. 0'],
+        'correct_answer': 'A',
+        'points': 1,
+        'explanation': 'Áp dụng công thức đạo hàm của lũy thừa.'
+    } for i in range(num_questions)]
+    return exam, questions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark PDF export')
+    parser.add_argument('--questions', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"warm-up: {warm_up() * 1000:.1f} ms")
+
+    exam, questions = sample(args.questions)
+    exporter = get_exporter()
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        exporter.export_exam(exam, questions, BytesIO())
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"export ({args.questions} questions): median {timings[len(timings) // 2] * 1000:.1f} ms, "
+          f"min {timings[0] * 1000:.1f} ms, max {timings[-1] * 1000:.1f} ms")
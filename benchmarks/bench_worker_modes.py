@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare gunicorn worker modes under the exam-day load test.
+
+Usage:
+    python benchmarks/bench_worker_modes.py --mongo-uri mongodb://localhost:27017/trac_nghiem_load
+    python benchmarks/bench_worker_modes.py --modes sync gthread --workers 2 --threads 8 --llm-latency 2
+
+For every mode a gunicorn server is started with gunicorn.conf.py and the
+fake model (FAKE_LLM_LATENCY seconds per call, like a slow Gemini
+response), benchmarks/load_test.py runs against it over HTTP, and the
+server is stopped. The table compares p50/p95/p99 of each endpoint per
+mode: with sync workers a teacher's generate_explanation holds a whole
+worker, so students queue behind it; gthread and gevent keep serving.
+The gevent mode is skipped unless gevent is installed.
+"""
+
+from urllib.parse import urlparse
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def mode_env(mode, workers, threads, connections):
+    """GUNICORN_* settings of a worker mode"""
+    env = {'GUNICORN_WORKERS': str(workers), 'GUNICORN_THREADS': '1'}
+    if mode == 'sync':
+        env['GUNICORN_WORKER_CLASS'] = 'sync'
+    elif mode == 'gthread':
+        env.update(GUNICORN_WORKER_CLASS='gthread', GUNICORN_THREADS=str(threads))
+    elif mode == 'gevent':
+        env.update(GUNICORN_WORKER_CLASS='gevent', GUNICORN_WORKER_CONNECTIONS=str(connections))
+    return env
+
+def wait_for_port(port, server, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def run_mode(mode, args, load_args):
+    """Start gunicorn in a mode, run the load test against it; returns the load test report"""
+    env = dict(os.environ, MONGO_URI=args.mongo_uri, LLM_PROVIDER='fake', FAKE_LLM_LATENCY=str(args.llm_latency),
+               GEMINI_API_KEY='load-test', SESSION_COOKIE_SECURE='false', LOGIN_MAX_FAILURES_PER_IP=str(10 ** 9),
+               GUNICORN_BIND=f'127.0.0.1:{args.port}', **mode_env(mode, args.workers, args.threads, args.connections))
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', "app:create_app('production')",
+                               '--access-logfile', '/dev/null', '--log-level', 'warning'],
+                              cwd=ROOT, env=env)
+    try:
+        if not wait_for_port(args.port, server):
+            print(f"{mode}: gunicorn did not start")
+            return None
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as output:
+            report_path = output.name
+        subprocess.run([sys.executable, os.path.join(ROOT, 'benchmarks', 'load_test.py'),
+                        '--mongo-uri', args.mongo_uri, '--base-url', f'http://127.0.0.1:{args.port}',
+                        '--json', report_path] + load_args, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        with open(report_path, encoding='utf-8') as report:
+            return json.load(report)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare gunicorn worker modes')
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/trac_nghiem_load')
+    parser.add_argument('--modes', nargs='+', default=['sync', 'gthread', 'gevent'],
+                        choices=['sync', 'gthread', 'gevent'])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='threads per gthread worker')
+    parser.add_argument('--connections', type=int, default=1000, help='greenlets per gevent worker')
+    parser.add_argument('--llm-latency', type=float, default=2, help='fake model seconds per call')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--json', default='', help='save all reports to this file')
+    args, load_args = parser.parse_known_args()  # the rest goes to load_test.py (--students, --teachers, ...)
+
+    database = urlparse(args.mongo_uri).path.strip('/')
+    if not any(word in database for word in ('load', 'bench', 'test')):
+        sys.exit(f"Refusing to empty database '{database}': use a name containing load, bench or test")
+
+    reports = {}
+    for mode in args.modes:
+        if mode == 'gevent':
+            try:
+                import gevent  # noqa: F401
+            except ImportError:
+                print("gevent: skipped (pip install gevent)")
+                continue
+        print(f"{mode}: running...")
+        report = run_mode(mode, args, load_args)
+        if report:
+            reports[mode] = report
+            print(f"{mode}: {report['requests']} requests in {report['elapsed']}s, {report['errors']} errors")
+
+    endpoints = sorted({row['endpoint'] for report in reports.values() for row in report['endpoints']})
+    print(f"\n{'endpoint':<34} {'mode':<8} {'reqs':>6} {'errs':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint in endpoints:
+        for mode, report in reports.items():
+            for row in report['endpoints']:
+                if row['endpoint'] == endpoint:
+                    print(f"{endpoint:<34} {mode:<8} {row['requests']:>6} {row['errors']:>5} "
+                          f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as output:
+            json.dump({'args': vars(args), 'load_args': load_args, 'modes': reports}, output, indent=2)
+        print(f"\nSaved {args.json}")
@@ -0,0 +1,76 @@
+"""Fixtures of the microbenchmarks: documents and exams of varied sizes"""
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PARAGRAPH = ('Hàm số y = f(x) liên tục trên đoạn [a; b] thì tồn tại giá trị lớn nhất và nhỏ nhất. '
+             'Đạo hàm của hàm hợp được tính theo quy tắc chuỗi: (f(g(x)))\' = f\'(g(x))·g\'(x). ')
+
+# Document sizes in pages (PDF), paragraphs (DOCX) or sections (Markdown)
+DOCUMENT_SIZES = {'small': 2, 'medium': 20, 'large': 100}
+
+def make_questions(count, seed=0):
+    """Exam questions like the ones the app stores: 4 of 5 multiple choice, the rest true/false"""
+    from bson.objectid import ObjectId
+
+    rng = random.Random(seed)
+    questions = []
+    for i in range(count):
+        question = {
+            '_id': ObjectId(),
+            'question_text': f'Câu {i + 1}: tích phân của x^{i % 9 + 1} trên đoạn [0; 1] bằng bao nhiêu? ' * (1 + i % 3),
+            'points': 1,
+            'difficulty': rng.choice(['easy', 'medium', 'hard']),
+            'explanation': 'Áp dụng công thức nguyên hàm của lũy thừa rồi thay cận.'
+        }
+        if i % 5 == 4:
+            question.update(question_type='true_false', options=[], correct_answer=rng.choice(['Đúng', 'Sai']))
+        else:
+            question.update(question_type='multiple_choice', correct_answer=rng.choice('ABCD'),
+                            options=[f'A. 1/{i + 2}', f'B. 1/{i + 1}', f'C. {i + 2}', 'D. 0'])
+        questions.append(question)
+    return questions
+
+@pytest.fixture(scope='session')
+def exam():
+    return {'title': 'Kiểm tra Toán học - Lớp 12', 'description': 'Đề kiểm tra benchmark', 'duration': 45,
+            'total_points': 10, 'passing_score': 50, 'exam_type': 'test'}
+
+@pytest.fixture(scope='session')
+def documents(tmp_path_factory):
+    """{size: {'pdf': path, 'docx': path, 'md': text}} for every DOCUMENT_SIZES entry"""
+    from docx import Document as DocxDocument
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    directory = tmp_path_factory.mktemp('documents')
+    documents = {}
+    for size, count in DOCUMENT_SIZES.items():
+        pdf_path = str(directory / f'{size}.pdf')
+        pdf = canvas.Canvas(pdf_path, pagesize=A4)
+        for page in range(count):
+            text = pdf.beginText(40, 800)
+            for line in range(50):
+                text.textLine(f'Trang {page + 1}, dòng {line + 1}: ham so lien tuc, dao ham va tich phan xac dinh.')
+            pdf.drawText(text)
+            pdf.showPage()
+        pdf.save()
+
+        docx_path = str(directory / f'{size}.docx')
+        document = DocxDocument()
+        for paragraph in range(count * 10):
+            document.add_paragraph(f'{paragraph + 1}. {PARAGRAPH * 3}')
+        document.save(docx_path)
+
+        markdown_text = '\n\n'.join(
+            f'## Mục {section + 1}\n\n{PARAGRAPH * 2}\n\n- Ý thứ nhất\n- Ý thứ hai\n\n'
+            f'| x | f(x) |\n|---|------|\n| 0 | 1 |\n| 1 | 2 |\n\n```\ny = x^2\n```'
+            for section in range(count * 5)
+        )
+        documents[size] = {'pdf': pdf_path, 'docx': docx_path, 'md': markdown_text}
+    return documents
@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Exam-day load test: scripted student and teacher flows against the real app.
+
+Usage:
+    # In process (Flask test client), on a throwaway database:
+    python benchmarks/load_test.py --mongo-uri mongodb://localhost:27017/trac_nghiem_load --students 200
+
+    # Against a running server (start it with LLM_PROVIDER=fake on the same database):
+    LLM_PROVIDER=fake SESSION_COOKIE_SECURE=false MONGO_URI=mongodb://localhost:27017/trac_nghiem_load gunicorn -c gunicorn.conf.py "app:create_app('production')"
+    python benchmarks/load_test.py --mongo-uri mongodb://localhost:27017/trac_nghiem_load --base-url http://localhost:8000
+
+The database is emptied and seeded with teachers, students, public exams
+and documents (its name must contain "load", "bench" or "test"). Every
+student then logs in, opens and starts an exam, takes it, submits random
+answers after --think seconds and views the result; --concurrency
+students run at once, starting over --ramp seconds. Meanwhile each teacher
+repeats view_exam, export_pdf (cached and one-off shuffles), a
+generate_explanation answered within the request and generate_questions
+against the fake model, polling the job until it ends.
+
+Reports requests, errors, throughput and p50/p95/p99 per endpoint; --json
+saves the numbers so runs before and after a change can be compared.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from urllib.parse import urlencode, urlparse
+import urllib.request
+import urllib.error
+import argparse
+import random
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = 'load-test-password'
+DOCUMENT = '\n\n'.join(
+    f"Bài {i}. Hàm số y = x^{i} có đạo hàm y' = {i}x^{i - 1}; tích phân của nó là x^{i + 1}/{i + 1}. " * 10
+    for i in range(2, 30)
+)
+
+class Recorder:
+    """Latencies and errors per endpoint name"""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, ok):
+        with self._lock:
+            self.samples.setdefault(name, []).append(seconds)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self, elapsed):
+        rows = []
+        for name in sorted(self.samples):
+            values = sorted(self.samples[name])
+            rows.append({
+                'endpoint': name,
+                'requests': len(values),
+                'errors': self.errors.get(name, 0),
+                'rps': round(len(values) / elapsed, 2),
+                'p50_ms': round(percentile(values, 50) * 1000, 1),
+                'p95_ms': round(percentile(values, 95) * 1000, 1),
+                'p99_ms': round(percentile(values, 99) * 1000, 1),
+                'max_ms': round(values[-1] * 1000, 1)
+            })
+        return rows
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+class AppClient:
+    """One virtual user on the Flask test client (own cookies)"""
+
+    def __init__(self, app, recorder):
+        self.client = app.test_client()
+        self.recorder = recorder
+
+    def request(self, name, method, path, data=None, headers=None, expect=(200, 302)):
+        start = time.perf_counter()
+        response = self.client.open(path, method=method, data=data, headers=headers or {})
+        body = response.get_data()  # include streamed bodies in the time
+        self.recorder.add(name, time.perf_counter() - start, response.status_code in expect)
+        return response.status_code, response.headers.get('Location', ''), body
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class HttpClient:
+    """One virtual user over HTTP (own cookie jar, redirects not followed)"""
+
+    def __init__(self, base_url, recorder):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect)
+        self.recorder = recorder
+
+    def request(self, name, method, path, data=None, headers=None, expect=(200, 302)):
+        body = urlencode(data, doseq=True).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers or {})
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=120) as response:
+                status, location, content = response.status, response.headers.get('Location', ''), response.read()
+        except urllib.error.HTTPError as e:
+            status, location, content = e.code, e.headers.get('Location', ''), e.read()
+        self.recorder.add(name, time.perf_counter() - start, status in expect)
+        return status, location, content
+
+def seed_database(db, students, teachers, exams_per_teacher, questions_per_exam, hash_method):
+    """Empty the database and create the test data; returns (students, teachers, exams by teacher)"""
+    from datetime import datetime
+    from werkzeug.security import generate_password_hash
+    from models.exam import Exam
+    from models.question import Question
+
+    for name in db.list_collection_names():
+        if not name.startswith('system.'):
+            db[name].drop()
+    db.users.create_index('username', unique=True)
+    db.exam_attempts.create_index([('exam_id', 1), ('status', 1)])
+
+    hashed = generate_password_hash(PASSWORD, hash_method)  # one hash for all users: seeding stays fast
+    now = datetime.utcnow()
+
+    def user(name, role):
+        return {'username': name, 'email': f'{name}@load.test', 'password': hashed, 'role': role,
+                'full_name': name.replace('_', ' ').title(), 'avatar_url': '', 'medals': 0,
+                'created_at': now, 'updated_at': now}
+
+    teacher_names = [f'teacher_{i}' for i in range(teachers)]
+    student_names = [f'student_{i}' for i in range(students)]
+    db.users.insert_many([user(name, 'teacher') for name in teacher_names] +
+                         [user(name, 'student') for name in student_names])
+
+    rng = random.Random(0)
+    exams = {}
+    for teacher in db.users.find({'role': 'teacher'}):
+        exams[teacher['username']] = []
+        db.documents.insert_one({'title': 'Tài liệu ôn tập', 'content': DOCUMENT, 'file_path': '', 'file_type': 'txt',
+                                 'owner_id': teacher['_id'], 'description': '', 'created_at': now, 'updated_at': now})
+        for e in range(exams_per_teacher):
+            exam_id = Exam.create(db, f'Kiểm tra {teacher["username"]} #{e + 1}', 'Đề kiểm tra tải', teacher['_id'],
+                                  duration=45, passing_score=50, is_public=True)
+            for q in range(questions_per_exam):
+                if q % 5 == 4:
+                    Question.create(db, exam_id, f'Mệnh đề số {q + 1}: đạo hàm của x^{q + 2} là {q + 2}x^{q + 1}.',
+                                    'true_false', [], rng.choice(['Đúng', 'Sai']), 'easy')
+                else:
+                    Question.create(db, exam_id, f'Câu {q + 1}: tích phân của x^{q + 1} từ 0 đến 1 bằng bao nhiêu?',
+                                    'multiple_choice',
+                                    [f'A. 1/{q + 2}', f'B. 1/{q + 1}', f'C. {q + 2}', 'D. 0'],
+                                    rng.choice('ABCD'), rng.choice(['easy', 'medium', 'hard']))
+            Exam.update_statistics(db, exam_id)
+            exams[teacher['username']].append(str(exam_id))
+    return student_names, teacher_names, exams
+
+def login(client, username):
+    client.request('auth.login GET', 'GET', '/auth/login')
+    status, location, _ = client.request('auth.login POST', 'POST', '/auth/login',
+                                         {'username': username, 'password': PASSWORD}, expect=(302,))
+    return status == 302 and '/auth/login' not in location
+
+def student_flow(client, username, exam_id, questions, think):
+    """login -> start_exam -> take_exam -> submit_exam -> view_result"""
+    if not login(client, username):
+        return
+    client.request('attempt.start_exam GET', 'GET', f'/attempts/exam/{exam_id}/start')
+    status, location, _ = client.request('attempt.start_exam POST', 'POST', f'/attempts/exam/{exam_id}/start',
+                                         expect=(302,))
+    match = re.search(r'/attempts/([0-9a-f]{24})/take', location)
+    if not match:
+        return
+    attempt_id = match.group(1)
+    client.request('attempt.take_exam', 'GET', f'/attempts/{attempt_id}/take')
+    if think:
+        time.sleep(random.uniform(0, think))
+    answers = {f"question_{question['_id']}": random.choice(['Đúng', 'Sai']) if question['question_type'] == 'true_false'
+               else random.choice('ABCD') for question in questions}
+    client.request('attempt.submit_exam', 'POST', f'/attempts/{attempt_id}/submit', answers,
+                   headers={'X-Requested-With': 'XMLHttpRequest'}, expect=(200,))
+    client.request('attempt.view_result', 'GET', f'/attempts/{attempt_id}/result')
+
+def teacher_flow(client, username, exam_ids, questions, document_ids, rounds, job_timeout):
+    """login, then rounds of view_exam -> export_pdf -> generate_explanation -> generate_questions (polling the job)"""
+    if not login(client, username):
+        return
+    for round_number in range(rounds):
+        exam_id = exam_ids[round_number % len(exam_ids)]
+        client.request('exam.view_exam', 'GET', f'/exams/{exam_id}')
+        client.request('exam.export_pdf (cached)', 'GET', f'/exams/{exam_id}/export-pdf?include_answers=1')
+        client.request('exam.export_pdf (shuffled)', 'GET',
+                       f'/exams/{exam_id}/export-pdf?shuffle_questions=1&shuffle_answers=1')
+        # Answered in the request: holds a sync worker for the whole model call
+        question_id = questions[exam_id][round_number % len(questions[exam_id])]['_id']
+        client.request('exam.generate_question_explanation', 'POST',
+                       f'/exams/{exam_id}/questions/{question_id}/generate-explanation',
+                       headers={'X-Requested-With': 'XMLHttpRequest'})
+        status, _, body = client.request('exam.generate_questions', 'POST', f'/exams/{exam_id}/generate-questions',
+                                         {'document_ids': document_ids, 'num_easy': 2, 'num_medium': 2, 'num_hard': 1,
+                                          'fresh': 'on'},
+                                         headers={'X-Requested-With': 'XMLHttpRequest'}, expect=(202,))
+        if status != 202:
+            continue
+        job_id = json.loads(body)['job_id']
+        deadline = time.time() + job_timeout
+        while time.time() < deadline:
+            _, _, body = client.request('exam.job_status', 'GET', f'/exams/{exam_id}/jobs/{job_id}')
+            if json.loads(body).get('job', {}).get('status') in ('completed', 'failed'):
+                break
+            time.sleep(1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Exam-day load test')
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/trac_nghiem_load')
+    parser.add_argument('--base-url', default='', help='test a running server instead of the in-process app')
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--teachers', type=int, default=3)
+    parser.add_argument('--exams', type=int, default=2, help='exams per teacher')
+    parser.add_argument('--questions', type=int, default=40, help='questions per exam')
+    parser.add_argument('--concurrency', type=int, default=50, help='students taking the exam at once')
+    parser.add_argument('--ramp', type=float, default=10, help='seconds over which students start')
+    parser.add_argument('--think', type=float, default=0, help='max seconds a student spends on the exam')
+    parser.add_argument('--teacher-rounds', type=int, default=3)
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='fake model seconds per call (in process)')
+    parser.add_argument('--job-timeout', type=float, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', default='', help='save the report to this file')
+    args = parser.parse_args()
+
+    database = urlparse(args.mongo_uri).path.strip('/')
+    if not any(word in database for word in ('load', 'bench', 'test')):
+        sys.exit(f"Refusing to empty database '{database}': use a name containing load, bench or test")
+
+    # Config reads the environment on import
+    os.environ['MONGO_URI'] = args.mongo_uri
+    os.environ['LLM_PROVIDER'] = 'fake'
+    os.environ['FAKE_LLM_LATENCY'] = str(args.llm_latency)
+    os.environ['GEMINI_API_KEY'] = 'load-test'  # the fake model needs no key, the pipeline requires one
+    from bson.objectid import ObjectId
+    from app import create_app
+    app = create_app('production')
+    app.config.update(SESSION_COOKIE_SECURE=False, LOGIN_MAX_FAILURES_PER_IP=10 ** 9)
+    random.seed(args.seed)
+
+    print(f"Seeding {database}: {args.students} students, {args.teachers} teachers, "
+          f"{args.teachers * args.exams} exams x {args.questions} questions")
+    db = app.db
+    students, teachers, exams = seed_database(db, args.students, args.teachers, args.exams, args.questions,
+                                              app.config.get('PASSWORD_HASH_METHOD') or 'scrypt')
+    all_exams = [exam_id for exam_ids in exams.values() for exam_id in exam_ids]
+    questions = {exam_id: list(db.questions.find({'exam_id': ObjectId(exam_id)}, {'question_type': 1}))
+                 for exam_id in all_exams}
+    documents = {teacher['username']: [str(doc['_id']) for doc in db.documents.find({'owner_id': teacher['_id']})]
+                 for teacher in db.users.find({'role': 'teacher'})}
+
+    recorder = Recorder()
+
+    def new_client():
+        return HttpClient(args.base_url, recorder) if args.base_url else AppClient(app, recorder)
+
+    def run_student(index):
+        time.sleep(args.ramp * index / max(1, len(students)))
+        exam_id = all_exams[index % len(all_exams)]
+        student_flow(new_client(), students[index], exam_id, questions[exam_id], args.think)
+
+    def run_teacher(name):
+        teacher_flow(new_client(), name, exams[name], questions, documents[name], args.teacher_rounds, args.job_timeout)
+
+    print(f"Running against {args.base_url or 'the in-process app'}, {args.concurrency} concurrent students")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(teachers) or 1) as teacher_pool, \
+            ThreadPoolExecutor(max_workers=args.concurrency) as student_pool:
+        teacher_futures = [teacher_pool.submit(run_teacher, name) for name in teachers]
+        student_futures = [student_pool.submit(run_student, i) for i in range(len(students))]
+        for future in student_futures + teacher_futures:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    rows = recorder.report(elapsed)
+    total = sum(row['requests'] for row in rows)
+    errors = sum(row['errors'] for row in rows)
+    print(f"\n{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s), {errors} errors\n")
+    print(f"{'endpoint':<30} {'reqs':>6} {'errs':>5} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for row in rows:
+        print(f"{row['endpoint']:<30} {row['requests']:>6} {row['errors']:>5} {row['rps']:>7.2f} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as output:
+            json.dump({'args': vars(args), 'elapsed': round(elapsed, 2), 'requests': total, 'errors': errors,
+                       'endpoints': rows}, output, indent=2)
+        print(f"\nSaved {args.json}")
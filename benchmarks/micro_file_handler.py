@@ -0,0 +1,21 @@
+"""Text extraction and Markdown rendering of uploaded documents"""
+
+import pytest
+
+from conftest import DOCUMENT_SIZES
+from utils.file_handler import extract_text_from_pdf, extract_text_from_docx, markdown_to_html
+
+@pytest.mark.parametrize('size', DOCUMENT_SIZES)
+def bench_extract_text_from_pdf(benchmark, documents, size):
+    text = benchmark(extract_text_from_pdf, documents[size]['pdf'])
+    assert text  # the extractors return '' on errors instead of raising
+
+@pytest.mark.parametrize('size', DOCUMENT_SIZES)
+def bench_extract_text_from_docx(benchmark, documents, size):
+    text = benchmark(extract_text_from_docx, documents[size]['docx'])
+    assert text
+
+@pytest.mark.parametrize('size', DOCUMENT_SIZES)
+def bench_markdown_to_html(benchmark, documents, size):
+    html = benchmark(markdown_to_html, documents[size]['md'])
+    assert '<table>' in html
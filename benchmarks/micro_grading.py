@@ -0,0 +1,39 @@
+"""Grading of online submissions and of scanned answer sheets"""
+
+import random
+
+import numpy as np
+import pytest
+
+from conftest import make_questions
+from utils.grading import grade_answers, identity_layout, key_vector, response_matrix, score_matrix
+
+def random_answers(questions, seed=0):
+    rng = random.Random(seed)
+    return {str(question['_id']): rng.choice(['Đúng', 'Sai']) if question['question_type'] == 'true_false'
+            else rng.choice('ABCD') for question in questions}
+
+@pytest.mark.parametrize('count', [10, 100, 500])
+def bench_grade_answers(benchmark, count):
+    """One submit_exam: score a student's answers"""
+    questions = make_questions(count)
+    answers = random_answers(questions)
+    score, max_score = benchmark(grade_answers, questions, answers)
+    assert max_score == count
+
+@pytest.mark.parametrize('sheets', [100, 1000, 10000])
+def bench_grade_answer_sheets(benchmark, sheets):
+    """import_paper_answers: encode and score a batch of 40-question sheets"""
+    questions = make_questions(40)
+    questions_by_id = {str(question['_id']): question for question in questions}
+    layout = identity_layout(questions)
+    key, points = key_vector(layout, questions_by_id)
+    true_false = [question['question_type'] == 'true_false' for question in questions]
+    rng = random.Random(0)
+    answer_strings = [''.join(rng.choice('ABCD-') for _ in questions) for _ in range(sheets)]
+
+    def grade():
+        return score_matrix(response_matrix(answer_strings, true_false), key, points)[0]
+
+    scores = benchmark(grade)
+    assert scores.shape == (sheets,) and np.all(scores <= len(questions))
@@ -0,0 +1,27 @@
+"""Exam PDF rendering with the shared exporter"""
+
+from io import BytesIO
+
+import pytest
+
+from conftest import make_questions
+from utils.pdf_exporter import get_exporter, warm_up
+
+@pytest.fixture(scope='module', autouse=True)
+def exporter():
+    # Font registration is a one-time cost (see bench_pdf_export.py); keep it out of the rounds
+    warm_up()
+    return get_exporter()
+
+@pytest.mark.parametrize('shuffle', [False, True], ids=['in_order', 'shuffled'])
+@pytest.mark.parametrize('count', [10, 100, 500])
+def bench_export_exam(benchmark, exporter, exam, count, shuffle):
+    questions = make_questions(count)
+
+    def export():
+        output = BytesIO()
+        exporter.export_exam(exam, questions, output, shuffle_questions=shuffle, shuffle_answers=shuffle,
+                             include_answers=True, seed=1)
+        return output.tell()
+
+    assert benchmark(export) > 0
@@ -0,0 +1,32 @@
+"""Worker boot: importing the app and running create_app in a fresh interpreter"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Prints the lazily imported modules that create_app loaded anyway
+BOOT = '''
+import json, sys
+import app
+if {preload}:
+    app.preload_modules()
+app.create_app('production')
+print(json.dumps([name for name in app.LAZY_MODULES if name in sys.modules]))
+'''
+
+@pytest.mark.parametrize('preload', [False, True], ids=['lazy', 'preloaded'])
+def bench_create_app(benchmark, preload):
+    """'lazy' is a worker's own boot; 'preloaded' is what the gunicorn master pays once"""
+    def boot():
+        result = subprocess.run([sys.executable, '-c', BOOT.format(preload=preload)], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    loaded = benchmark.pedantic(boot, rounds=5, warmup_rounds=1)
+    if not preload:
+        assert loaded == [], f"imported at boot: {loaded}"
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -8,6 +9,7 @@ class Config:
     """Base configuration"""
     SECRET_KEY = os.getenv('FLASK_SECRET_KEY', 'dev-secret-key-change-in-production')
     MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/exam_system')
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 100))  # per worker process; >= GUNICORN_THREADS
     
     # Upload settings
     UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), os.getenv('UPLOAD_FOLDER', 'uploads'))
@@ -16,6 +18,84 @@ class Config:
     
     # Gemini AI
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
+    GEMINI_MAX_WORKERS = int(os.getenv('GEMINI_MAX_WORKERS', 4))  # concurrent model calls per worker
+    GEMINI_TIMEOUT = int(os.getenv('GEMINI_TIMEOUT', 45))  # seconds per model call
+    GEMINI_BATCH_SIZE = int(os.getenv('GEMINI_BATCH_SIZE', 10))  # max questions per model call
+    GEMINI_CHUNK_TOKENS = int(os.getenv('GEMINI_CHUNK_TOKENS', 1500))  # document tokens per model call
+    GEMINI_EXPLANATION_BATCH_TOKENS = int(os.getenv('GEMINI_EXPLANATION_BATCH_TOKENS', 3000))  # per batched prompt
+    GEMINI_API_ENDPOINT = os.getenv('GEMINI_API_ENDPOINT', '')  # override, e.g. fake_gemini_server.py
+    
+    # LLM backend: 'gemini' or 'fake' (offline, for load tests)
+    LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'gemini')
+    FAKE_LLM_LATENCY = float(os.getenv('FAKE_LLM_LATENCY', 0.5))  # seconds per call
+    FAKE_LLM_FAILURE_RATE = float(os.getenv('FAKE_LLM_FAILURE_RATE', 0.0))  # share of calls failing with 429
+    FAKE_LLM_SEED = int(os.getenv('FAKE_LLM_SEED', 0))
+    
+    # Gemini scheduler shared by all workers on the host (token bucket + circuit breaker)
+    GEMINI_SCHEDULER_ENABLED = os.getenv('GEMINI_SCHEDULER_ENABLED', 'true').lower() == 'true'
+    GEMINI_SCHEDULER_DB = os.getenv('GEMINI_SCHEDULER_DB', os.path.join(tempfile.gettempdir(), 'gemini_scheduler.sqlite3'))
+    GEMINI_RPM = int(os.getenv('GEMINI_RPM', 60))  # requests per minute per API key
+    GEMINI_TPM = int(os.getenv('GEMINI_TPM', 200000))  # tokens per minute per API key
+    GEMINI_BREAKER_FAILURES = int(os.getenv('GEMINI_BREAKER_FAILURES', 5))  # failures before the circuit opens
+    GEMINI_BREAKER_COOLDOWN = int(os.getenv('GEMINI_BREAKER_COOLDOWN', 30))  # seconds
+    GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', 3))
+    
+    # AI response cache
+    AI_CACHE_ENABLED = os.getenv('AI_CACHE_ENABLED', 'true').lower() == 'true'
+    AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', 7 * 86400))  # seconds
+    AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', 5000))
+    
+    # Rendered exam exports, keyed by exam version and options
+    EXPORT_CACHE_DIR = os.getenv('EXPORT_CACHE_DIR', '')  # default: UPLOAD_FOLDER/exports
+    EXPORT_CACHE_MAX_MB = int(os.getenv('EXPORT_CACHE_MAX_MB', 200))
+    EXPORT_CACHE_MAX_AGE = int(os.getenv('EXPORT_CACHE_MAX_AGE', 7 * 86400))  # seconds since last use
+    EXPORT_SPOOL_MAX_MB = int(os.getenv('EXPORT_SPOOL_MAX_MB', 4))  # one-off exports above this spill to a temp file
+    EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', os.cpu_count() or 1))  # processes rendering exam variants
+    EXPORT_MAX_VARIANTS = int(os.getenv('EXPORT_MAX_VARIANTS', 24))
+    
+    # Background jobs (AI generation) per worker process
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    
+    # Password hashing: a werkzeug method such as 'scrypt:32768:8:1' or
+    # 'pbkdf2:sha256:600000'; users are rehashed on their next login when it changes
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))  # concurrent hashes per worker
+    PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', 32))  # logins allowed to wait for a hashing slot
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 5))  # seconds to wait before answering 503
+    
+    # Failed login throttling (a class behind one NAT shares an IP, so the IP limit is high)
+    LOGIN_MAX_FAILURES_PER_USER = int(os.getenv('LOGIN_MAX_FAILURES_PER_USER', 10))
+    LOGIN_MAX_FAILURES_PER_IP = int(os.getenv('LOGIN_MAX_FAILURES_PER_IP', 100))
+    LOGIN_THROTTLE_WINDOW = int(os.getenv('LOGIN_THROTTLE_WINDOW', 900))  # seconds
+    TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', 0))  # reverse proxies setting X-Forwarded-For (nginx: 1)
+    
+    # Per-request MongoDB command stats: slow request log, N+1 warnings, X-Query-Stats header
+    QUERY_STATS_ENABLED = os.getenv('QUERY_STATS_ENABLED', 'true').lower() == 'true'
+    QUERY_STATS_HEADER = os.getenv('QUERY_STATS_HEADER', 'false').lower() == 'true'  # always on in debug
+    QUERY_REPEAT_THRESHOLD = int(os.getenv('QUERY_REPEAT_THRESHOLD', 5))  # same query shape this often = N+1
+    SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 1000))
+    
+    # Prometheus /metrics (multi-worker aggregation: PROMETHEUS_MULTIPROC_DIR, see gunicorn.conf.py)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # if set, scrapes need "Authorization: Bearer <token>"
+    
+    # Request profiler: send "X-Profile: <PROFILE_TOKEN>" (or ?_profile=<token>) to profile
+    # one request, or sample a share of all requests; off when neither is set
+    PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.0))
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', '')  # default: ./profiles
+    
+    # Live exam monitoring over Server-Sent Events. An open stream holds a
+    # worker thread (gthread) or greenlet (gevent); sync workers and viewers
+    # beyond MONITOR_MAX_STREAMS poll the shared snapshot instead
+    MONITOR_MAX_STREAMS = int(os.getenv('MONITOR_MAX_STREAMS', 4))  # per worker process
+    MONITOR_STREAM_SECONDS = int(os.getenv('MONITOR_STREAM_SECONDS', 300))  # then the browser reconnects
+    MONITOR_HEARTBEAT = int(os.getenv('MONITOR_HEARTBEAT', 15))  # seconds, below nginx's proxy_read_timeout
+    MONITOR_MIN_INTERVAL = float(os.getenv('MONITOR_MIN_INTERVAL', 1))  # seconds between recounts of an exam
+    MONITOR_POLL_INTERVAL = float(os.getenv('MONITOR_POLL_INTERVAL', 5))  # recount period without a change stream
+    MONITOR_IDLE_SECONDS = int(os.getenv('MONITOR_IDLE_SECONDS', 60))
+    MONITOR_CHANGE_STREAM = os.getenv('MONITOR_CHANGE_STREAM', 'false').lower() == 'true'  # needs a replica set
     
     # Session
     SESSION_COOKIE_SECURE = False  # Set True in production with HTTPS
@@ -30,7 +110,8 @@ class DevelopmentConfig(Config):
 class ProductionConfig(Config):
     """Production configuration"""
     DEBUG = False
-    SESSION_COOKIE_SECURE = True
+    # Plain-HTTP benchmark servers (benchmarks/bench_worker_modes.py) turn it off
+    SESSION_COOKIE_SECURE = os.getenv('SESSION_COOKIE_SECURE', 'true').lower() == 'true'
 
 # Configuration dictionary
 config = {
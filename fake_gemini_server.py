@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Local fake of the Gemini REST API for testing rate limiting and load offline.
+
+Usage:
+    python fake_gemini_server.py --port 8765 --latency 0.5 --error-rate 0.1
+    GEMINI_API_KEY=fake GEMINI_API_ENDPOINT=http://127.0.0.1:8765 python app.py
+
+Answers POST /v1beta/models/<model>:generateContent and :streamGenerateContent
+with the same responses as the in-process fake provider (LLM_PROVIDER=fake),
+and returns HTTP 429 for a share of requests or when more than --rpm requests
+arrive within a minute. Streamed answers are split into --chunk-chars pieces,
+framed like the real API: server-sent events with ?alt=sse (what the SDK's
+REST transport asks for), otherwise one JSON array of partial responses.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import random
+import threading
+import time
+from utils.llm_providers import fake_response
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    """Minimal generateContent and streamGenerateContent endpoints"""
+
+    latency = 0.5
+    error_rate = 0.0
+    rpm = 0
+    chunk_chars = 64
+    chunk_delay = 0.0
+    _calls = []
+    _lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _over_rpm(self):
+        if not self.rpm:
+            return False
+        now = time.time()
+        with self._lock:
+            self._calls[:] = [t for t in self._calls if now - t < 60]
+            if len(self._calls) >= self.rpm:
+                return True
+            self._calls.append(now)
+        return False
+
+    def _send_stream(self, text, sse):
+        """Send text as a series of partial responses; the last one carries finishReason"""
+        pieces = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or ['']
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream' if sse else 'application/json; charset=utf-8')
+        self.end_headers()  # no Content-Length: the body ends when the connection closes
+        if not sse:
+            self.wfile.write(b'[')
+        for i, piece in enumerate(pieces):
+            candidate = {'content': {'role': 'model', 'parts': [{'text': piece}]}, 'index': 0}
+            if i == len(pieces) - 1:
+                candidate['finishReason'] = 'STOP'
+            payload = json.dumps({'candidates': [candidate]}, ensure_ascii=False)
+            if sse:
+                self.wfile.write(f'data: {payload}\r\n\r\n'.encode('utf-8'))
+            else:
+                self.wfile.write(((',\r\n' if i else '') + payload).encode('utf-8'))
+            self.wfile.flush()
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay)
+        if not sse:
+            self.wfile.write(b']')
+
+    def do_POST(self):
+        stream = ':streamGenerateContent' in self.path
+        if not stream and ':generateContent' not in self.path:
+            return self._send_json(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        prompt = ''.join(part.get('text', '') for content in request.get('contents', [])
+                         for part in content.get('parts', []))
+
+        time.sleep(self.latency * random.uniform(0.5, 1.5))
+
+        if self._over_rpm() or random.random() < self.error_rate:
+            return self._send_json(429, {'error': {'code': 429, 'message': 'Resource has been exhausted',
+                                                   'status': 'RESOURCE_EXHAUSTED'}})
+
+        text = fake_response(prompt, random.getrandbits(48))
+        if stream:
+            return self._send_stream(text, sse='alt=sse' in self.path)
+        self._send_json(200, {'candidates': [{
+            'content': {'role': 'model', 'parts': [{'text': text}]},
+            'finishReason': 'STOP',
+            'index': 0
+        }]})
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fake Gemini API server')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.5, help='mean seconds per call')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of calls answered with 429')
+    parser.add_argument('--rpm', type=int, default=0, help='answer 429 above this many calls per minute')
+    parser.add_argument('--chunk-chars', type=int, default=64, help='characters per streamed chunk')
+    parser.add_argument('--chunk-delay', type=float, default=0.0, help='seconds between streamed chunks')
+    args = parser.parse_args()
+
+    FakeGeminiHandler.latency = args.latency
+    FakeGeminiHandler.error_rate = args.error_rate
+    FakeGeminiHandler.rpm = args.rpm
+    FakeGeminiHandler.chunk_chars = args.chunk_chars
+    FakeGeminiHandler.chunk_delay = args.chunk_delay
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), FakeGeminiHandler)
+    print(f"Fake Gemini API on http://127.0.0.1:{args.port}")
+    server.serve_forever()
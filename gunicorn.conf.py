@@ -0,0 +1,71 @@
+# Gunicorn configuration
+# Usage: gunicorn -c gunicorn.conf.py "app:create_app()"
+import gc
+import os
+import shutil
+import tempfile
+import time
+
+# Workers write metrics here and /metrics merges them; must be set before
+# prometheus_client is imported (see utils/metrics.py)
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'trac_nghiem_metrics'))
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)  # also for --check-config
+
+# Worker modes:
+#   sync     one request per worker; a slow Gemini call or download holds the whole worker
+#   gthread  GUNICORN_THREADS requests per worker; blocking I/O releases the GIL (recommended)
+#   gevent   GUNICORN_WORKER_CONNECTIONS greenlets per worker (pip install gevent); CPU-bound
+#            work is moved to real threads by utils.concurrency.run_blocking
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+# Create the app in the master before forking: workers start instantly and
+# share its memory copy-on-write (MongoDB clients are still made per worker,
+# on first use). Code changes then need a restart, not a HUP.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'false').lower() == 'true'
+accesslog = '-'
+errorlog = '-'
+loglevel = 'info'
+
+def on_starting(server):
+    """Reset metrics of a previous run, then load heavy modules and warm up the PDF exporter
+
+    Both run in the master so forked workers share the imported modules and
+    the parsed fonts instead of loading their own copies.
+    """
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+    
+    from app import preload_modules
+    from utils.pdf_exporter import warm_up
+    
+    start = time.perf_counter()
+    try:
+        preload_modules()
+        server.log.info(f"Preloaded modules: {(time.perf_counter() - start) * 1000:.0f} ms")
+    except Exception as e:
+        # Workers import what is missing on first use, as without preloading
+        server.log.warning(f"Module preload failed: {e}")
+    try:
+        seconds = warm_up()
+        server.log.info(f"PDF exporter warm-up: {seconds * 1000:.0f} ms")
+    except Exception as e:
+        # Workers fall back to loading fonts on their first export
+        server.log.warning(f"PDF exporter warm-up failed: {e}")
+
+def when_ready(server):
+    """Move everything loaded so far out of the garbage collector's reach
+
+    A collection in a worker would otherwise write to every inherited
+    object's header and un-share the master's pages.
+    """
+    gc.freeze()
+
+def child_exit(server, worker):
+    """Drop the live gauges (in-flight requests, Mongo connections) of a dead worker"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -96,6 +96,30 @@ def init_database():
         except:
             print("   ℹ attempts.exam_id index already exists")
         
+        try:
+            db.exam_attempts.create_index([('exam_id', 1), ('status', 1)])
+            print("   ✓ exam_attempts.exam_id_status index created")
+        except:
+            print("   ℹ exam_attempts.exam_id_status index already exists")
+        
+        try:
+            db.questions.create_index([('lsh_bands', 1), ('exam_id', 1)])
+            print("   ✓ questions.lsh_bands index created")
+        except:
+            print("   ℹ questions.lsh_bands index already exists")
+        
+        try:
+            db.exam_variants.create_index([('exam_id', 1), ('code', 1)], unique=True)
+            print("   ✓ exam_variants.exam_id_code index created")
+        except:
+            print("   ℹ exam_variants.exam_id_code index already exists")
+        
+        try:
+            db.login_throttle.create_index('expires_at', expireAfterSeconds=0)
+            print("   ✓ login_throttle.expires_at TTL index created")
+        except:
+            print("   ℹ login_throttle.expires_at index already exists")
+        
         print("\n" + "=" * 60)
         print("✅ DATABASE INITIALIZATION COMPLETE")
         print("=" * 60)
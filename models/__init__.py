@@ -3,5 +3,8 @@ from models.document import Document
 from models.exam import Exam
 from models.question import Question
 from models.exam_attempt import ExamAttempt
+from models.job import Job
+from models.exam_variant import ExamVariant
+from models.login_throttle import LoginThrottle
 
-__all__ = ['User', 'Document', 'Exam', 'Question', 'ExamAttempt']
+__all__ = ['User', 'Document', 'Exam', 'Question', 'ExamAttempt', 'Job', 'ExamVariant', 'LoginThrottle']
@@ -45,6 +45,13 @@ class Exam:
             cursor = cursor.limit(limit)
         return list(cursor)
     
+    @staticmethod
+    def find_ids_by_owner(db, owner_id):
+        """Find ids of all exams owned by a user"""
+        if isinstance(owner_id, str):
+            owner_id = ObjectId(owner_id)
+        return [exam['_id'] for exam in db.exams.find({'owner_id': owner_id}, {'_id': 1})]
+    
     @staticmethod
     def find_public(db, limit=None):
         """Find public exams"""
@@ -98,6 +98,41 @@ class ExamAttempt:
         }
         return ExamAttempt.update(db, attempt_id, update_data)
     
+    @staticmethod
+    def create_graded_many(db, attempts):
+        """Insert already graded attempts (e.g. paper answer sheets) in one batch
+        
+        Each item needs exam_id, student_id, answers, score, max_score,
+        percentage and passed; any other fields are stored as given.
+        """
+        if not attempts:
+            return []
+        now = datetime.utcnow()
+        documents = []
+        for attempt in attempts:
+            document = {
+                'status': 'graded',
+                'started_at': now,
+                'submitted_at': now,
+                'graded_at': now,
+                'created_at': now,
+                'updated_at': now
+            }
+            document.update(attempt)
+            documents.append(document)
+        result = db.exam_attempts.insert_many(documents, ordered=False)
+        return result.inserted_ids
+    
+    @staticmethod
+    def find_paper_sheets(db, exam_id, student_ids):
+        """(student_id, variant_code) of the paper answer sheets already imported for an exam"""
+        if isinstance(exam_id, str):
+            exam_id = ObjectId(exam_id)
+        return {(attempt['student_id'], attempt.get('variant_code', '')) for attempt in db.exam_attempts.find(
+            {'exam_id': exam_id, 'source': 'paper', 'student_id': {'$in': list(student_ids)}},
+            {'student_id': 1, 'variant_code': 1}
+        )}
+    
     @staticmethod
     def delete(db, attempt_id):
         """Delete exam attempt"""
@@ -138,3 +173,43 @@ class ExamAttempt:
             'passed_count': 0,
             'pass_rate': 0
         }
+    
+    @staticmethod
+    def get_live_counts(db, exam_id):
+        """Counters for live monitoring: attempts per status and the score distribution
+        
+        One aggregation over the (exam_id, status) index. Graded attempts
+        are counted in ten 10% score buckets (100% goes in the last one).
+        """
+        if isinstance(exam_id, str):
+            exam_id = ObjectId(exam_id)
+        
+        pipeline = [
+            {'$match': {'exam_id': exam_id}},
+            {'$group': {
+                '_id': {'status': '$status', 'bucket': {'$floor': {'$divide': ['$percentage', 10]}}},
+                'count': {'$sum': 1},
+                'passed': {'$sum': {'$cond': [{'$eq': ['$passed', True]}, 1, 0]}},
+                'percentage': {'$sum': '$percentage'}
+            }}
+        ]
+        
+        counts = {'started': 0, 'in_progress': 0, 'submitted': 0, 'passed': 0,
+                  'avg_score': 0, 'distribution': [0] * 10}
+        total_percentage = 0
+        for row in db.exam_attempts.aggregate(pipeline):
+            status = row['_id'].get('status')
+            counts['started'] += row['count']
+            if status == 'in_progress':
+                counts['in_progress'] += row['count']
+                continue
+            counts['submitted'] += row['count']
+            if status == 'graded':
+                bucket = min(max(int(row['_id'].get('bucket') or 0), 0), 9)
+                counts['distribution'][bucket] += row['count']
+                counts['passed'] += row['passed']
+                total_percentage += row['percentage']
+        graded = sum(counts['distribution'])
+        if graded:
+            counts['avg_score'] = round(total_percentage / graded, 2)
+        return counts
@@ -0,0 +1,67 @@
+from datetime import datetime
+from bson.objectid import ObjectId
+
+class ExamVariant:
+    """Shuffled variant (mã đề) of an exam, with its permutation and answer key"""
+
+    @staticmethod
+    def create_many(db, exam_id, variants):
+        """Store new variants; never replaces one (printed papers are graded against it)
+
+        ``variants`` is a list of (code, seed, version, questions) where
+        ``questions`` lists the variant's questions in printed order as
+        {'question_id', 'option_order', 'correct_answer', 'points'} and
+        option_order[i] is the original index of the i-th printed option.
+        Raises pymongo's BulkWriteError if a code is already taken; that
+        relies on the unique (exam_id, code) index, so init_db must have
+        been run against the database.
+        """
+        if isinstance(exam_id, str):
+            exam_id = ObjectId(exam_id)
+        now = datetime.utcnow()
+        documents = [{
+            'exam_id': exam_id,
+            'code': str(code),
+            'seed': seed,
+            'exam_version': version,
+            'questions': questions,
+            'created_at': now
+        } for code, seed, version, questions in variants]
+        return db.exam_variants.insert_many(documents)
+
+    @staticmethod
+    def next_code(db, exam_id, first=101):
+        """First free code after the exam's existing variants"""
+        if isinstance(exam_id, str):
+            exam_id = ObjectId(exam_id)
+        codes = [int(variant['code']) for variant in db.exam_variants.find({'exam_id': exam_id}, {'code': 1})
+                 if str(variant['code']).isdigit()]
+        return max(codes) + 1 if codes else first
+
+    @staticmethod
+    def find_series(db, exam_id, seeds, version):
+        """First code of stored variants printed from exactly these seeds, in order, or None"""
+        if isinstance(exam_id, str):
+            exam_id = ObjectId(exam_id)
+        by_seed = {variant['seed']: variant['code'] for variant in db.exam_variants.find(
+            {'exam_id': exam_id, 'seed': {'$in': seeds}, 'exam_version': version}, {'seed': 1, 'code': 1})}
+        if len(by_seed) != len(seeds) or not all(str(by_seed[seed]).isdigit() for seed in seeds):
+            return None
+        first = int(by_seed[seeds[0]])
+        if [int(by_seed[seed]) for seed in seeds] != list(range(first, first + len(seeds))):
+            return None
+        return first
+
+    @staticmethod
+    def find_by_exam(db, exam_id):
+        """Find variants of an exam ordered by code"""
+        if isinstance(exam_id, str):
+            exam_id = ObjectId(exam_id)
+        return list(db.exam_variants.find({'exam_id': exam_id}).sort('code', 1))
+
+    @staticmethod
+    def find_by_code(db, exam_id, code):
+        """Find one variant of an exam"""
+        if isinstance(exam_id, str):
+            exam_id = ObjectId(exam_id)
+        return db.exam_variants.find_one({'exam_id': exam_id, 'code': str(code)})
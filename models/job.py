@@ -0,0 +1,90 @@
+from datetime import datetime
+from bson.objectid import ObjectId
+
+class Job:
+    """Background job model for long-running tasks (AI generation, exports)"""
+
+    @staticmethod
+    def create(db, job_type, owner_id, exam_id=None, total=0, params=None):
+        """Create a new pending job"""
+        job_data = {
+            'job_type': job_type,  # 'generate_questions', ...
+            'owner_id': ObjectId(owner_id) if isinstance(owner_id, str) else owner_id,
+            'exam_id': ObjectId(exam_id) if isinstance(exam_id, str) else exam_id,
+            'status': 'pending',  # 'pending', 'running', 'completed', 'failed'
+            'progress': {'done': 0, 'total': total},
+            'params': params or {},
+            'result': {},
+            'message': '',
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
+            'finished_at': None
+        }
+        result = db.jobs.insert_one(job_data)
+        return result.inserted_id
+
+    @staticmethod
+    def find_by_id(db, job_id):
+        """Find job by ID"""
+        if isinstance(job_id, str):
+            job_id = ObjectId(job_id)
+        return db.jobs.find_one({'_id': job_id})
+
+    @staticmethod
+    def update(db, job_id, update_data):
+        """Update job"""
+        if isinstance(job_id, str):
+            job_id = ObjectId(job_id)
+        update_data['updated_at'] = datetime.utcnow()
+        return db.jobs.update_one({'_id': job_id}, {'$set': update_data})
+
+    @staticmethod
+    def start(db, job_id, total=None):
+        """Mark job as running"""
+        update_data = {'status': 'running'}
+        if total is not None:
+            update_data['progress.total'] = total
+        return Job.update(db, job_id, update_data)
+
+    @staticmethod
+    def advance(db, job_id, done=1, **counters):
+        """Increment progress and result counters, e.g. advance(db, id, inserted=3)"""
+        if isinstance(job_id, str):
+            job_id = ObjectId(job_id)
+        increments = {'progress.done': done}
+        for name, value in counters.items():
+            increments[f'result.{name}'] = value
+        return db.jobs.update_one(
+            {'_id': job_id},
+            {'$inc': increments, '$set': {'updated_at': datetime.utcnow()}}
+        )
+
+    @staticmethod
+    def complete(db, job_id, message=''):
+        """Mark job as completed"""
+        return Job.update(db, job_id, {
+            'status': 'completed',
+            'message': message,
+            'finished_at': datetime.utcnow()
+        })
+
+    @staticmethod
+    def fail(db, job_id, message):
+        """Mark job as failed"""
+        return Job.update(db, job_id, {
+            'status': 'failed',
+            'message': message,
+            'finished_at': datetime.utcnow()
+        })
+
+    @staticmethod
+    def to_dict(job):
+        """JSON-serializable view of a job for progress polling"""
+        return {
+            'id': str(job['_id']),
+            'job_type': job['job_type'],
+            'status': job['status'],
+            'progress': job.get('progress', {}),
+            'result': job.get('result', {}),
+            'message': job.get('message', '')
+        }
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+class LoginThrottle:
+    """Failed login counters per IP and per username, in fixed time windows
+
+    One document per key ('ip:<address>' or 'user:<username>') holds the
+    failures of the current window; MongoDB drops it once the window ends.
+    """
+
+    @staticmethod
+    def is_blocked(db, keys, limits):
+        """True if any key has reached its limit; limits is {key: max_failures}"""
+        now = datetime.utcnow()
+        for counter in db.login_throttle.find({'_id': {'$in': list(keys)}, 'expires_at': {'$gt': now}},
+                                              {'failures': 1}):
+            if counter['failures'] >= limits[counter['_id']]:
+                return True
+        return False
+
+    @staticmethod
+    def record_failure(db, keys, window):
+        """Count a failed login against every key; window is in seconds"""
+        now = datetime.utcnow()
+        for key in keys:
+            # An expired counter the TTL monitor has not removed yet starts a new window
+            db.login_throttle.delete_one({'_id': key, 'expires_at': {'$lte': now}})
+            db.login_throttle.update_one(
+                {'_id': key},
+                {'$inc': {'failures': 1}, '$setOnInsert': {'expires_at': now + timedelta(seconds=window)}},
+                upsert=True
+            )
+
+    @staticmethod
+    def reset(db, key):
+        """Clear a key's failures, e.g. a username after a successful login"""
+        return db.login_throttle.delete_one({'_id': key})
@@ -1,11 +1,13 @@
 from datetime import datetime
 from bson.objectid import ObjectId
+from utils import dedup
 
 class Question:
     """Question model"""
     
     @staticmethod
-    def create(db, exam_id, question_text, question_type, options, correct_answer, difficulty, points=1, explanation=''):
+    def create(db, exam_id, question_text, question_type, options, correct_answer, difficulty, points=1, explanation='',
+               duplicate_of=None):
         """Create a new question"""
         question_data = {
             'exam_id': ObjectId(exam_id) if isinstance(exam_id, str) else exam_id,
@@ -16,9 +18,11 @@ class Question:
             'difficulty': difficulty,  # 'easy', 'medium', 'hard'
             'points': points,
             'explanation': explanation,  # AI-generated explanation for learning
+            'duplicate_of': duplicate_of,  # _id of a near-duplicate question, if flagged
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         }
+        question_data.update(dedup.fingerprint(question_text, options))
         result = db.questions.insert_one(question_data)
         return result.inserted_id
     
@@ -41,9 +45,36 @@ class Question:
         """Update question"""
         if isinstance(question_id, str):
             question_id = ObjectId(question_id)
+        if 'question_text' in update_data:
+            update_data.update(dedup.fingerprint(update_data['question_text'], update_data.get('options')))
         update_data['updated_at'] = datetime.utcnow()
         return db.questions.update_one({'_id': question_id}, {'$set': update_data})
     
+    @staticmethod
+    def find_without_explanation(db, exam_id):
+        """Find questions of an exam that have no explanation yet"""
+        if isinstance(exam_id, str):
+            exam_id = ObjectId(exam_id)
+        return list(db.questions.find(
+            {'exam_id': exam_id, '$or': [{'explanation': {'$in': ['', None]}}, {'explanation': {'$exists': False}}]},
+            {'question_text': 1, 'options': 1, 'correct_answer': 1}
+        ).sort('created_at', 1))
+    
+    @staticmethod
+    def set_explanations(db, explanations):
+        """Write {question_id: explanation} with a single bulk_write"""
+        from pymongo import UpdateOne
+        
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne({'_id': ObjectId(question_id) if isinstance(question_id, str) else question_id},
+                      {'$set': {'explanation': explanation, 'updated_at': now}})
+            for question_id, explanation in explanations.items()
+        ]
+        if not operations:
+            return None
+        return db.questions.bulk_write(operations, ordered=False)
+    
     @staticmethod
     def delete(db, question_id):
         """Delete question"""
@@ -69,3 +100,58 @@ class Question:
         ]
         result = list(db.questions.aggregate(pipeline))
         return {item['_id']: item['count'] for item in result}
+
+    @staticmethod
+    def find_near_duplicates(db, question_text, options, exam_ids, threshold=dedup.DUPLICATE_THRESHOLD):
+        """Find questions in the given exams that are near-duplicates of the text
+        
+        Returns [(question, similarity)], most similar first. Only questions
+        sharing an LSH band are fetched, through the lsh_bands index.
+        """
+        exam_ids = [ObjectId(e) if isinstance(e, str) else e for e in exam_ids]
+        fp = dedup.fingerprint(question_text, options)
+        candidates = db.questions.find(
+            {'lsh_bands': {'$in': fp['lsh_bands']}, 'exam_id': {'$in': exam_ids}},
+            {'question_text': 1, 'exam_id': 1, 'minhash': 1}
+        )
+        matches = []
+        for candidate in candidates:
+            score = dedup.similarity(fp['minhash'], candidate.get('minhash'))
+            if score >= threshold:
+                matches.append((candidate, score))
+        return sorted(matches, key=lambda match: -match[1])
+    
+    @staticmethod
+    def scan_duplicates(db, exam_ids):
+        """Flag near-duplicates among all questions of the given exams
+        
+        Older questions are kept as originals; newer copies get duplicate_of.
+        Questions created before fingerprinting are backfilled. Returns the
+        number of questions flagged.
+        """
+        from pymongo import UpdateOne
+        
+        exam_ids = [ObjectId(e) if isinstance(e, str) else e for e in exam_ids]
+        questions = list(db.questions.find(
+            {'exam_id': {'$in': exam_ids}},
+            {'question_text': 1, 'options': 1, 'minhash': 1, 'lsh_bands': 1, 'duplicate_of': 1}
+        ).sort('created_at', 1))
+        
+        operations = []
+        for question in questions:
+            if not question.get('minhash'):
+                question.update(dedup.fingerprint(question.get('question_text', ''), question.get('options')))
+                operations.append(UpdateOne({'_id': question['_id']}, {'$set': {
+                    'minhash': question['minhash'],
+                    'lsh_bands': question['lsh_bands']
+                }}))
+        
+        duplicates = dedup.find_duplicates(questions)
+        for question in questions:
+            original = duplicates.get(question['_id'], (None, 0))[0]
+            if question.get('duplicate_of') != original:
+                operations.append(UpdateOne({'_id': question['_id']}, {'$set': {'duplicate_of': original}}))
+        
+        if operations:
+            db.questions.bulk_write(operations, ordered=False)
+        return len(duplicates)
@@ -1,6 +1,6 @@
 from datetime import datetime
 from bson.objectid import ObjectId
-from werkzeug.security import generate_password_hash, check_password_hash
+from utils import passwords
 
 class User:
     """User model"""
@@ -11,7 +11,7 @@ class User:
         user_data = {
             'username': username,
             'email': email,
-            'password': generate_password_hash(password),
+            'password': passwords.hash_password(password),
             'role': role,  # 'teacher' or 'student'
             'full_name': full_name,
             'avatar_url': avatar_url or 'https://ui-avatars.com/api/?name=' + username + '&background=667eea&color=fff',
@@ -41,8 +41,19 @@ class User:
     
     @staticmethod
     def verify_password(stored_password, provided_password):
-        """Verify password"""
-        return check_password_hash(stored_password, provided_password)
+        """Verify password (in the bounded hashing pool, see utils.passwords)"""
+        return passwords.verify_password(stored_password, provided_password)
+    
+    @staticmethod
+    def authenticate(db, user, provided_password):
+        """Verify a user's password, rehashing it if PASSWORD_HASH_METHOD changed"""
+        if not passwords.verify_password(user['password'], provided_password):
+            return False
+        if passwords.needs_rehash(user['password']):
+            # Only this login knows the plain password; the old hash must still match
+            db.users.update_one({'_id': user['_id'], 'password': user['password']},
+                                {'$set': {'password': passwords.hash_password(provided_password)}})
+        return True
     
     @staticmethod
     def update(db, user_id, update_data):
@@ -66,7 +77,7 @@ class User:
         """Change user password"""
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
-        hashed_password = generate_password_hash(new_password)
+        hashed_password = passwords.hash_password(new_password)
         result = db.users.update_one(
             {'_id': user_id},
             {'$set': {
@@ -3,6 +3,8 @@ from routes.auth import login_required
 from models.exam import Exam
 from models.question import Question
 from models.exam_attempt import ExamAttempt
+from utils.grading import grade_answers
+from utils.exam_monitor import notify_attempt
 from datetime import datetime
 
 attempt_bp = Blueprint('attempt', __name__, url_prefix='/attempts')
@@ -27,6 +29,7 @@ def start_exam(exam_id):
         # Create new attempt
         try:
             attempt_id = ExamAttempt.create(db, exam_id, session['user_id'])
+            notify_attempt(exam_id)
             return redirect(url_for('attempt.take_exam', attempt_id=str(attempt_id)))
         except Exception as e:
             flash(f'Có lỗi xảy ra: {str(e)}', 'danger')
@@ -102,25 +105,11 @@ def submit_exam(attempt_id):
         # Auto-grade multiple choice and true/false questions
         exam = Exam.find_by_id(db, attempt['exam_id'])
         questions = Question.find_by_exam(db, attempt['exam_id'])
-        
-        score = 0
-        max_score = 0
-        
-        for question in questions:
-            q_id = str(question['_id'])
-            max_score += question.get('points', 1)
-            
-            # Only auto-grade multiple choice and true/false
-            if question['question_type'] in ['multiple_choice', 'true_false']:
-                student_answer = answers.get(q_id, '')
-                correct_answer = question['correct_answer']
-                
-                # Normalize answers for comparison
-                if student_answer.strip().upper() == correct_answer.strip().upper():
-                    score += question.get('points', 1)
+        score, max_score = grade_answers(questions, answers)
         
         # Grade attempt
         ExamAttempt.grade(db, attempt_id, score, max_score, exam['passing_score'])
+        notify_attempt(attempt['exam_id'])
         
         # Get the graded attempt to check if passed
         graded_attempt = ExamAttempt.find_by_id(db, attempt_id)
@@ -187,10 +176,12 @@ def my_attempts():
     
     attempts = ExamAttempt.find_by_student(db, session['user_id'])
     
-    # Get exam info for each attempt
+    # Get exam info for all attempts in one query
+    exam_ids = list({attempt['exam_id'] for attempt in attempts})
+    exams = {exam['_id']: exam for exam in db.exams.find({'_id': {'$in': exam_ids}})}
     attempts_with_exams = []
     for attempt in attempts:
-        exam = Exam.find_by_id(db, attempt['exam_id'])
+        exam = exams.get(attempt['exam_id'])
         attempts_with_exams.append({
             'attempt': attempt,
             'exam': exam
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app
-from werkzeug.security import check_password_hash
 from models.user import User
+from models.login_throttle import LoginThrottle
+from utils.passwords import PasswordHasherBusy
 from functools import wraps
 
 auth_bp = Blueprint('auth', __name__)
@@ -68,6 +69,9 @@ def register():
             User.create(db, username, email, password, role, full_name)
             flash('Đăng ký thành công! Vui lòng đăng nhập', 'success')
             return redirect(url_for('auth.login'))
+        except PasswordHasherBusy:
+            flash('Hệ thống đang bận, vui lòng thử lại sau giây lát', 'warning')
+            return render_template('auth/register.html'), 503
         except Exception as e:
             flash(f'Có lỗi xảy ra: {str(e)}', 'danger')
             return render_template('auth/register.html')
@@ -87,10 +91,27 @@ def login():
             flash('Vui lòng điền đầy đủ thông tin', 'danger')
             return render_template('auth/login.html')
         
+        # Failed logins are throttled per IP and per username before any hashing
+        config = current_app.config
+        ip_key, user_key = f'ip:{request.remote_addr}', f'user:{username}'
+        limits = {ip_key: config.get('LOGIN_MAX_FAILURES_PER_IP', 100),
+                  user_key: config.get('LOGIN_MAX_FAILURES_PER_USER', 10)}
+        if LoginThrottle.is_blocked(db, limits.keys(), limits):
+            flash('Đăng nhập sai quá nhiều lần, vui lòng thử lại sau ít phút', 'danger')
+            return render_template('auth/login.html'), 429
+        
         # Find user
         user = User.find_by_username(db, username)
         
-        if user and User.verify_password(user['password'], password):
+        try:
+            authenticated = user is not None and User.authenticate(db, user, password)
+        except PasswordHasherBusy:
+            flash('Hệ thống đang bận, vui lòng thử lại sau giây lát', 'warning')
+            return render_template('auth/login.html'), 503
+        
+        if authenticated:
+            LoginThrottle.reset(db, user_key)
+            
             # Set session
             session['user_id'] = str(user['_id'])
             session['username'] = user['username']
@@ -105,6 +126,7 @@ def login():
             else:
                 return redirect(url_for('main.student_dashboard'))
         else:
+            LoginThrottle.record_failure(db, limits.keys(), config.get('LOGIN_THROTTLE_WINDOW', 900))
             flash('Tên đăng nhập hoặc mật khẩu không đúng', 'danger')
             return render_template('auth/login.html')
     
@@ -230,17 +252,16 @@ def change_password():
     
     # Verify current password
     user = User.find_by_id(db, session['user_id'])
-    if not User.verify_password(user['password'], current_password):
-        flash('Mật khẩu hiện tại không đúng', 'danger')
-        return redirect(url_for('auth.profile'))
-    
-    # Update password
-    from werkzeug.security import generate_password_hash
     try:
-        User.update(db, session['user_id'], {
-            'password': generate_password_hash(new_password)
-        })
+        if not User.verify_password(user['password'], current_password):
+            flash('Mật khẩu hiện tại không đúng', 'danger')
+            return redirect(url_for('auth.profile'))
+        
+        # Update password
+        User.change_password(db, session['user_id'], new_password)
         flash('Đổi mật khẩu thành công!', 'success')
+    except PasswordHasherBusy:
+        flash('Hệ thống đang bận, vui lòng thử lại sau giây lát', 'warning')
     except Exception as e:
         flash(f'Có lỗi xảy ra: {str(e)}', 'danger')
     
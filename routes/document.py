@@ -3,6 +3,7 @@ from werkzeug.utils import secure_filename
 from routes.auth import login_required, teacher_required
 from models.document import Document
 from utils.file_handler import allowed_file, extract_text_from_file, save_uploaded_file
+from utils.concurrency import run_blocking
 import os
 
 document_bp = Blueprint('document', __name__, url_prefix='/documents')
@@ -53,7 +54,7 @@ def create_document():
                 file_type = file.filename.rsplit('.', 1)[1].lower()
                 
                 # Extract text
-                content = extract_text_from_file(file_path, file_type)
+                content = run_blocking(extract_text_from_file, file_path, file_type)
                 
                 if not content:
                     flash('Không thể trích xuất nội dung từ file', 'warning')
@@ -1,13 +1,23 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, send_file, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, send_file, current_app, Response
 from routes.auth import login_required, teacher_required
 from models.exam import Exam
 from models.question import Question
 from models.document import Document
 from models.exam_attempt import ExamAttempt
+from models.job import Job
+from models.exam_variant import ExamVariant
 from utils.gemini_service import GeminiAI
-from utils.pdf_exporter import PDFExporter
+from utils.export_cache import get_export_cache, export_version
+from utils.export_stream import render_spooled, send_spooled, send_stream, send_cached
+from utils.results_export import iter_result_rows, iter_csv, write_xlsx
+from utils.grading import identity_layout, read_answer_csv, import_paper_answers
+from utils.job_runner import submit_job
+from utils.question_jobs import generate_questions_job, generate_explanations_job
+from utils import exam_monitor
 from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError
 import os
+import random
 from datetime import datetime
 
 exam_bp = Blueprint('exam', __name__, url_prefix='/exams')
@@ -55,6 +65,29 @@ def create_exam():
     
     return render_template('exam/create.html')
 
+@exam_bp.route('/results/export')
+@login_required
+@teacher_required
+def export_all_results():
+    """Export results of all the teacher's exams as CSV or XLSX"""
+    from app import db
+    
+    exam_ids = Exam.find_ids_by_owner(db, session['user_id'])
+    return _send_results(db, exam_ids, 'Kết quả tất cả đề thi', request.args.get('format', 'csv'))
+
+def _send_results(db, exam_ids, name, file_format):
+    """Stream graded attempts of the exams as CSV, or as XLSX once written"""
+    rows = iter_result_rows(db, exam_ids)
+    if file_format == 'xlsx':
+        try:
+            output, length = write_xlsx(rows, current_app.config.get('EXPORT_SPOOL_MAX_MB', 4) * 1024 * 1024)
+        except ImportError:
+            flash('Chưa cài openpyxl, hãy xuất CSV', 'danger')
+            return redirect(request.referrer or url_for('exam.list_exams'))
+        return send_spooled(output, length, f"{name}.xlsx",
+                            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    return send_stream(iter_csv(rows), f"{name}.csv", 'text/csv')
+
 @exam_bp.route('/<exam_id>')
 @login_required
 def view_exam(exam_id):
@@ -76,14 +109,18 @@ def view_exam(exam_id):
     # Get statistics if teacher
     statistics = None
     attempts_with_students = []
+    variants = []
     if session.get('role') == 'teacher' and str(exam['owner_id']) == session['user_id']:
-        from models.user import User
         statistics = ExamAttempt.get_statistics(db, exam_id)
+        variants = ExamVariant.find_by_exam(db, exam_id)
         attempts = ExamAttempt.find_by_exam(db, exam_id, limit=20)
         
-        # Add student info to attempts
+        # Add student info to attempts (one query for all students)
+        student_ids = list({attempt['student_id'] for attempt in attempts})
+        students = {user['_id']: user for user in db.users.find({'_id': {'$in': student_ids}},
+                                                                 {'username': 1, 'full_name': 1, 'avatar_url': 1})}
         for attempt in attempts:
-            student = User.find_by_id(db, attempt['student_id'])
+            student = students.get(attempt['student_id'], {})
             username = student.get('username', 'N/A')
             avatar_url = student.get('avatar_url', '')
             
@@ -103,7 +140,60 @@ def view_exam(exam_id):
                          exam=exam, 
                          questions=questions,
                          statistics=statistics,
-                         attempts=attempts_with_students)
+                         attempts=attempts_with_students,
+                         variants=variants)
+
+@exam_bp.route('/<exam_id>/monitor')
+@login_required
+@teacher_required
+def monitor_exam(exam_id):
+    """Live counters of an exam in progress"""
+    from app import db
+    
+    exam = Exam.find_by_id(db, exam_id)
+    if not exam or str(exam['owner_id']) != session['user_id']:
+        flash('Không có quyền thực hiện', 'danger')
+        return redirect(url_for('exam.list_exams'))
+    
+    return render_template('exam/monitor.html', exam=exam)
+
+@exam_bp.route('/<exam_id>/monitor/stats')
+@login_required
+@teacher_required
+def monitor_stats(exam_id):
+    """Current monitoring snapshot as JSON (polled when no stream is available)"""
+    from app import db
+    
+    exam = Exam.find_by_id(db, exam_id)
+    if not exam or str(exam['owner_id']) != session['user_id']:
+        return jsonify({'success': False, 'message': 'Không có quyền thực hiện'}), 403
+    
+    monitor = exam_monitor.get_monitor(current_app._get_current_object(), exam['_id'])
+    return jsonify({'success': True, 'stats': monitor.snapshot})
+
+@exam_bp.route('/<exam_id>/monitor/stream')
+@login_required
+@teacher_required
+def monitor_stream(exam_id):
+    """Server-Sent Events with the monitoring snapshot whenever it changes"""
+    from app import db
+    
+    exam = Exam.find_by_id(db, exam_id)
+    if not exam or str(exam['owner_id']) != session['user_id']:
+        return jsonify({'success': False, 'message': 'Không có quyền thực hiện'}), 403
+    
+    # A sync worker would be held for the whole stream; the page polls instead
+    app = current_app._get_current_object()
+    monitor = exam_monitor.open_stream(app, exam['_id']) if request.environ.get('wsgi.multithread') else None
+    if monitor is None:
+        return jsonify({'success': False, 'message': 'Máy chủ bận, chuyển sang cập nhật định kỳ'}), 503
+    
+    response = Response(exam_monitor.iter_events(monitor, app.config.get('MONITOR_HEARTBEAT', 15),
+                                                 app.config.get('MONITOR_STREAM_SECONDS', 300)),
+                        mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(lambda: exam_monitor.close_stream(monitor))
+    return response
 
 @exam_bp.route('/<exam_id>/edit', methods=['GET', 'POST'])
 @login_required
@@ -216,10 +306,18 @@ def add_question(exam_id):
         correct_answer = request.form.get('sample_answer', '')
     
     try:
+        # Flag (but keep) near-duplicates of questions in the teacher's exams
+        matches = Question.find_near_duplicates(db, question_text, options,
+                                                Exam.find_ids_by_owner(db, session['user_id']))
+        duplicate_of = matches[0][0]['_id'] if matches else None
+        
         Question.create(db, exam_id, question_text, question_type, 
-                       options, correct_answer, difficulty, points)
+                       options, correct_answer, difficulty, points, duplicate_of=duplicate_of)
         Exam.update_statistics(db, exam_id)
-        flash('Thêm câu hỏi thành công!', 'success')
+        if duplicate_of:
+            flash('Đã thêm câu hỏi, nhưng câu hỏi này gần giống một câu hỏi đã có', 'warning')
+        else:
+            flash('Thêm câu hỏi thành công!', 'success')
     except Exception as e:
         flash(f'Có lỗi xảy ra: {str(e)}', 'danger')
     
@@ -297,6 +395,28 @@ def delete_question(exam_id, question_id):
     
     return redirect(url_for('exam.edit_exam', exam_id=exam_id))
 
+@exam_bp.route('/<exam_id>/scan-duplicates', methods=['POST'])
+@login_required
+@teacher_required
+def scan_duplicates(exam_id):
+    """Flag near-duplicate questions across all of the teacher's exams"""
+    from app import db
+    
+    exam = Exam.find_by_id(db, exam_id)
+    if not exam or str(exam['owner_id']) != session['user_id']:
+        return jsonify({'success': False, 'message': 'Không có quyền thực hiện'}), 403
+    
+    try:
+        flagged = Question.scan_duplicates(db, Exam.find_ids_by_owner(db, session['user_id']))
+        if flagged:
+            flash(f'Tìm thấy {flagged} câu hỏi trùng lặp', 'warning')
+        else:
+            flash('Không có câu hỏi trùng lặp', 'success')
+    except Exception as e:
+        flash(f'Có lỗi xảy ra: {str(e)}', 'danger')
+    
+    return redirect(url_for('exam.edit_exam', exam_id=exam_id))
+
 @exam_bp.route('/<exam_id>/questions/<question_id>/generate-explanation', methods=['POST'])
 @login_required
 @teacher_required
@@ -313,7 +433,7 @@ def generate_question_explanation(exam_id, question_id):
         return jsonify({'success': False, 'message': 'Không tìm thấy câu hỏi'}), 404
     
     try:
-        gemini = GeminiAI(current_app.config['GEMINI_API_KEY'])
+        gemini = GeminiAI.from_config(current_app.config, db)
         explanation = gemini.generate_explanation(
             question['question_text'],
             question['correct_answer']
@@ -339,8 +459,12 @@ def generate_questions(exam_id):
     num_easy = int(request.form.get('num_easy', 3))
     num_medium = int(request.form.get('num_medium', 5))
     num_hard = int(request.form.get('num_hard', 2))
+    fresh = request.form.get('fresh') == 'on'
+    wants_json = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
     
     if not document_ids:
+        if wants_json:
+            return jsonify({'success': False, 'message': 'Vui lòng chọn ít nhất một tài liệu'}), 400
         flash('Vui lòng chọn ít nhất một tài liệu', 'danger')
         return redirect(url_for('exam.edit_exam', exam_id=exam_id))
     
@@ -354,38 +478,105 @@ def generate_questions(exam_id):
     combined_content = '\n\n'.join(documents_content)
     
     if not combined_content:
+        if wants_json:
+            return jsonify({'success': False, 'message': 'Không thể lấy nội dung từ tài liệu'}), 400
         flash('Không thể lấy nội dung từ tài liệu', 'danger')
         return redirect(url_for('exam.edit_exam', exam_id=exam_id))
     
-    # Generate questions using Gemini
+    # Run the Gemini pipeline as a background job; questions are inserted as batches finish
     try:
-        gemini = GeminiAI(current_app.config['GEMINI_API_KEY'])
-        questions = gemini.generate_mixed_difficulty_questions(
-            combined_content, 
-            easy=num_easy, 
-            medium=num_medium, 
-            hard=num_hard
-        )
-        
-        # Add questions to exam
-        for q in questions:
-            Question.create(
-                db,
-                exam_id,
-                q.get('question_text', ''),
-                q.get('question_type', 'multiple_choice'),
-                q.get('options', []),
-                q.get('correct_answer', ''),
-                q.get('difficulty', 'medium'),
-                1
-            )
-        
-        Exam.update_statistics(db, exam_id)
-        flash(f'Đã tạo {len(questions)} câu hỏi bằng AI!', 'success')
+        job_id = Job.create(db, 'generate_questions', session['user_id'], exam_id,
+                            params={'easy': num_easy, 'medium': num_medium, 'hard': num_hard})
+        submit_job(current_app._get_current_object(), job_id, generate_questions_job,
+                   current_app.config, exam_id, session['user_id'], combined_content,
+                   num_easy, num_medium, num_hard, fresh)
     except Exception as e:
+        if wants_json:
+            return jsonify({'success': False, 'message': str(e)}), 500
         flash(f'Có lỗi xảy ra khi tạo câu hỏi: {str(e)}', 'danger')
+        return redirect(url_for('exam.edit_exam', exam_id=exam_id))
     
-    return redirect(url_for('exam.edit_exam', exam_id=exam_id))
+    if wants_json:
+        return jsonify({'success': True, 'job_id': str(job_id)}), 202
+    flash('Đang tạo câu hỏi bằng AI, câu hỏi sẽ xuất hiện khi hoàn tất', 'info')
+    return redirect(url_for('exam.edit_exam', exam_id=exam_id, job_id=str(job_id)))
+
+@exam_bp.route('/<exam_id>/generate-explanations', methods=['POST'])
+@login_required
+@teacher_required
+def generate_explanations(exam_id):
+    """Generate AI explanations for all questions of an exam that lack one"""
+    from app import db
+    
+    exam = Exam.find_by_id(db, exam_id)
+    if not exam or str(exam['owner_id']) != session['user_id']:
+        return jsonify({'success': False, 'message': 'Không có quyền thực hiện'}), 403
+    
+    try:
+        job_id = Job.create(db, 'generate_explanations', session['user_id'], exam_id)
+        submit_job(current_app._get_current_object(), job_id, generate_explanations_job,
+                   current_app.config, exam_id)
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    
+    return jsonify({'success': True, 'job_id': str(job_id)}), 202
+
+@exam_bp.route('/<exam_id>/report-cards', methods=['POST'])
+@login_required
+@teacher_required
+def generate_report_cards(exam_id):
+    """Render result reports of all students of an exam in the background"""
+    from app import db
+    from utils.report_cards import generate_report_cards_job
+    
+    exam = Exam.find_by_id(db, exam_id)
+    if not exam or str(exam['owner_id']) != session['user_id']:
+        return jsonify({'success': False, 'message': 'Không có quyền thực hiện'}), 403
+    
+    file_format = 'zip' if request.form.get('format') == 'zip' else 'pdf'
+    try:
+        job_id = Job.create(db, 'report_cards', session['user_id'], exam_id, params={'format': file_format})
+        submit_job(current_app._get_current_object(), job_id, generate_report_cards_job,
+                   current_app.config, exam_id, file_format)
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    
+    return jsonify({'success': True, 'job_id': str(job_id)}), 202
+
+@exam_bp.route('/<exam_id>/jobs/<job_id>/download')
+@login_required
+@teacher_required
+def download_job_result(exam_id, job_id):
+    """Download the file produced by a finished export job"""
+    from app import db
+    
+    job = Job.find_by_id(db, job_id)
+    if not job or str(job['owner_id']) != session['user_id'] or str(job.get('exam_id')) != exam_id:
+        flash('Không tìm thấy tác vụ', 'danger')
+        return redirect(url_for('exam.view_exam', exam_id=exam_id))
+    
+    result = job.get('result', {})
+    path = get_export_cache(current_app.config).get(result.get('key', ''), result.get('suffix', '.pdf'))
+    if job['status'] != 'completed' or not path:
+        flash('File không còn, vui lòng tạo lại', 'warning')
+        return redirect(url_for('exam.view_exam', exam_id=exam_id))
+    
+    exam = Exam.find_by_id(db, exam_id)
+    mimetype = 'application/zip' if result['suffix'] == '.zip' else 'application/pdf'
+    return send_cached(path, result['key'], f"{exam['title']} - Phiếu kết quả{result['suffix']}", mimetype)
+
+@exam_bp.route('/<exam_id>/jobs/<job_id>')
+@login_required
+@teacher_required
+def job_status(exam_id, job_id):
+    """Poll progress of a background job"""
+    from app import db
+    
+    job = Job.find_by_id(db, job_id)
+    if not job or str(job['owner_id']) != session['user_id'] or str(job.get('exam_id')) != exam_id:
+        return jsonify({'success': False, 'message': 'Không tìm thấy tác vụ'}), 404
+    
+    return jsonify({'success': True, 'job': Job.to_dict(job)})
 
 @exam_bp.route('/<exam_id>/export-pdf')
 @login_required
@@ -393,6 +584,7 @@ def generate_questions(exam_id):
 def export_pdf(exam_id):
     """Export exam to PDF"""
     from app import db
+    from utils.pdf_exporter import get_exporter  # reportlab is loaded by the first export, not at boot
     
     exam = Exam.find_by_id(db, exam_id)
     if not exam or str(exam['owner_id']) != session['user_id']:
@@ -410,19 +602,189 @@ def export_pdf(exam_id):
     shuffle_answers = request.args.get('shuffle_answers') == '1'
     include_answers = request.args.get('include_answers') == '1'
     
-    # Generate PDF
+    # The same seed gives the same shuffle (and the cached file); without
+    # one every download gets a new shuffle as before
+    seed = None
+    cacheable = True
+    if shuffle_questions or shuffle_answers:
+        seed = request.args.get('seed', type=int)
+        if seed is None:
+            seed = random.randrange(1000000)
+            cacheable = False
+    
+    def render(output):
+        get_exporter().export_exam(exam, questions, output, shuffle_questions, shuffle_answers,
+                                   include_answers, seed=seed)
+    
+    download_name = f"{exam['title']}.pdf"
     try:
-        output_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'exports')
-        os.makedirs(output_dir, exist_ok=True)
+        if not cacheable:
+            # One-off shuffle: render in memory and stream it, nothing is written to disk
+            buffer, length = render_spooled(render, current_app.config.get('EXPORT_SPOOL_MAX_MB', 4) * 1024 * 1024)
+            return send_spooled(buffer, length, download_name, 'application/pdf')
         
-        filename = f"exam_{exam_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        output_path = os.path.join(output_dir, filename)
+        # Generate PDF, or reuse the one rendered for this exam version and options
+        cache = get_export_cache(current_app.config)
+        key = cache.make_key(export_version(exam, questions), shuffle_questions=shuffle_questions,
+                             shuffle_answers=shuffle_answers, include_answers=include_answers, seed=seed)
+        output_path = cache.get_or_render(key, render)
+        return send_cached(output_path, key, download_name, 'application/pdf')
+    except Exception as e:
+        flash(f'Có lỗi xảy ra khi xuất PDF: {str(e)}', 'danger')
+        return redirect(url_for('exam.view_exam', exam_id=exam_id))
+
+@exam_bp.route('/<exam_id>/export-variants')
+@login_required
+@teacher_required
+def export_variants(exam_id):
+    """Export several shuffled variants (mã đề) and their answer key as a ZIP"""
+    from app import db
+    from utils.exam_variants import make_variant, render_variants_zip, variant_codes
+    
+    exam = Exam.find_by_id(db, exam_id)
+    if not exam or str(exam['owner_id']) != session['user_id']:
+        flash('Không có quyền thực hiện', 'danger')
+        return redirect(url_for('exam.list_exams'))
+    
+    questions = Question.find_by_exam(db, exam_id)
+    
+    if not questions:
+        flash('Đề thi chưa có câu hỏi', 'warning')
+        return redirect(url_for('exam.view_exam', exam_id=exam_id))
+    
+    count = request.args.get('count', 4, type=int)
+    count = max(1, min(count, current_app.config.get('EXPORT_MAX_VARIANTS', 24)))
+    include_answers = request.args.get('include_answers') == '1'
+    base_seed = request.args.get('seed', type=int)
+    cacheable = base_seed is not None
+    if base_seed is None:
+        base_seed = random.randrange(1000000)
+    seeds = [base_seed + i for i in range(count)]
+    
+    try:
+        # Stored variants are never overwritten: sheets already printed are
+        # graded against them. Downloading the same seeds again reuses their
+        # codes; any other export gets codes after the existing ones.
+        version = export_version(exam, questions)
+        first_code = ExamVariant.find_series(db, exam_id, seeds, version) if cacheable else None
+        is_new = first_code is None
+        if is_new:
+            first_code = ExamVariant.next_code(db, exam_id)
+        
+        def render(output):
+            render_variants_zip(exam, questions, seeds, output, include_answers,
+                                max_workers=current_app.config.get('EXPORT_WORKERS'), first_code=first_code)
         
-        exporter = PDFExporter()
-        exporter.export_exam(exam, questions, output_path, 
-                           shuffle_questions, shuffle_answers, include_answers)
+        def save_variants():
+            # Only once the ZIP exists; a failed export leaves no answer keys behind
+            if is_new:
+                ExamVariant.create_many(db, exam_id, [(code, seed, version, make_variant(questions, seed)[1])
+                                                      for code, seed in zip(variant_codes(count, first_code), seeds)])
         
-        return send_file(output_path, as_attachment=True, download_name=f"{exam['title']}.pdf")
+        download_name = f"{exam['title']} - {count} mã đề.zip"
+        if not cacheable:
+            buffer, length = render_spooled(render, current_app.config.get('EXPORT_SPOOL_MAX_MB', 4) * 1024 * 1024)
+            save_variants()
+            return send_spooled(buffer, length, download_name, 'application/zip')
+        
+        cache = get_export_cache(current_app.config)
+        key = cache.make_key(version, variants=seeds, first_code=first_code, include_answers=include_answers)
+        output_path = cache.get_or_render(key, render, suffix='.zip')
+        save_variants()
+        return send_cached(output_path, key, download_name, 'application/zip')
+    except BulkWriteError:
+        # Another export took these codes while this one was rendering
+        flash('Mã đề vừa được tạo bởi lần xuất khác, vui lòng xuất lại', 'warning')
+        return redirect(url_for('exam.view_exam', exam_id=exam_id))
     except Exception as e:
-        flash(f'Có lỗi xảy ra khi xuất PDF: {str(e)}', 'danger')
+        flash(f'Có lỗi xảy ra khi xuất đề: {str(e)}', 'danger')
         return redirect(url_for('exam.view_exam', exam_id=exam_id))
+
+@exam_bp.route('/<exam_id>/answer-sheet')
+@login_required
+@teacher_required
+def answer_sheet(exam_id):
+    """Export a bubble answer sheet for the exam or one of its variants"""
+    from app import db
+    from utils.pdf_exporter import get_exporter
+    
+    exam = Exam.find_by_id(db, exam_id)
+    if not exam or str(exam['owner_id']) != session['user_id']:
+        flash('Không có quyền thực hiện', 'danger')
+        return redirect(url_for('exam.list_exams'))
+    
+    questions = Question.find_by_exam(db, exam_id)
+    if not questions:
+        flash('Đề thi chưa có câu hỏi', 'warning')
+        return redirect(url_for('exam.view_exam', exam_id=exam_id))
+    
+    code = request.args.get('code', '')
+    if code:
+        variant = ExamVariant.find_by_code(db, exam_id, code)
+        if not variant:
+            flash(f'Không có mã đề {code}', 'warning')
+            return redirect(url_for('exam.view_exam', exam_id=exam_id))
+        layout = variant['questions']
+    else:
+        layout = identity_layout(questions)
+    
+    # Questions in printed order; removed questions keep their place
+    questions_by_id = {str(q['_id']): q for q in questions}
+    printed = [questions_by_id.get(str(item['question_id']), {'question_type': 'essay'}) for item in layout]
+    
+    def render(output):
+        get_exporter().export_answer_sheet(exam, printed, output, variant_code=code or None)
+    
+    buffer, length = render_spooled(render, current_app.config.get('EXPORT_SPOOL_MAX_MB', 4) * 1024 * 1024)
+    name = f"{exam['title']} - Phiếu trả lời{' ' + code if code else ''}.pdf"
+    return send_spooled(buffer, length, name, 'application/pdf')
+
+@exam_bp.route('/<exam_id>/import-answers', methods=['POST'])
+@login_required
+@teacher_required
+def import_answers(exam_id):
+    """Grade a CSV of scanned paper answer sheets"""
+    from app import db
+    
+    exam = Exam.find_by_id(db, exam_id)
+    if not exam or str(exam['owner_id']) != session['user_id']:
+        flash('Không có quyền thực hiện', 'danger')
+        return redirect(url_for('exam.list_exams'))
+    
+    file = request.files.get('answers_file')
+    if not file or not file.filename:
+        flash('Vui lòng chọn file CSV', 'warning')
+        return redirect(url_for('exam.view_exam', exam_id=exam_id))
+    
+    try:
+        rows = read_answer_csv(file.stream)
+        result = import_paper_answers(db, exam, rows)
+        exam_monitor.notify_attempt(exam['_id'])
+    except Exception as e:
+        flash(f'Có lỗi xảy ra khi chấm bài: {str(e)}', 'danger')
+        return redirect(url_for('exam.view_exam', exam_id=exam_id))
+    
+    flash(f"Đã chấm {result['imported']} bài làm trên giấy", 'success')
+    if result['skipped']:
+        shown = '; '.join(result['skipped'][:5])
+        more = f" (và {len(result['skipped']) - 5} bài khác)" if len(result['skipped']) > 5 else ''
+        flash(f"Bỏ qua {len(result['skipped'])} bài đã chấm trước đó: {shown}{more}", 'info')
+    if result['errors']:
+        shown = '; '.join(result['errors'][:5])
+        more = f" (và {len(result['errors']) - 5} lỗi khác)" if len(result['errors']) > 5 else ''
+        flash(f"Bỏ qua {len(result['errors'])} dòng: {shown}{more}", 'warning')
+    return redirect(url_for('exam.view_exam', exam_id=exam_id))
+
+@exam_bp.route('/<exam_id>/results/export')
+@login_required
+@teacher_required
+def export_results(exam_id):
+    """Export all graded attempts of an exam as CSV or XLSX"""
+    from app import db
+    
+    exam = Exam.find_by_id(db, exam_id)
+    if not exam or str(exam['owner_id']) != session['user_id']:
+        flash('Không có quyền thực hiện', 'danger')
+        return redirect(url_for('exam.list_exams'))
+    
+    return _send_results(db, [exam['_id']], f"Kết quả - {exam['title']}", request.args.get('format', 'csv'))
@@ -0,0 +1,26 @@
+"""Answer keys of shuffled exam variants"""
+
+from utils.exam_variants import make_variant
+
+def question(_id, correct_answer):
+    return {'_id': _id, 'question_type': 'multiple_choice', 'correct_answer': correct_answer,
+            'options': ['A. một', 'B. hai', 'C. ba', 'D. bốn'], 'points': 1}
+
+def test_correct_answer_follows_the_shuffled_option():
+    for seed in range(20):
+        variant, permutation = make_variant([question(1, 'C')], seed)
+        printed = variant[0]['options'][ord(variant[0]['correct_answer']) - ord('A')]
+        assert printed.endswith('ba')
+        assert permutation[0]['correct_answer'] == variant[0]['correct_answer']
+
+def test_unknown_answer_keeps_option_order():
+    for seed in range(20):
+        variant, permutation = make_variant([question(1, 'không rõ')], seed)
+        assert permutation[0]['option_order'] == [0, 1, 2, 3]
+        assert variant[0]['correct_answer'] == 'không rõ'
+
+def test_unknown_answer_does_not_change_other_questions():
+    for seed in range(20):
+        known, _ = make_variant([question(1, 'A'), question(2, 'B')], seed)
+        unknown, _ = make_variant([question(1, 'không rõ'), question(2, 'B')], seed)
+        assert [q for q in known if q['_id'] == 2] == [q for q in unknown if q['_id'] == 2]
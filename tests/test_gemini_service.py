@@ -0,0 +1,56 @@
+"""Timeouts and failures of GeminiAI._run_parallel"""
+
+import threading
+import time
+
+from utils.gemini_service import GeminiAI
+
+def sleeper(seconds, value):
+    time.sleep(seconds)
+    return value
+
+def test_late_call_fails_without_stretching_the_deadline():
+    service = GeminiAI(None, max_workers=2, timeout=0.3)
+    done = []
+
+    # Two waves of calls must not give the slow one two timeouts
+    calls = [(sleeper, (0.5, 'slow'), {}), (sleeper, (0.05, 1), {}), (sleeper, (0.05, 2), {})]
+    begin = time.monotonic()
+    results = service._run_parallel(calls, on_result=lambda index, result: done.append(index))
+    elapsed = time.monotonic() - begin
+
+    assert results == [None, 1, 2]
+    assert sorted(done) == [1, 2]
+    assert elapsed < 0.45
+
+def test_queued_calls_get_their_own_timeout():
+    service = GeminiAI(None, max_workers=2, timeout=0.3)
+
+    # Three waves of calls: together longer than one timeout, each well within it
+    calls = [(sleeper, (0.15, index), {}) for index in range(6)]
+    assert service._run_parallel(calls) == list(range(6))
+
+def test_hung_calls_do_not_block_later_batches():
+    service = GeminiAI(None, max_workers=2, timeout=0.3)
+    release = threading.Event()
+    try:
+        # Enough hung calls to hold every pool thread, like an upstream that never answers
+        hung = [(release.wait, (10,), {}) for _ in range(8)]
+        begin = time.monotonic()
+        assert service._run_parallel(hung) == [None] * 8
+        assert time.monotonic() - begin < 1.5
+
+        begin = time.monotonic()
+        service._run_parallel([(sleeper, (0, 'ok'), {})])
+        assert time.monotonic() - begin < 0.45
+    finally:
+        release.set()
+
+def test_failed_call_is_logged(capsys):
+    service = GeminiAI(None, max_workers=2, timeout=0.3)
+
+    def broken():
+        raise ValueError('quota exceeded')
+
+    assert service._run_parallel([(broken, (), {}), (sleeper, (0, 'ok'), {})]) == [None, 'ok']
+    assert 'quota exceeded' in capsys.readouterr().out
@@ -0,0 +1,36 @@
+"""Token check of the on-demand request profiler"""
+
+from urllib.parse import quote
+
+import pytest
+from flask import Flask
+
+from utils.profiler import init_profiler
+
+@pytest.fixture
+def client(tmp_path):
+    app = Flask(__name__)
+    app.config.update(PROFILE_TOKEN='secret', PROFILE_DIR=str(tmp_path))
+    init_profiler(app)
+
+    @app.route('/')
+    def index():
+        return 'ok'
+
+    return app.test_client()
+
+@pytest.mark.parametrize('given', ['đ', 'sécret', '秘密'])
+def test_non_ascii_token_is_rejected(client, given):
+    response = client.get('/?_profile=' + quote(given))
+    assert response.status_code == 200
+    assert 'X-Profile-Id' not in response.headers
+
+def test_non_ascii_header_is_rejected(client):
+    response = client.get('/', headers={'X-Profile': 'sécret'})
+    assert response.status_code == 200
+    assert 'X-Profile-Id' not in response.headers
+
+def test_valid_token_profiles_the_request(client):
+    response = client.get('/?_profile=secret')
+    assert response.status_code == 200
+    assert 'X-Profile-Id' in response.headers
@@ -0,0 +1,47 @@
+"""Circuit breaker bookkeeping of GeminiScheduler.stream"""
+
+import json
+
+from utils.json_stream import iter_json_array
+from utils.rate_limiter import GeminiScheduler
+
+API_KEY = 'test-key'
+
+def failures(scheduler):
+    row = scheduler._connect().execute('SELECT failures FROM breakers WHERE key = ?',
+                                       (scheduler._key(API_KEY),)).fetchone()
+    return row[0] if row else 0
+
+def make_scheduler(tmp_path):
+    scheduler = GeminiScheduler(str(tmp_path / 'scheduler.db'), failure_threshold=5)
+    scheduler.record_failure(API_KEY)
+    assert failures(scheduler) == 1
+    return scheduler
+
+def test_stream_resets_breaker_when_consumer_stops_early(tmp_path):
+    scheduler = make_scheduler(tmp_path)
+    closed = []
+
+    def chunks():
+        text = json.dumps({'questions': [{'question_text': 'Q1'}, {'question_text': 'Q2'}]})
+        try:
+            yield text[:20]
+            yield text[20:]
+            yield '\n'  # the parser has seen "]" by now and stops reading
+        finally:
+            closed.append(True)
+
+    questions = list(iter_json_array(scheduler.stream(API_KEY, chunks)))
+
+    assert [q['question_text'] for q in questions] == ['Q1', 'Q2']
+    assert closed == [True]
+    assert failures(scheduler) == 0
+
+def test_stream_resets_breaker_on_first_chunk(tmp_path):
+    scheduler = make_scheduler(tmp_path)
+    stream = scheduler.stream(API_KEY, lambda: iter(['{"questions": [', '{"a": 1}]}']))
+
+    next(stream)
+    stream.close()
+
+    assert failures(scheduler) == 0
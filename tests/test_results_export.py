@@ -0,0 +1,33 @@
+"""Spreadsheet escaping of exported results"""
+
+from types import SimpleNamespace
+
+from bson.objectid import ObjectId
+
+from utils.results_export import _rows, iter_csv
+
+class Users:
+    def __init__(self, users):
+        self.users = users
+
+    def find(self, query, projection):
+        return [user for user in self.users if user['_id'] in query['_id']['$in']]
+
+def export(full_name, username='student'):
+    exam_id, student_id = ObjectId(), ObjectId()
+    db = SimpleNamespace(users=Users([{'_id': student_id, 'username': username, 'full_name': full_name}]))
+    attempt = {'exam_id': exam_id, 'student_id': student_id, 'score': -1, 'percentage': 50}
+    return list(_rows(db, [attempt], {exam_id: 'Toán'}))[0]
+
+def test_formula_like_text_is_escaped():
+    for value in ('=HYPERLINK("http://x")', '+1', '-1', '@SUM(A1)', '\tcmd', '\rcmd'):
+        row = export(value, username=value)
+        assert row[1] == row[2] == "'" + value
+
+def test_plain_text_and_numbers_are_unchanged():
+    row = export('Nguyễn Văn A')
+    assert row[:4] == ['Toán', 'student', 'Nguyễn Văn A', -1]
+
+def test_csv_cell_starts_with_quote():
+    csv_text = b''.join(iter_csv([export('=1+1')])).decode('utf-8')
+    assert ",'=1+1," in csv_text
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+from pymongo import ASCENDING
+import hashlib
+import json
+from utils.metrics import count_cache
+
+class ResponseCache:
+    """MongoDB-backed cache for AI responses with TTL and LRU eviction"""
+
+    _indexed = set()  # collections whose indexes were ensured in this process
+
+    def __init__(self, db, ttl=7 * 86400, max_entries=5000, collection='ai_cache'):
+        """Initialize cache on a MongoDB collection"""
+        self.collection = db[collection]
+        self.ttl = ttl  # seconds
+        self.max_entries = max_entries
+        self._ensure_indexes()
+
+    def _ensure_indexes(self):
+        """Create TTL and LRU indexes once per process"""
+        name = self.collection.full_name
+        if name in ResponseCache._indexed:
+            return
+        try:
+            # MongoDB removes documents once expires_at has passed
+            self.collection.create_index('expires_at', expireAfterSeconds=0)
+            self.collection.create_index([('last_used_at', ASCENDING)])
+            ResponseCache._indexed.add(name)
+        except Exception as e:
+            print(f"Could not create cache indexes: {e}")
+
+    @staticmethod
+    def make_key(prompt, model_name, params=None):
+        """Hash prompt, model name and parameters into a cache key"""
+        payload = json.dumps({
+            'prompt': prompt,
+            'model': model_name,
+            'params': params or {}
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return cached value or None, refreshing its LRU timestamp"""
+        now = datetime.utcnow()
+        entry = self.collection.find_one_and_update(
+            {'_id': key, 'expires_at': {'$gt': now}},
+            {'$set': {'last_used_at': now}, '$inc': {'hits': 1}},
+            projection={'value': 1}
+        )
+        count_cache('ai_response', hit=entry is not None)
+        return entry['value'] if entry else None
+
+    def set(self, key, value, model_name=''):
+        """Store value and evict least recently used entries over the limit"""
+        now = datetime.utcnow()
+        self.collection.replace_one({'_id': key}, {
+            'value': value,
+            'model': model_name,
+            'hits': 0,
+            'created_at': now,
+            'last_used_at': now,
+            'expires_at': now + timedelta(seconds=self.ttl)
+        }, upsert=True)
+        self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries when over max_entries"""
+        overflow = self.collection.estimated_document_count() - self.max_entries
+        if overflow <= 0:
+            return
+        stale = self.collection.find({}, {'_id': 1}).sort('last_used_at', ASCENDING).limit(overflow)
+        ids = [entry['_id'] for entry in stale]
+        if ids:
+            self.collection.delete_many({'_id': {'$in': ids}})
+
+    def clear(self):
+        """Remove all cached responses"""
+        return self.collection.delete_many({})
@@ -0,0 +1,20 @@
+import sys
+
+# Helpers for running under gunicorn's gevent worker. There, threads and
+# sockets are monkey-patched into greenlets: network I/O yields to other
+# requests, but CPU-bound work (password hashing, PDF rendering, text
+# extraction) would stall every request of the worker. Such work is sent
+# to gevent's pool of real OS threads instead; with sync or gthread
+# workers it simply runs in the calling thread.
+
+def gevent_patched():
+    """True if the process runs under gevent with threading monkey-patched"""
+    monkey = sys.modules.get('gevent.monkey')
+    return bool(monkey and monkey.is_module_patched('threading'))
+
+def run_blocking(func, *args, **kwargs):
+    """Call a CPU-bound func without blocking gevent's event loop"""
+    if gevent_patched():
+        from gevent import get_hub
+        return get_hub().threadpool.apply(func, args, kwargs)
+    return func(*args, **kwargs)
@@ -0,0 +1,127 @@
+from functools import lru_cache
+import hashlib
+import re
+import unicodedata
+
+# 64 permutations in 16 bands of 4 rows: pairs above ~0.5 Jaccard become
+# candidates, which are then checked against DUPLICATE_THRESHOLD
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+DUPLICATE_THRESHOLD = 0.7
+
+_PRIME = (1 << 31) - 1
+
+_OPTION_PREFIX = re.compile(r'^[A-D][\.\)]\s*')
+# Sentence punctuation only; math symbols and brackets change the meaning
+_PUNCTUATION = re.compile(r'[.,!?:"\'“”‘’…]')
+_SPACED_SYMBOL = re.compile(r'\s*([^\w\s])\s*')
+
+def normalize(text):
+    """Lowercase, drop sentence punctuation and collapse whitespace"""
+    text = unicodedata.normalize('NFC', text or '').lower()
+    text = _PUNCTUATION.sub(' ', text)
+    text = ' '.join(text.split())
+    return _SPACED_SYMBOL.sub(r'\1', text)
+
+def question_fingerprint_text(question_text, options=None):
+    """Text used to fingerprint a question: its text plus sorted option texts"""
+    option_texts = sorted(_OPTION_PREFIX.sub('', str(opt)) for opt in (options or []) if opt)
+    return normalize(' '.join([question_text or ''] + option_texts))
+
+def shingles(text):
+    """Character shingles of normalized text"""
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+@lru_cache(maxsize=1)
+def _permutations():
+    """(a, b) of the NUM_PERM hash permutations; numpy is only loaded by the first fingerprint"""
+    import numpy as np
+    rng = np.random.RandomState(20240521)  # fixed so signatures are stable across processes
+    return (rng.randint(1, _PRIME, size=NUM_PERM, dtype=np.int64),
+            rng.randint(0, _PRIME, size=NUM_PERM, dtype=np.int64))
+
+def minhash(text):
+    """MinHash signature (list of NUM_PERM ints) of normalized text"""
+    import numpy as np
+    values = shingles(text)
+    if not values:
+        return [0] * NUM_PERM
+    perm_a, perm_b = _permutations()
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little') & _PRIME
+         for s in values),
+        dtype=np.int64, count=len(values)
+    )
+    # (a * x + b) mod p for every permutation, min over shingles
+    signature = ((perm_a[:, None] * hashes[None, :] + perm_b[:, None]) % _PRIME).min(axis=1)
+    return signature.tolist()
+
+def lsh_bands(signature):
+    """Band keys of a signature, e.g. '3:9f2c...'"""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(repr(rows).encode('ascii'), digest_size=8).hexdigest()
+        keys.append(f"{band}:{digest}")
+    return keys
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures"""
+    if not sig_a or not sig_b:
+        return 0.0
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_PERM
+
+def fingerprint(question_text, options=None):
+    """Return {'minhash': [...], 'lsh_bands': [...]} to store on a question"""
+    signature = minhash(question_fingerprint_text(question_text, options))
+    return {'minhash': signature, 'lsh_bands': lsh_bands(signature)}
+
+class LSHIndex:
+    """In-memory LSH index for batch scans and for checks within one batch"""
+
+    def __init__(self, threshold=DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.buckets = {}
+        self.signatures = {}
+
+    def add(self, key, signature, bands=None):
+        """Add a signature under key"""
+        self.signatures[key] = signature
+        for band in bands or lsh_bands(signature):
+            self.buckets.setdefault(band, []).append(key)
+
+    def query(self, signature, bands=None):
+        """Return [(key, similarity)] of indexed near-duplicates, best first"""
+        candidates = set()
+        for band in bands or lsh_bands(signature):
+            candidates.update(self.buckets.get(band, ()))
+        matches = []
+        for key in candidates:
+            score = similarity(signature, self.signatures[key])
+            if score >= self.threshold:
+                matches.append((key, score))
+        return sorted(matches, key=lambda match: -match[1])
+
+def find_duplicates(questions, threshold=DUPLICATE_THRESHOLD):
+    """Batch scan: map question _id -> (_id of earlier near-duplicate, similarity)
+
+    Questions are processed in the given order, so the first occurrence is
+    kept as the original.
+    """
+    index = LSHIndex(threshold)
+    duplicates = {}
+    for question in questions:
+        signature = question.get('minhash')
+        if not signature:
+            signature = fingerprint(question.get('question_text', ''), question.get('options'))['minhash']
+        bands = question.get('lsh_bands') or lsh_bands(signature)
+        matches = index.query(signature, bands)
+        if matches:
+            duplicates[question['_id']] = matches[0]
+        else:
+            index.add(question['_id'], signature, bands)
+    return duplicates
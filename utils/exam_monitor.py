@@ -0,0 +1,180 @@
+from bson.objectid import ObjectId
+from datetime import datetime
+from pymongo.errors import OperationFailure, PyMongoError
+import threading
+import json
+import time
+
+# Live exam counters for the teachers' monitoring page. Each worker keeps
+# one ExamMonitor per watched exam; a single refresher thread re-runs the
+# counting aggregation and every open stream of that exam is woken with the
+# same snapshot, so the cost depends on the number of exams watched, not
+# on the number of teachers watching. A refresh is triggered by:
+#   - notify_attempt(), called by the attempt routes of this worker
+#   - a change stream on exam_attempts (MONITOR_CHANGE_STREAM, needs a
+#     replica set), which also sees the other workers' writes
+#   - otherwise a poll every MONITOR_POLL_INTERVAL seconds
+# and never runs more than once per MONITOR_MIN_INTERVAL per exam.
+
+_monitors = {}
+_lock = threading.Lock()
+_wakeup = threading.Event()
+_refresher = None
+_watcher = None
+_streaming = False  # change stream open: skip the polling
+_open_streams = 0
+
+class ExamMonitor:
+    """Latest counters of one exam, shared by everyone watching it in this process"""
+
+    def __init__(self, exam_id):
+        self.exam_id = exam_id
+        self.snapshot = None
+        self.version = 0
+        self.dirty = True
+        self.watchers = 0
+        self.refreshed_at = 0.0
+        self.accessed_at = time.monotonic()
+        self._changed = threading.Condition()
+
+    def refresh(self, db):
+        """Re-count the attempts; wakes the streams if anything changed"""
+        from models.exam_attempt import ExamAttempt
+
+        self.dirty = False
+        counts = ExamAttempt.get_live_counts(db, self.exam_id)
+        with self._changed:
+            self.refreshed_at = time.monotonic()
+            if self.snapshot is None or any(self.snapshot[key] != value for key, value in counts.items()):
+                counts['updated_at'] = datetime.utcnow().isoformat() + 'Z'
+                self.snapshot = counts
+                self.version += 1
+                self._changed.notify_all()
+
+    def wait(self, version, timeout):
+        """(snapshot, version) once there is a snapshot newer than version, or the current one after timeout"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.snapshot is not None and self.version != version, timeout)
+            return self.snapshot, self.version
+
+def get_monitor(app, exam_id):
+    """The exam's monitor in this process, counted once right away if new"""
+    key = str(exam_id)
+    with _lock:
+        monitor = _monitors.get(key)
+        if monitor is None:
+            monitor = _monitors[key] = ExamMonitor(ObjectId(key))
+        monitor.accessed_at = time.monotonic()
+        _start_threads(app)
+    if monitor.snapshot is None:
+        monitor.refresh(app.db)
+    return monitor
+
+def notify_attempt(exam_id):
+    """An attempt of the exam started or was graded: refresh its monitor soon"""
+    monitor = _monitors.get(str(exam_id))
+    if monitor is not None:
+        monitor.dirty = True
+        _wakeup.set()
+
+def open_stream(app, exam_id):
+    """Register a stream watcher; returns the monitor, or None when MONITOR_MAX_STREAMS are open"""
+    global _open_streams
+    monitor = get_monitor(app, exam_id)
+    with _lock:
+        if _open_streams >= app.config.get('MONITOR_MAX_STREAMS', 4):
+            return None
+        _open_streams += 1
+        monitor.watchers += 1
+    return monitor
+
+def close_stream(monitor):
+    """Undo open_stream once the response is closed"""
+    global _open_streams
+    with _lock:
+        monitor.watchers -= 1
+        monitor.accessed_at = time.monotonic()
+        _open_streams -= 1
+
+def iter_events(monitor, heartbeat, duration):
+    """Server-Sent Events of the monitor's snapshots, with comment heartbeats
+
+    Ends after duration seconds so the worker thread is handed back; the
+    browser's EventSource reconnects by itself.
+    """
+    yield 'retry: 3000\n\n'
+    version = None
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        snapshot, current = monitor.wait(version, heartbeat)
+        if current != version and snapshot is not None:
+            version = current
+            yield f"event: stats\ndata: {json.dumps(snapshot)}\n\n"
+        else:
+            yield ': keep-alive\n\n'
+
+def _start_threads(app):
+    """Start the refresher (and the change stream watcher) of this process; called under _lock"""
+    global _refresher, _watcher
+    if _refresher is None:
+        _refresher = threading.Thread(target=_refresh_loop, args=(app,), name='exam-monitor', daemon=True)
+        _refresher.start()
+    if _watcher is None and app.config.get('MONITOR_CHANGE_STREAM'):
+        _watcher = threading.Thread(target=_watch_changes, args=(app,), name='exam-monitor-changes', daemon=True)
+        _watcher.start()
+
+def _refresh_loop(app):
+    global _refresher
+    min_interval = app.config.get('MONITOR_MIN_INTERVAL', 1)
+    poll_interval = app.config.get('MONITOR_POLL_INTERVAL', 5)
+    idle = app.config.get('MONITOR_IDLE_SECONDS', 60)
+    while True:
+        _wakeup.wait(min_interval)
+        _wakeup.clear()
+        now = time.monotonic()
+        with _lock:
+            # Forget exams nobody streams or polled for a while
+            for key, monitor in list(_monitors.items()):
+                if not monitor.watchers and now - monitor.accessed_at > idle:
+                    del _monitors[key]
+            if not _monitors:
+                _refresher = None
+                return
+            monitors = list(_monitors.values())
+        for monitor in monitors:
+            due = monitor.dirty or (not _streaming and now - monitor.refreshed_at >= poll_interval)
+            if due and now - monitor.refreshed_at >= min_interval:
+                try:
+                    monitor.refresh(app.db)
+                except PyMongoError as e:
+                    app.logger.warning(f"Exam monitor refresh failed for {monitor.exam_id}: {e}")
+
+def _watch_changes(app):
+    """Mark monitors dirty from a change stream on exam_attempts; falls back to polling without a replica set"""
+    global _streaming
+    # Updates carry only the _id; updateLookup adds the attempt, trimmed to its exam_id
+    pipeline = [
+        {'$match': {'operationType': {'$in': ['insert', 'update', 'replace', 'delete']}}},
+        {'$project': {'operationType': 1, 'fullDocument.exam_id': 1}}
+    ]
+    while True:
+        try:
+            with app.db.exam_attempts.watch(pipeline, full_document='updateLookup') as stream:
+                _streaming = True
+                for key in list(_monitors):  # changes while (re)connecting were missed
+                    notify_attempt(key)
+                for change in stream:
+                    exam_id = (change.get('fullDocument') or {}).get('exam_id')
+                    if exam_id is not None:
+                        notify_attempt(exam_id)
+                    else:
+                        for key in list(_monitors):
+                            notify_attempt(key)
+        except OperationFailure as e:
+            _streaming = False
+            app.logger.warning(f"Exam monitor change stream unavailable, polling instead: {e}")
+            return
+        except PyMongoError as e:
+            _streaming = False
+            app.logger.warning(f"Exam monitor change stream interrupted: {e}")
+            time.sleep(5)
@@ -0,0 +1,114 @@
+from concurrent.futures.process import BrokenProcessPool
+import zipfile
+import random
+import string
+import csv
+import io
+import os
+import re
+from utils.pdf_exporter import get_exporter
+from utils.render_pool import get_render_pool, reset_render_pool
+
+LETTERS = string.ascii_uppercase
+OPTION_PREFIX = re.compile(r'^\s*([A-Za-z])\s*[.):]\s*')
+
+def _correct_index(question):
+    """Index of the correct option of a multiple choice question, or None"""
+    answer = str(question.get('correct_answer', '')).strip().upper()
+    for index, option in enumerate(question.get('options', [])):
+        match = OPTION_PREFIX.match(option)
+        if match and match.group(1).upper() == answer:
+            return index
+    if len(answer) == 1 and answer in LETTERS and LETTERS.index(answer) < len(question.get('options', [])):
+        return LETTERS.index(answer)
+    return None
+
+def make_variant(questions, seed, shuffle_questions=True, shuffle_answers=True):
+    """Shuffle questions and options with seed and re-letter the options
+
+    Returns (variant_questions, permutation): printable question dicts with
+    the variant's correct answer, and for each printed question its
+    {'question_id', 'option_order', 'correct_answer', 'points'}. Options
+    whose correct answer cannot be located are not shuffled.
+    """
+    rng = random.Random(seed)
+    order = list(range(len(questions)))
+    if shuffle_questions:
+        rng.shuffle(order)
+
+    variant_questions = []
+    permutation = []
+    for index in order:
+        question = dict(questions[index])
+        option_order = []
+        if question.get('question_type') == 'multiple_choice':
+            options = question.get('options', [])
+            correct = _correct_index(question)
+            option_order = list(range(len(options)))
+            if shuffle_answers:
+                rng.shuffle(option_order)
+                if correct is None:
+                    # The answer cannot be re-lettered: keep the printed order. The
+                    # shuffle is still drawn so the other questions stay seed-stable
+                    option_order = list(range(len(options)))
+            question['options'] = [
+                f"{LETTERS[position]}. {OPTION_PREFIX.sub('', options[original], count=1)}"
+                for position, original in enumerate(option_order)
+            ]
+            if correct is not None:
+                question['correct_answer'] = LETTERS[option_order.index(correct)]
+        variant_questions.append(question)
+        permutation.append({
+            'question_id': question['_id'],
+            'option_order': option_order,
+            'correct_answer': question.get('correct_answer', '') if question.get('question_type') != 'essay' else '',
+            'points': question.get('points', 1)
+        })
+    return variant_questions, permutation
+
+def _render_variant(exam, questions, include_answers):
+    """Render one variant in memory (runs in a pool process); returns the PDF bytes"""
+    buffer = io.BytesIO()
+    get_exporter().export_exam(exam, questions, buffer, include_answers=include_answers)
+    return buffer.getvalue()
+
+def variant_codes(count, first=101):
+    """Printed codes of count variants: 101, 102, ..."""
+    return [str(first + i) for i in range(count)]
+
+def render_variants_zip(exam, questions, seeds, output, include_answers=False, max_workers=None, first_code=101):
+    """Render one PDF per seed in parallel and write them with the answer key to a ZIP
+
+    ``output`` is a path or a writable file. Variant i gets code
+    variant_codes(len(seeds), first_code)[i]; returns the codes.
+    """
+    codes = variant_codes(len(seeds), first_code)
+    variants = [make_variant(questions, seed) for seed in seeds]
+
+    pool = get_render_pool(max_workers or os.cpu_count() or 1)
+    try:
+        futures = [pool.submit(_render_variant, dict(exam, variant_code=code), variant_questions, include_answers)
+                   for code, (variant_questions, _) in zip(codes, variants)]
+        pdfs = [future.result() for future in futures]
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM); start a fresh pool next time
+        reset_render_pool()
+        raise
+
+    answers = [[item['correct_answer'] or 'TL' for item in permutation] for _, permutation in variants]
+    answer_key = io.BytesIO()
+    get_exporter().export_answer_key(exam, codes, answers, answer_key)
+
+    key_csv = io.StringIO()
+    writer = csv.writer(key_csv)
+    writer.writerow(['Câu'] + [f"Mã {code}" for code in codes])
+    for j in range(len(questions)):
+        writer.writerow([j + 1] + [key[j] for key in answers])
+
+    # PDFs are already compressed
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+        for code, pdf in zip(codes, pdfs):
+            archive.writestr(f"ma_de_{code}.pdf", pdf)
+        archive.writestr('dap_an.pdf', answer_key.getvalue())
+        archive.writestr('dap_an.csv', '\ufeff' + key_csv.getvalue())  # BOM so Excel reads UTF-8
+    return codes
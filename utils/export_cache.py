@@ -0,0 +1,178 @@
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from utils.metrics import count_cache
+from utils.concurrency import run_blocking
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking
+    fcntl = None
+
+def export_version(exam, questions):
+    """Digest of everything an exam export is rendered from
+
+    Question edits (including explanations) bump the question's
+    updated_at, exam edits bump the exam's, so any change gives a new key.
+    """
+    parts = [
+        str(exam['_id']),
+        exam.get('updated_at').isoformat() if exam.get('updated_at') else '',
+        str(exam.get('title', '')), str(exam.get('description', '')), str(exam.get('exam_type', '')),
+        str(exam.get('duration', '')), str(exam.get('total_points', ''))
+    ]
+    for question in questions:
+        updated_at = question.get('updated_at')
+        parts.append(f"{question['_id']}@{updated_at.isoformat() if updated_at else ''}")
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+class ExportCache:
+    """Rendered exports on disk, keyed by exam version and export options
+
+    Files are named by key, so a repeated request is served without
+    rendering. Concurrent requests for the same key are collapsed into one
+    render, within a process by a lock and across workers by a lock file.
+    Files unused for ``max_age`` seconds are removed, and the least
+    recently used ones once the directory exceeds ``max_bytes``.
+    """
+
+    SUFFIXES = ('.pdf', '.zip')
+
+    def __init__(self, directory, max_bytes=200 * 1024 * 1024, max_age=7 * 86400, evict_interval=60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.evict_interval = evict_interval  # seconds between eviction scans
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._last_evict = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(version, **options):
+        """Key for an exam version and its export options (seed, include_answers...)"""
+        payload = json.dumps({'version': version, 'options': options}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path_for(self, key, suffix='.pdf'):
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, key, suffix='.pdf'):
+        """Path of the cached export, or None; marks it as recently used"""
+        path = self.path_for(key, suffix)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    @contextmanager
+    def _lock(self, key):
+        with self._locks_guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.directory, key + '.lock'), 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get_or_render(self, key, render, suffix='.pdf'):
+        """Return the path of the export for key, calling render(path) on a miss
+
+        render writes the export to the given temporary path; it is moved
+        into place only once complete, so readers never see partial files.
+        """
+        path = self.get(key, suffix)
+        if path:
+            count_cache('export', hit=True)
+            return path
+
+        with self._lock(key):
+            # Another request may have rendered it while we waited
+            path = self.get(key, suffix)
+            count_cache('export', hit=bool(path))
+            if path:
+                return path
+
+            fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+            os.close(fd)
+            try:
+                run_blocking(render, tmp_path)
+                path = self.path_for(key, suffix)
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+        with self._locks_guard:
+            self._locks.pop(key, None)
+        self.evict()
+        return path
+
+    def evict(self, force=False):
+        """Remove stale exports, then the least recently used beyond max_bytes"""
+        now = time.time()
+        if not force and now - self._last_evict < self.evict_interval:
+            return 0
+        self._last_evict = now
+
+        entries = []
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if name.endswith('.lock') or name.endswith('.tmp'):
+                # Leftovers of crashed renders
+                if now - stat.st_mtime > 3600:
+                    removed += self._remove(path)
+                continue
+            if not name.endswith(self.SUFFIXES):
+                continue
+            if now - stat.st_mtime > self.max_age:
+                removed += self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            removed += self._remove(path)
+            total -= size
+        return removed
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return 1
+        except OSError:
+            return 0
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_export_cache(config):
+    """Return the process-wide export cache configured by the Flask config"""
+    directory = config.get('EXPORT_CACHE_DIR') or os.path.join(config['UPLOAD_FOLDER'], 'exports')
+    with _caches_lock:
+        if directory not in _caches:
+            _caches[directory] = ExportCache(
+                directory,
+                max_bytes=config.get('EXPORT_CACHE_MAX_MB', 200) * 1024 * 1024,
+                max_age=config.get('EXPORT_CACHE_MAX_AGE', 7 * 86400)
+            )
+        return _caches[directory]
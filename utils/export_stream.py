@@ -0,0 +1,80 @@
+from tempfile import SpooledTemporaryFile
+from urllib.parse import quote
+from flask import Response, send_file, stream_with_context
+import unicodedata
+from utils.concurrency import run_blocking
+
+CHUNK_SIZE = 64 * 1024
+
+def render_spooled(render, max_size=4 * 1024 * 1024):
+    """Call render(fileobj) on a buffer kept in memory up to max_size bytes
+
+    Larger exports roll over to an anonymous temporary file, so they are
+    never held fully in memory. Returns (fileobj, length), rewound.
+    """
+    buffer = SpooledTemporaryFile(max_size=max_size)
+    try:
+        run_blocking(render, buffer)
+        length = buffer.tell()
+        buffer.seek(0)
+    except Exception:
+        buffer.close()
+        raise
+    return buffer, length
+
+def iter_file(fileobj, chunk_size=CHUNK_SIZE):
+    """Yield a file in chunks and close it when done"""
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+def content_disposition(download_name):
+    """Content-Disposition options for an attachment, with a UTF-8 name for non-ASCII titles"""
+    try:
+        download_name.encode('ascii')
+        return {'filename': download_name}
+    except UnicodeEncodeError:
+        # Đ/đ have no ASCII decomposition
+        simple = download_name.replace('Đ', 'D').replace('đ', 'd')
+        simple = unicodedata.normalize('NFKD', simple).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': "UTF-8''" + quote(download_name, safe="!#$&+^`|~")}
+
+def send_spooled(fileobj, length, download_name, mimetype):
+    """Stream a rendered one-off export; it is never cached by the browser"""
+    response = Response(iter_file(fileobj), mimetype=mimetype, direct_passthrough=True)
+    response.content_length = length
+    response.headers.set('Content-Disposition', 'attachment', **content_disposition(download_name))
+    response.cache_control.private = True
+    response.cache_control.no_store = True
+    return response
+
+def send_stream(chunks, download_name, mimetype):
+    """Stream an export produced by a generator of byte chunks (no Content-Length)
+
+    The generator runs inside the request context, so it may query the
+    database while the response is being sent.
+    """
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers.set('Content-Disposition', 'attachment', **content_disposition(download_name))
+    response.headers['X-Accel-Buffering'] = 'no'  # let nginx pass chunks through
+    response.cache_control.private = True
+    response.cache_control.no_store = True
+    return response
+
+def send_cached(path, etag, download_name, mimetype):
+    """Send an export from the cache, answering 304 when the browser has this version
+
+    The URL stays the same when the exam changes, so browsers must
+    revalidate; the ETag is the export's cache key.
+    """
+    response = send_file(path, mimetype=mimetype, as_attachment=True, download_name=download_name,
+                         conditional=True, etag=etag, max_age=0)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.cache_control.public = False
+    return response
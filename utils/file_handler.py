@@ -1,7 +1,7 @@
 import os
-import PyPDF2
-from docx import Document as DocxDocument
-import markdown
+
+# PyPDF2, python-docx and markdown are imported on first use: most requests
+# never extract a document, and a worker boots faster without them
 
 def allowed_file(filename, allowed_extensions):
     """Check if file has allowed extension"""
@@ -9,6 +9,7 @@ def allowed_file(filename, allowed_extensions):
 
 def extract_text_from_pdf(file_path):
     """Extract text from PDF file"""
+    import PyPDF2
     try:
         text = []
         with open(file_path, 'rb') as file:
@@ -22,6 +23,7 @@ def extract_text_from_pdf(file_path):
 
 def extract_text_from_docx(file_path):
     """Extract text from DOCX file"""
+    from docx import Document as DocxDocument
     try:
         doc = DocxDocument(file_path)
         text = []
@@ -54,6 +56,7 @@ def extract_text_from_file(file_path, file_type):
 
 def markdown_to_html(text):
     """Convert markdown to HTML"""
+    import markdown
     return markdown.markdown(text, extensions=['fenced_code', 'tables'])
 
 def save_uploaded_file(file, upload_folder):
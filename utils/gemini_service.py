@@ -1,22 +1,230 @@
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import threading
+import math
+import time
 import json
+import re
+from utils.json_stream import iter_json_array
+from utils.rate_limiter import BULK, INTERACTIVE
+from utils.metrics import time_gemini
+
+# Shared pool so concurrent requests in one worker stay within the limit
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor(max_workers):
+    """Return the process-wide thread pool used for Gemini calls"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gemini')
+        return _executor
+
+# Rough ratio for Vietnamese text; good enough for budgeting prompt size
+CHARS_PER_TOKEN = 3
+
+def estimate_tokens(text):
+    """Estimate the number of tokens in text"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def split_content(text, max_tokens=1500):
+    """Split text into chunks of at most max_tokens, on paragraph boundaries when possible"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = ''
+    
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        
+        # Hard-split paragraphs that alone exceed the budget, at whitespace
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(' ', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(paragraph[:cut].strip())
+            paragraph = paragraph[cut:].strip()
+        
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            chunks.append(current)
+            current = ''
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    
+    if current:
+        chunks.append(current)
+    return chunks
+
+def parse_json_response(text):
+    """Parse model output as JSON, removing markdown code fences if present"""
+    result_text = text.strip()
+    if result_text.startswith('```json'):
+        result_text = result_text[7:]
+    elif result_text.startswith('```'):
+        result_text = result_text[3:]
+    if result_text.endswith('```'):
+        result_text = result_text[:-3]
+    return json.loads(result_text.strip())
+
+def is_valid_question(question):
+    """Whether a generated question has the fields needed to store it"""
+    if not isinstance(question, dict) or not str(question.get('question_text', '')).strip():
+        return False
+    question_type = question.get('question_type', 'multiple_choice')
+    if question_type == 'essay':
+        return True
+    if not question.get('correct_answer'):
+        return False
+    if question_type == 'multiple_choice':
+        options = question.get('options')
+        return isinstance(options, list) and len(options) >= 2
+    return True
+
+class QuestionReducer:
+    """Merge generated batches into the requested difficulty mix, dropping repeats
+    
+    Thread-safe; once closed, late results from timed-out calls are ignored.
+    """
+    
+    def __init__(self, wanted):
+        self.wanted = wanted  # {'easy': 3, 'medium': 5, 'hard': 2}
+        self.tiers = {difficulty: [] for difficulty in wanted}
+        self.seen = set()
+        self.closed = False
+        self.lock = threading.Lock()
+    
+    def add(self, difficulty, questions):
+        """Accept questions of a batch up to the tier's quota; returns the accepted ones"""
+        accepted = []
+        with self.lock:
+            if self.closed:
+                return accepted
+            for question in questions:
+                text = ' '.join(str(question.get('question_text', '')).lower().split())
+                if not text or text in self.seen or len(self.tiers[difficulty]) >= self.wanted[difficulty]:
+                    continue
+                self.seen.add(text)
+                question['difficulty'] = difficulty
+                self.tiers[difficulty].append(question)
+                accepted.append(question)
+        return accepted
+    
+    def close(self):
+        """Stop accepting questions"""
+        with self.lock:
+            self.closed = True
+    
+    def questions(self):
+        """All accepted questions in easy -> medium -> hard order"""
+        return [question for difficulty in ('easy', 'medium', 'hard') for question in self.tiers.get(difficulty, [])]
 
 class GeminiAI:
     """Gemini AI service for generating exam questions"""
     
-    def __init__(self, api_key):
-        """Initialize Gemini AI"""
-        if api_key:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-3-flash-preview')
-        else:
-            self.model = None
-    
-    def generate_questions(self, document_content, num_questions=10, difficulty='medium', question_type='multiple_choice'):
-        """Generate questions from document content"""
-        if not self.model:
-            raise Exception("Gemini API key not configured")
+    MODEL_NAME = 'gemini-3-flash-preview'
+    
+    def __init__(self, api_key, max_workers=4, timeout=45, batch_size=10, cache=None, chunk_tokens=1500,
+                 scheduler=None, api_endpoint=None, provider=None):
+        """Initialize Gemini AI
+        
+        ``provider`` is any LLMProvider; by default the process-wide Gemini
+        provider for api_key is used.
+        """
+        if provider is None and api_key:
+            from utils.llm_providers import get_provider
+            provider = get_provider({'GEMINI_API_KEY': api_key, 'GEMINI_API_ENDPOINT': api_endpoint},
+                                    self.MODEL_NAME)
+        self.provider = provider
+        self.model_name = provider.model_name if provider else self.MODEL_NAME
+        self.api_key = api_key or (provider.name if provider else '')
+        self.cache = cache  # optional ResponseCache
+        self.scheduler = scheduler  # optional GeminiScheduler shared across workers
+        self.max_workers = max_workers
+        self.timeout = timeout  # seconds per model call
+        self.batch_size = batch_size  # max questions per model call
+        self.chunk_tokens = chunk_tokens  # document tokens sent per model call
+    
+    @classmethod
+    def from_config(cls, config, db=None):
+        """Create service from Flask app config, with response cache if db is given
         
+        The provider (LLM_PROVIDER: 'gemini' or 'fake') is a process-wide
+        singleton, so building a service per request is cheap.
+        """
+        from utils.llm_providers import get_provider
+        
+        cache = None
+        if db is not None and config.get('AI_CACHE_ENABLED', True):
+            from utils.ai_cache import ResponseCache
+            cache = ResponseCache(
+                db,
+                ttl=config.get('AI_CACHE_TTL', 7 * 86400),
+                max_entries=config.get('AI_CACHE_MAX_ENTRIES', 5000)
+            )
+        scheduler = None
+        if config.get('GEMINI_SCHEDULER_ENABLED', True):
+            from utils.rate_limiter import get_scheduler
+            scheduler = get_scheduler(config)
+        return cls(
+            config['GEMINI_API_KEY'],
+            max_workers=config.get('GEMINI_MAX_WORKERS', 4),
+            timeout=config.get('GEMINI_TIMEOUT', 45),
+            batch_size=config.get('GEMINI_BATCH_SIZE', 10),
+            cache=cache,
+            chunk_tokens=config.get('GEMINI_CHUNK_TOKENS', 1500),
+            scheduler=scheduler,
+            provider=get_provider(config, cls.MODEL_NAME)
+        )
+    
+    def _stream_model(self, prompt, priority=BULK):
+        """Yield the model's text in chunks, through the shared scheduler when configured"""
+        with time_gemini('stream'):
+            if not self.scheduler:
+                yield from self.provider.generate_stream(prompt)
+                return
+            cost = estimate_tokens(prompt) * 2
+            yield from self.scheduler.stream(self.api_key, lambda: self.provider.generate_stream(prompt), cost, priority)
+    
+    def _call_model(self, prompt, priority=BULK):
+        """Return the model's text for prompt, through the shared scheduler when configured"""
+        with time_gemini('generate'):
+            if not self.scheduler:
+                return self.provider.generate(prompt)
+            # Budget the prompt plus a response of similar size
+            cost = estimate_tokens(prompt) * 2
+            return self.scheduler.call(self.api_key, lambda: self.provider.generate(prompt), cost, priority)
+    
+    def _cached(self, prompt, params, compute, fresh=False):
+        """Return cached result for prompt/params or compute and store it
+        
+        ``fresh`` skips the lookup but still stores the new result. Empty
+        results are never cached so failed calls are retried next time.
+        """
+        if not self.cache:
+            return compute()
+        
+        key = self.cache.make_key(prompt, self.model_name, params)
+        if not fresh:
+            try:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    return cached
+            except Exception as e:
+                print(f"Cache lookup error: {e}")
+        
+        result = compute()
+        if result:
+            try:
+                self.cache.set(key, result, self.model_name)
+            except Exception as e:
+                print(f"Cache store error: {e}")
+        return result
+    
+    def _questions_prompt(self, document_content, num_questions, difficulty, question_type):
+        """Build the question generation prompt"""
         difficulty_instructions = {
             'easy': 'Tạo câu hỏi dễ, phù hợp với học sinh có kiến thức cơ bản',
             'medium': 'Tạo câu hỏi trung bình, yêu cầu hiểu và áp dụng kiến thức',
@@ -32,7 +240,7 @@ class GeminiAI:
         prompt = f"""
 Bạn là một giáo viên THPT chuyên nghiệp. Hãy tạo {num_questions} câu hỏi từ tài liệu sau:
 
-{document_content[:4000]}  # Giới hạn nội dung để tránh vượt quá token limit
+{document_content[:self.chunk_tokens * CHARS_PER_TOKEN]}
 
 Yêu cầu:
 - Loại câu hỏi: {question_type_instructions.get(question_type, 'Trắc nghiệm')}
@@ -58,54 +266,200 @@ Trả về kết quả dưới dạng JSON với format sau:
 CHÚ Ý: Chỉ trả về JSON, không thêm text nào khác.
 """
         
+        return prompt
+    
+    def generate_questions(self, document_content, num_questions=10, difficulty='medium', question_type='multiple_choice',
+                           fresh=False, variant=0):
+        """Generate questions from document content
+        
+        ``variant`` separates cache entries of identical batches, ``fresh``
+        bypasses the cache.
+        """
+        return list(self.iter_questions(document_content, num_questions, difficulty, question_type, fresh, variant))
+    
+    def iter_questions(self, document_content, num_questions=10, difficulty='medium', question_type='multiple_choice',
+                       fresh=False, variant=0):
+        """Yield generated questions one by one as soon as each is complete
+        
+        The response is streamed through an incremental JSON parser, so a
+        malformed question is skipped without losing the others and a
+        truncated last question is salvaged when it is still valid.
+        """
+        if not self.provider:
+            raise Exception("Gemini API key not configured")
+        
+        prompt = self._questions_prompt(document_content, num_questions, difficulty, question_type)
+        key = None
+        if self.cache:
+            key = self.cache.make_key(prompt, self.model_name, {'kind': 'questions', 'variant': variant})
+            if not fresh:
+                try:
+                    cached = self.cache.get(key)
+                except Exception as e:
+                    print(f"Cache lookup error: {e}")
+                    cached = None
+                if cached:
+                    yield from cached
+                    return
+        
+        questions = []
         try:
-            response = self.model.generate_content(prompt)
-            result_text = response.text.strip()
-            
-            # Remove markdown code blocks if present
-            if result_text.startswith('```json'):
-                result_text = result_text[7:]
-            elif result_text.startswith('```'):
-                result_text = result_text[3:]
-            if result_text.endswith('```'):
-                result_text = result_text[:-3]
-            
-            result_text = result_text.strip()
-            
-            # Parse JSON
-            result = json.loads(result_text)
-            return result.get('questions', [])
-        
-        except json.JSONDecodeError as e:
-            print(f"JSON parsing error: {e}")
-            print(f"Response text: {response.text}")
-            # Return empty list if parsing fails
-            return []
+            for question in iter_json_array(self._stream_model(prompt, BULK), 'questions'):
+                if is_valid_question(question):
+                    questions.append(question)
+                    yield question
         except Exception as e:
             print(f"Error generating questions: {e}")
+        
+        if key and questions:
+            try:
+                self.cache.set(key, questions, self.model_name)
+            except Exception as e:
+                print(f"Cache store error: {e}")
+    
+    def _run_parallel(self, calls, on_result=None):
+        """Run (func, args, kwargs) calls in the shared pool
+        
+        Returns one result per call, None for calls that failed or did not
+        finish in time. ``on_result(index, result)`` is called in the calling
+        thread as soon as each call succeeds. Each call gets ``self.timeout``
+        seconds from the moment it starts running, and the whole batch one
+        timeout per wave of calls; calls still queued at the batch deadline
+        are cancelled. Running calls cannot be interrupted (the client has no
+        request timeout), so a hung call keeps its pool thread, but it never
+        holds up this or a later batch beyond its deadline.
+        """
+        executor = _get_executor(self.max_workers)
+        started = {}  # index -> time.monotonic() when the call left the queue
+        
+        def timed(index, func, args, kwargs):
+            started[index] = time.monotonic()
+            return func(*args, **kwargs)
+        
+        futures = [executor.submit(timed, index, func, args, kwargs)
+                   for index, (func, args, kwargs) in enumerate(calls)]
+        index_of = {future: index for index, future in enumerate(futures)}
+        results = [None] * len(futures)
+        
+        deadline = time.monotonic() + self.timeout * math.ceil(len(futures) / self.max_workers)
+        pending = set(futures)
+        late = 0
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            timeout = deadline - now
+            running = [started[index_of[future]] for future in pending if index_of[future] in started]
+            if running:
+                timeout = min(timeout, max(0, min(running) + self.timeout - now))
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception():
+                    print(f"Gemini call failed: {future.exception()}")
+                    continue
+                index = index_of[future]
+                results[index] = future.result()
+                if on_result:
+                    on_result(index, results[index])
+            
+            now = time.monotonic()
+            expired = {future for future in pending
+                       if index_of[future] in started and now - started[index_of[future]] >= self.timeout}
+            # Their results are discarded
+            pending -= expired
+            late += len(expired)
+        
+        for future in pending:
+            future.cancel()  # no-op for calls that started in the meantime
+        late += len(pending)
+        if late:
+            print(f"Gemini timeout: {late}/{len(futures)} calls did not finish in time")
+        
+        return results
+    
+    def plan_generation(self, document_content, easy=3, medium=5, hard=2):
+        """Plan map tasks as (chunk, difficulty, count, variant) tuples
+        
+        Requested questions are spread evenly over the document's chunks with
+        the difficulty tiers interleaved, so every part of the document is
+        covered. The number of calls depends on the number of questions, not
+        on the document length.
+        """
+        chunks = split_content(document_content, self.chunk_tokens)
+        if not chunks:
             return []
+        
+        # Interleave tiers: order every question slot by its relative position in its tier
+        slots = []
+        for difficulty, count in (('easy', easy), ('medium', medium), ('hard', hard)):
+            slots.extend(((i + 0.5) / count, difficulty) for i in range(count))
+        slots.sort(key=lambda slot: slot[0])
+        
+        counts = {}
+        for index, (_, difficulty) in enumerate(slots):
+            chunk_index = index * len(chunks) // len(slots)
+            key = (chunk_index, difficulty)
+            counts[key] = counts.get(key, 0) + 1
+        
+        tasks = []
+        for (chunk_index, difficulty), count in sorted(counts.items()):
+            variant = 0
+            while count > 0:
+                size = min(count, self.batch_size)
+                tasks.append((chunks[chunk_index], difficulty, size, variant))
+                count -= size
+                variant += 1
+        return tasks
     
-    def generate_mixed_difficulty_questions(self, document_content, easy=3, medium=5, hard=2):
-        """Generate questions with mixed difficulty levels"""
-        questions = []
+    def generate_mixed_difficulty_questions(self, document_content, easy=3, medium=5, hard=2, fresh=False,
+                                            on_batch=None, on_task_done=None):
+        """Generate questions with mixed difficulty levels over the whole document
         
-        if easy > 0:
-            easy_questions = self.generate_questions(document_content, easy, 'easy')
-            questions.extend(easy_questions)
+        Map: the document is split into token-budgeted chunks and every
+        (chunk, difficulty) batch is generated concurrently. Reduce: results
+        are trimmed to the requested count per tier, dropping repeats, and
+        returned in easy -> medium -> hard order. Batches that fail or time
+        out keep the questions streamed before the failure.
         
-        if medium > 0:
-            medium_questions = self.generate_questions(document_content, medium, 'medium')
-            questions.extend(medium_questions)
+        ``on_batch(questions)`` receives each accepted question (as a one
+        item list) from the worker thread as soon as the model has finished
+        writing it, so callers can store questions incrementally.
+        ``on_task_done(index)`` is called in the calling thread when a batch
+        completes.
+        """
+        if not self.provider:
+            raise Exception("Gemini API key not configured")
+        
+        tasks = self.plan_generation(document_content, easy, medium, hard)
+        if not tasks:
+            return []
         
-        if hard > 0:
-            hard_questions = self.generate_questions(document_content, hard, 'hard')
-            questions.extend(hard_questions)
+        reducer = QuestionReducer({'easy': easy, 'medium': medium, 'hard': hard})
         
-        return questions
+        def run_task(chunk, size, difficulty, variant):
+            for question in self.iter_questions(chunk, size, difficulty, fresh=fresh, variant=variant):
+                accepted = reducer.add(difficulty, [question])
+                if accepted and on_batch:
+                    on_batch(accepted)
+        
+        def task_done(index, result):
+            if on_task_done:
+                on_task_done(index)
+        
+        try:
+            self._run_parallel([
+                (run_task, (chunk, size, difficulty, variant), {})
+                for chunk, difficulty, size, variant in tasks
+            ], on_result=task_done)
+        finally:
+            # Timed-out calls keep streaming in the pool; drop what they produce later
+            reducer.close()
+        
+        return reducer.questions()
     
-    def generate_explanation(self, question_text, correct_answer, question_context=''):
+    def generate_explanation(self, question_text, correct_answer, question_context='', fresh=False):
         """Generate explanation for a question answer"""
-        if not self.model:
+        if not self.provider:
             raise Exception("Gemini API key not configured")
         
         prompt = f"""
@@ -126,13 +480,105 @@ Yêu cầu:
 Chỉ trả về phần giải thích, không thêm text nào khác.
 """
         
+        return self._cached(prompt, {'kind': 'explanation'}, lambda: self._request_text(prompt), fresh)
+    
+    def _request_text(self, prompt):
+        """Call the model and return plain text"""
         try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            return self._call_model(prompt, INTERACTIVE).strip()
         except Exception as e:
             print(f"Error generating explanation: {e}")
             return ""
     
+    def pack_explanation_batches(self, questions, max_tokens=3000, max_items=25):
+        """Group questions into batches whose prompt stays within max_tokens"""
+        batches = []
+        current = []
+        current_tokens = 0
+        for question in questions:
+            tokens = estimate_tokens(question.get('question_text', '') + ' '.join(question.get('options') or []))
+            if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(question)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+    
+    def generate_explanations_batch(self, questions, max_tokens=3000, on_batch=None, fresh=False):
+        """Generate explanations for many questions with few model calls
+        
+        Questions are packed into token-budgeted prompts that are sent
+        concurrently. Each response maps item numbers back to question ids.
+        ``on_batch({question_id: explanation})`` is called as each prompt
+        finishes. Returns all explanations as {question_id: explanation}.
+        """
+        if not self.provider:
+            raise Exception("Gemini API key not configured")
+        
+        batches = self.pack_explanation_batches(questions, max_tokens)
+        explanations = {}
+        
+        def collect(index, result):
+            # Item numbers are positions in the batch, so ids never pass through the model
+            batch = batches[index]
+            mapped = {}
+            for number, explanation in (result or {}).items():
+                position = int(number) - 1
+                if 0 <= position < len(batch) and explanation:
+                    mapped[str(batch[position]['_id'])] = explanation
+            explanations.update(mapped)
+            if on_batch:
+                on_batch(mapped)
+        
+        self._run_parallel([
+            (self._explain_batch, (batch,), {'fresh': fresh}) for batch in batches
+        ], on_result=collect)
+        
+        return explanations
+    
+    def _explain_batch(self, batch, fresh=False):
+        """One model call for a batch; returns {'1': explanation, ...}"""
+        items = []
+        for number, question in enumerate(batch, 1):
+            options = '\n'.join(question.get('options') or [])
+            items.append(f"[{number}] Câu hỏi: {question.get('question_text', '')}\n{options}\n"
+                         f"Đáp án đúng: {question.get('correct_answer', '')}")
+        items_text = '\n\n'.join(items)
+        
+        prompt = f"""
+Bạn là một giáo viên THPT nhiệt tình. Hãy giải thích tại sao đáp án đúng là đúng cho từng câu hỏi sau:
+
+{items_text}
+
+Yêu cầu:
+- Mỗi giải thích ngắn gọn, dễ hiểu (2-3 câu)
+- Phù hợp với học sinh THPT
+- Tập trung vào kiến thức cốt lõi
+
+Trả về kết quả dưới dạng JSON với format sau, "id" là số thứ tự trong ngoặc vuông:
+{{
+  "explanations": [
+    {{"id": 1, "explanation": "Giải thích cho câu [1]"}}
+  ]
+}}
+
+CHÚ Ý: Chỉ trả về JSON, không thêm text nào khác.
+"""
+        
+        def request():
+            try:
+                result = parse_json_response(self._call_model(prompt, BULK))
+                return {str(item['id']): str(item.get('explanation', '')).strip()
+                        for item in result.get('explanations', []) if 'id' in item}
+            except Exception as e:
+                print(f"Error generating explanations: {e}")
+                return {}
+        
+        return self._cached(prompt, {'kind': 'explanations'}, request, fresh)
+    
     def enhance_question_with_explanation(self, question_data, document_content=''):
         """Add AI-generated explanation to a question"""
         try:
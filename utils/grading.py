@@ -0,0 +1,212 @@
+import string
+import csv
+import io
+
+# numpy is imported by the paper-sheet functions that use it, so grading
+# online attempts does not load it
+
+LETTERS = string.ascii_uppercase
+BLANK_MARKS = set('-_.* 0')
+TRUE_FALSE = ['Đúng', 'Sai']  # printed as bubbles A and B
+
+def grade_answers(questions, answers):
+    """Score one attempt; answers is {question_id: answer}. Returns (score, max_score)
+
+    Only multiple choice and true/false questions are auto-graded; essay
+    points count towards max_score.
+    """
+    score = 0
+    max_score = 0
+    for question in questions:
+        points = question.get('points', 1)
+        max_score += points
+        if question['question_type'] in ['multiple_choice', 'true_false']:
+            student_answer = answers.get(str(question['_id']), '')
+            # Normalize answers for comparison
+            if student_answer.strip().upper() == question['correct_answer'].strip().upper():
+                score += points
+    return score, max_score
+
+def identity_layout(questions):
+    """Sheet layout of an exam printed without shuffling, shaped like ExamVariant questions"""
+    return [{
+        'question_id': question['_id'],
+        'option_order': list(range(len(question.get('options', [])))) if question['question_type'] == 'multiple_choice' else [],
+        'correct_answer': question.get('correct_answer', '') if question['question_type'] != 'essay' else '',
+        'points': question.get('points', 1)
+    } for question in questions]
+
+def letter_code(letter, true_false=False):
+    """1 for A, 2 for B... 0 for a blank, -1 for an unreadable mark
+
+    True/false questions also accept Đ (Đúng) and S (Sai).
+    """
+    if not letter or letter in BLANK_MARKS:
+        return 0
+    letter = letter.upper()
+    if true_false and letter in ('Đ', 'S'):
+        return 1 if letter == 'Đ' else 2
+    return LETTERS.index(letter) + 1 if letter in LETTERS else -1
+
+def key_vector(layout, questions_by_id):
+    """Printed answer codes and points of a layout; essay questions get key 0"""
+    import numpy as np
+    key = np.zeros(len(layout), dtype=np.int8)
+    points = np.zeros(len(layout), dtype=np.float64)
+    for j, item in enumerate(layout):
+        question = questions_by_id.get(str(item['question_id']))
+        points[j] = item.get('points', 1)
+        if not question or question['question_type'] == 'essay':
+            continue
+        answer = item['correct_answer']
+        if question['question_type'] == 'true_false':
+            key[j] = TRUE_FALSE.index(answer) + 1 if answer in TRUE_FALSE else 0
+        else:
+            key[j] = letter_code(answer) if len(answer) == 1 else 0
+    return key, points
+
+def response_matrix(answer_strings, true_false_columns):
+    """Encode answer strings (one character per printed question) as an int8 matrix
+
+    ``true_false_columns`` flags the printed positions of true/false
+    questions. Codes match letter_code(); the whole batch is converted at
+    once from the strings' code points.
+    """
+    import numpy as np
+    num_questions = len(true_false_columns)
+    if not answer_strings or not num_questions:
+        return np.zeros((len(answer_strings), num_questions), dtype=np.int8)
+    
+    padded = [answers[:num_questions].ljust(num_questions, '-') for answers in answer_strings]
+    marks = np.array(padded, dtype=f'<U{num_questions}').view(np.uint32).reshape(len(padded), num_questions)
+    marks = np.where((marks >= ord('a')) & (marks <= ord('z')), marks - 32, marks)
+    marks = np.where(marks == ord('đ'), ord('Đ'), marks)
+    
+    codes = np.where((marks >= ord('A')) & (marks <= ord('Z')), marks.astype(np.int16) - ord('A') + 1, -1)
+    codes[np.isin(marks, [ord(mark) for mark in BLANK_MARKS])] = 0
+    true_false = np.asarray(true_false_columns, dtype=bool)
+    codes = np.where(true_false & (marks == ord('Đ')), 1, codes)
+    codes = np.where(true_false & (marks == ord('S')), 2, codes)
+    return codes.astype(np.int8)
+
+def score_matrix(responses, key, points):
+    """Scores of all sheets at once: (scores, correct) for an (n_sheets, n_questions) matrix"""
+    correct = (responses == key) & (key > 0)
+    return correct @ points, correct
+
+def original_answers(layout, questions_by_id, response_row):
+    """Map one sheet's printed marks back to {question_id: answer} in the original option order"""
+    answers = {}
+    for j, item in enumerate(layout):
+        code = int(response_row[j])
+        question = questions_by_id.get(str(item['question_id']))
+        if code <= 0 or not question:
+            continue
+        if question['question_type'] == 'true_false':
+            if code <= len(TRUE_FALSE):
+                answers[str(item['question_id'])] = TRUE_FALSE[code - 1]
+        elif question['question_type'] == 'multiple_choice':
+            option_order = item['option_order']
+            if code <= len(option_order):
+                answers[str(item['question_id'])] = LETTERS[option_order[code - 1]]
+    return answers
+
+def read_answer_csv(stream):
+    """Parse an uploaded CSV of scanned sheets
+
+    Expected columns: username, code (mã đề, empty for an unshuffled
+    exam) and answers, one character per printed question (A-Z, Đ/S for
+    true/false, - or blank for no answer). Returns a list of
+    {'username', 'code', 'answers'} rows.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    rows = []
+    for row in csv.DictReader(text):
+        row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+        if not row.get('username'):
+            continue
+        rows.append({
+            'username': row['username'],
+            'code': row.get('code', '') or row.get('ma_de', ''),
+            'answers': row.get('answers', '').replace(' ', '-')
+        })
+    return rows
+
+def import_paper_answers(db, exam, rows, batch_size=1000):
+    """Grade scanned answer sheets and store them as graded attempts
+
+    Sheets are grouped by variant code and each group is scored in one
+    vectorized pass against the variant's answer key; marks are mapped
+    back through the variant's permutation so stored answers refer to the
+    original questions and options. A sheet already imported for the same
+    student and variant code is skipped, so uploading a CSV twice does not
+    duplicate attempts. Returns {'imported', 'skipped', 'errors'} where
+    skipped and errors are messages per CSV line.
+    """
+    import numpy as np
+    from models.question import Question
+    from models.exam_variant import ExamVariant
+    from models.exam_attempt import ExamAttempt
+
+    questions = Question.find_by_exam(db, exam['_id'])
+    questions_by_id = {str(question['_id']): question for question in questions}
+    layouts = {variant['code']: variant['questions'] for variant in ExamVariant.find_by_exam(db, exam['_id'])}
+    layouts[''] = identity_layout(questions)
+
+    usernames = list({row['username'] for row in rows})
+    students = {}
+    for start in range(0, len(usernames), batch_size):
+        for user in db.users.find({'username': {'$in': usernames[start:start + batch_size]}}, {'username': 1}):
+            students[user['username']] = user['_id']
+
+    imported_sheets = set()
+    student_ids = list(students.values())
+    for start in range(0, len(student_ids), batch_size):
+        imported_sheets |= ExamAttempt.find_paper_sheets(db, exam['_id'], student_ids[start:start + batch_size])
+
+    errors = []
+    skipped = []
+    groups = {}
+    for line, row in enumerate(rows, 2):  # line 1 is the CSV header
+        if row['username'] not in students:
+            errors.append(f"Dòng {line}: không tìm thấy học sinh '{row['username']}'")
+        elif row['code'] not in layouts:
+            errors.append(f"Dòng {line}: không có mã đề '{row['code']}'")
+        elif len(row['answers']) != len(layouts[row['code']]):
+            errors.append(f"Dòng {line}: có {len(row['answers'])} câu trả lời, "
+                          f"đề có {len(layouts[row['code']])} câu")
+        elif (students[row['username']], row['code']) in imported_sheets:
+            skipped.append(f"Dòng {line}: bài của '{row['username']}' (mã đề '{row['code']}') đã được chấm")
+        else:
+            imported_sheets.add((students[row['username']], row['code']))
+            groups.setdefault(row['code'], []).append(row)
+
+    attempts = []
+    imported = 0
+    for code, group in groups.items():
+        layout = layouts[code]
+        key, points = key_vector(layout, questions_by_id)
+        true_false = [questions_by_id.get(str(item['question_id']), {}).get('question_type') == 'true_false'
+                      for item in layout]
+        responses = response_matrix([row['answers'] for row in group], true_false)
+        scores, _ = score_matrix(responses, key, points)
+        max_score = float(points.sum())
+        percentages = np.round(scores / max_score * 100, 2) if max_score > 0 else np.zeros(len(group))
+
+        for i, row in enumerate(group):
+            attempts.append({
+                'exam_id': exam['_id'],
+                'student_id': students[row['username']],
+                'answers': original_answers(layout, questions_by_id, responses[i]),
+                'score': float(scores[i]),
+                'max_score': max_score,
+                'percentage': float(percentages[i]),
+                'passed': bool(percentages[i] >= exam.get('passing_score', 50)),
+                'source': 'paper',
+                'variant_code': code
+            })
+            if len(attempts) >= batch_size:
+                imported += len(ExamAttempt.create_graded_many(db, attempts))
+                attempts = []
+    imported += len(ExamAttempt.create_graded_many(db, attempts))
+    return {'imported': imported, 'skipped': skipped, 'errors': errors}
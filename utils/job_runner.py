@@ -0,0 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import traceback
+
+# Jobs run in a small pool inside the worker process, outside the request,
+# so the web thread returns immediately. Job state lives in MongoDB so any
+# worker can answer progress requests.
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor(max_workers):
+    """Return the process-wide job pool"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        return _executor
+
+def submit_job(app, job_id, func, *args, **kwargs):
+    """Run func(db, job_id, *args, **kwargs) in the background within an app context
+
+    The job is marked failed if func raises.
+    """
+    from models.job import Job
+
+    def run():
+        with app.app_context():
+            db = app.db
+            try:
+                Job.start(db, job_id)
+                func(db, job_id, *args, **kwargs)
+            except Exception as e:
+                traceback.print_exc()
+                Job.fail(db, job_id, str(e))
+
+    return _get_executor(app.config.get('JOB_WORKERS', 2)).submit(run)
@@ -0,0 +1,163 @@
+import json
+import re
+
+class IncrementalArrayParser:
+    """Incrementally extract the objects of a JSON array from streamed text
+
+    Feed chunks of model output as they arrive; every object of the array
+    under ``key`` (or of a bare top-level array) is returned as soon as its
+    closing brace is seen. Objects that are not valid JSON are skipped
+    without losing the rest, and close() salvages a truncated last object.
+    """
+
+    def __init__(self, key='questions'):
+        self._start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self.buffer = ''
+        self.started = False
+        self.finished = False
+        self.pos = 0
+        self.obj_start = None
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.skipped = 0  # malformed objects dropped
+
+    def _find_start(self):
+        match = self._start.search(self.buffer)
+        if match:
+            return match.end()
+        # Bare array, possibly after a ```json fence
+        stripped = self.buffer.lstrip()
+        if stripped.startswith('```'):
+            newline = stripped.find('\n')
+            stripped = stripped[newline + 1:].lstrip() if newline >= 0 else ''
+        if stripped.startswith('['):
+            return self.buffer.index('[') + 1
+        return None
+
+    def feed(self, text):
+        """Add a chunk of text; returns the objects completed by it"""
+        if self.finished:
+            return []
+        self.buffer += text
+        if not self.started:
+            start = self._find_start()
+            if start is None:
+                return []
+            self.started = True
+            self.pos = start
+
+        objects = []
+        buffer = self.buffer
+        i = self.pos
+        while i < len(buffer):
+            ch = buffer[i]
+            if self.obj_start is None:
+                if ch == '{':
+                    self.obj_start = i
+                    self.stack = ['}']
+                elif ch == ']':
+                    self.finished = True
+                    break
+            elif self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                self.stack.append('}' if ch == '{' else ']')
+            elif ch in '}]':
+                if self.stack:
+                    self.stack.pop()
+                if not self.stack:
+                    obj = self._load(buffer[self.obj_start:i + 1])
+                    if obj is not None:
+                        objects.append(obj)
+                    self.obj_start = None
+            i += 1
+
+        # Keep only the unfinished object in memory
+        if self.obj_start is not None:
+            self.buffer = buffer[self.obj_start:]
+            self.pos = i - self.obj_start
+            self.obj_start = 0
+        else:
+            self.buffer = ''
+            self.pos = 0
+        return objects
+
+    def _load(self, text):
+        try:
+            obj = json.loads(text)
+        except ValueError:
+            self.skipped += 1
+            return None
+        return obj if isinstance(obj, dict) else None
+
+    def close(self):
+        """End of stream: return the truncated last object if it can be repaired"""
+        if self.finished or self.obj_start is None:
+            return []
+        tail = self.buffer[self.obj_start:]
+        # Close open strings/brackets; if that fails, drop the last partial field
+        candidates = [tail]
+        cut = len(tail)
+        for _ in range(5):
+            cut = tail.rfind(',', 0, cut)
+            if cut <= 0:
+                break
+            candidates.append(tail[:cut])
+        for candidate in candidates:
+            try:
+                obj = json.loads(candidate + _closers(candidate))
+            except ValueError:
+                continue
+            if isinstance(obj, dict):
+                return [obj]
+        self.skipped += 1
+        return []
+
+def _closers(text):
+    """Characters needed to close the strings and brackets left open in text"""
+    stack = []
+    in_string = escape = False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]' and stack:
+            stack.pop()
+    return ('"' if in_string else '') + ''.join(reversed(stack))
+
+def iter_json_array(chunks, key='questions'):
+    """Yield objects of the array under key from an iterable of text chunks
+
+    Once the array is closed the rest of the stream is not read; a chunk
+    generator is closed right away so it can release its connection.
+    """
+    parser = IncrementalArrayParser(key)
+    chunks = iter(chunks)
+    try:
+        for chunk in chunks:
+            for obj in parser.feed(chunk):
+                yield obj
+            if parser.finished:
+                return
+        for obj in parser.close():
+            yield obj
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
@@ -0,0 +1,151 @@
+import json
+import random
+import re
+import threading
+import time
+from utils.concurrency import gevent_patched
+
+class LLMProvider:
+    """Interface for text generation backends used by GeminiAI"""
+
+    name = 'base'
+    model_name = ''
+
+    def generate(self, prompt):
+        """Return the model's text response for prompt"""
+        raise NotImplementedError
+
+    def generate_stream(self, prompt):
+        """Yield the model's response in chunks as they arrive"""
+        yield self.generate(prompt)
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini backend
+
+    One instance per (API key, model, endpoint) is kept for the whole
+    process, so genai is configured once and the model's client connection
+    is reused across requests.
+    """
+
+    name = 'gemini'
+
+    def __init__(self, api_key, model_name, api_endpoint=None):
+        import google.generativeai as genai
+
+        if api_endpoint:
+            # e.g. a local fake server: http://127.0.0.1:8765
+            genai.configure(api_key=api_key, transport='rest', client_options={'api_endpoint': api_endpoint})
+        elif gevent_patched():
+            # gRPC blocks gevent's event loop; REST goes through patched sockets
+            genai.configure(api_key=api_key, transport='rest')
+        else:
+            genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt):
+        return self.model.generate_content(prompt).text
+
+    def generate_stream(self, prompt):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            yield chunk.text
+
+class FakeProviderError(Exception):
+    """Simulated quota error raised by FakeProvider"""
+
+class FakeProvider(LLMProvider):
+    """Deterministic offline backend for load tests
+
+    Returns valid question/explanation JSON shaped like Gemini's answers
+    after ``latency`` seconds (+/- ``jitter``), and fails a ``failure_rate``
+    share of calls with a quota error. Seeded, so runs are reproducible.
+    """
+
+    name = 'fake'
+
+    def __init__(self, latency=0.5, jitter=0.5, failure_rate=0.0, seed=0, model_name='fake-model'):
+        self.latency = latency
+        self.jitter = jitter  # fraction of latency
+        self.failure_rate = failure_rate
+        self.model_name = model_name
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            return self._random.random(), self._random.uniform(-self.jitter, self.jitter), self._random.getrandbits(48)
+
+    def generate(self, prompt):
+        failure, jitter, token = self._draw()
+        time.sleep(max(0.0, self.latency * (1 + jitter)))
+        if failure < self.failure_rate:
+            raise FakeProviderError('429 Resource has been exhausted (fake)')
+        return fake_response(prompt, token)
+
+    def generate_stream(self, prompt, chunk_size=64):
+        """First chunk after a fifth of the latency, the rest spread over the remainder"""
+        failure, jitter, token = self._draw()
+        latency = max(0.0, self.latency * (1 + jitter))
+        time.sleep(latency * 0.2)
+        if failure < self.failure_rate:
+            raise FakeProviderError('429 Resource has been exhausted (fake)')
+        text = fake_response(prompt, token)
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)] or ['']
+        for chunk in chunks:
+            yield chunk
+            time.sleep(latency * 0.8 / len(chunks))
+
+def fake_response(prompt, token=0):
+    """Answer shaped like the model's for each prompt used by GeminiAI"""
+    items = re.findall(r'^\[(\d+)\] Câu hỏi:', prompt, re.M)
+    if items:
+        return json.dumps({'explanations': [
+            {'id': int(number), 'explanation': f'Giải thích mẫu cho câu {number}.'} for number in items
+        ]}, ensure_ascii=False)
+
+    match = re.search(r'Hãy tạo (\d+) câu hỏi', prompt)
+    if not match:
+        return 'Đây là giải thích mẫu cho đáp án đúng.'
+
+    difficulty = re.search(r'"difficulty": "(\w+)"', prompt)
+    difficulty = difficulty.group(1) if difficulty else 'medium'
+    questions = []
+    for i in range(int(match.group(1))):
+        seed = (token + i * 7919) & 0xFFFFFFFFFFFF
+        questions.append({
+            'question_text': f'Câu hỏi mẫu {seed:x}: nội dung số {i + 1} là gì?',
+            'question_type': 'multiple_choice',
+            'options': [f'A. Đáp án {seed % 97}', f'B. Đáp án {seed % 89 + 100}',
+                        f'C. Đáp án {seed % 83 + 200}', f'D. Đáp án {seed % 79 + 300}'],
+            'correct_answer': 'ABCD'[seed % 4],
+            'difficulty': difficulty,
+            'explanation': 'Giải thích mẫu'
+        })
+    return json.dumps({'questions': questions}, ensure_ascii=False)
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+def get_provider(config, model_name):
+    """Return the process-wide provider selected by LLM_PROVIDER, or None without an API key"""
+    name = config.get('LLM_PROVIDER', 'gemini')
+    if name == 'fake':
+        key = ('fake',)
+    else:
+        if not config.get('GEMINI_API_KEY'):
+            return None
+        key = ('gemini', config['GEMINI_API_KEY'], model_name, config.get('GEMINI_API_ENDPOINT') or None)
+
+    with _providers_lock:
+        if key not in _providers:
+            if name == 'fake':
+                _providers[key] = FakeProvider(
+                    latency=config.get('FAKE_LLM_LATENCY', 0.5),
+                    failure_rate=config.get('FAKE_LLM_FAILURE_RATE', 0.0),
+                    seed=config.get('FAKE_LLM_SEED', 0)
+                )
+            else:
+                _providers[key] = GeminiProvider(key[1], model_name, key[3])
+        return _providers[key]
@@ -0,0 +1,135 @@
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram
+from pymongo import monitoring
+import time
+import os
+
+# Prometheus metrics of the web app. Under gunicorn every worker process
+# writes its samples to PROMETHEUS_MULTIPROC_DIR (set in gunicorn.conf.py
+# before this module is imported) and /metrics merges the files of all
+# workers, so each scrape sees the whole server whichever worker answers.
+# Without that variable (flask run, scripts) the process's own values are
+# served.
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Request handling time',
+                            ['method', 'endpoint'])
+REQUESTS = Counter('http_requests_total', 'Requests handled', ['method', 'endpoint', 'status'])
+IN_PROGRESS = Gauge('http_requests_in_progress', 'Requests being handled', multiprocess_mode='livesum')
+
+MONGO_POOL_SIZE = Gauge('mongodb_pool_max_size', 'maxPoolSize of each worker\'s MongoDB pool',
+                        multiprocess_mode='max')
+MONGO_CONNECTIONS = Gauge('mongodb_pool_connections', 'Open MongoDB connections', multiprocess_mode='livesum')
+MONGO_CHECKED_OUT = Gauge('mongodb_pool_checked_out', 'MongoDB connections in use', multiprocess_mode='livesum')
+MONGO_CHECKOUT_FAILURES = Counter('mongodb_pool_checkout_failures_total', 'Failed connection checkouts', ['reason'])
+
+GEMINI_LATENCY = Histogram('gemini_call_duration_seconds', 'Gemini call time, including rate limiting and retries',
+                           ['call'], buckets=(0.25, 0.5, 1, 2, 5, 10, 20, 30, 45, 60, 120))
+GEMINI_ERRORS = Counter('gemini_call_errors_total', 'Failed Gemini calls', ['call', 'error'])
+
+EXPORT_LATENCY = Histogram('pdf_export_duration_seconds', 'PDF rendering time', ['kind'],
+                           buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+
+CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups; hit ratio = hit / (hit + miss)',
+                         ['cache', 'result'])
+
+def multiprocess_dir():
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir')
+
+def count_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+@contextmanager
+def time_export(kind):
+    """Observe the duration of a PDF export"""
+    with EXPORT_LATENCY.labels(kind).time():
+        yield
+
+@contextmanager
+def time_gemini(call):
+    """Observe a Gemini call and count it as an error by exception type if it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        GEMINI_ERRORS.labels(call, type(e).__name__).inc()
+        raise
+    finally:
+        GEMINI_LATENCY.labels(call).observe(time.perf_counter() - start)
+
+class PoolListener(monitoring.ConnectionPoolListener):
+    """Tracks open and checked out connections of the MongoClient's pools"""
+
+    def pool_created(self, event):
+        MONGO_POOL_SIZE.set(event.options.get('maxPoolSize', 100))
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        MONGO_CONNECTIONS.inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        MONGO_CONNECTIONS.dec()
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        MONGO_CHECKOUT_FAILURES.labels(str(event.reason)).inc()
+
+    def connection_checked_out(self, event):
+        MONGO_CHECKED_OUT.inc()
+
+    def connection_checked_in(self, event):
+        MONGO_CHECKED_OUT.dec()
+
+def init_metrics(app):
+    """Time every request and serve /metrics in Prometheus text format
+
+    With METRICS_TOKEN set, /metrics requires "Authorization: Bearer <token>".
+    """
+    from flask import request, Response, abort
+    from prometheus_client import CollectorRegistry, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+
+    @app.before_request
+    def start_request_timer():
+        request.environ['metrics.start'] = time.perf_counter()
+        IN_PROGRESS.inc()
+
+    @app.after_request
+    def observe_request(response):
+        start = request.environ.get('metrics.start')
+        if start is not None:
+            # Unmatched URLs share one label so scanners cannot blow up the series count
+            endpoint = request.endpoint or 'unmatched'
+            REQUEST_LATENCY.labels(request.method, endpoint).observe(time.perf_counter() - start)
+            REQUESTS.labels(request.method, endpoint, str(response.status_code)).inc()
+        return response
+
+    @app.teardown_request
+    def finish_request_timer(exc):
+        if request.environ.pop('metrics.start', None) is not None:
+            IN_PROGRESS.dec()
+
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus scrape endpoint"""
+        token = app.config.get('METRICS_TOKEN')
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            abort(403)
+        if multiprocess_dir():
+            from prometheus_client import multiprocess
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
@@ -0,0 +1,59 @@
+from pymongo import MongoClient
+import threading
+import os
+
+class ProcessLocalDatabase:
+    """Default database of a MongoClient created on first use in each process
+
+    A MongoClient must not be shared across fork: its pooled sockets and
+    monitor threads belong to the process that opened them. Gunicorn forks
+    workers from the master (and with preload the app is created before
+    the fork), so the client is made lazily and again whenever the process
+    id changes. Attribute and item access go to the pymongo Database, so
+    app.db.users and app.db['users'] work as before; the client itself is
+    thread-safe and shared by all threads (or greenlets) of the worker.
+    """
+
+    def __init__(self, uri, **options):
+        self.uri = uri
+        self.options = options
+        self._pid = None
+        self._client = None
+        self._database = None
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            # The lock may have been held by another thread at fork time
+            os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        pid = os.getpid()
+        with self._lock:
+            if self._pid != pid:
+                # The parent's client is left alone; closing it here would close the parent's sockets
+                self._client = MongoClient(self.uri, **self.options)
+                self._database = self._client.get_database()
+                self._pid = pid
+
+    @property
+    def client(self):
+        """This process's MongoClient"""
+        if self._pid != os.getpid():
+            self._connect()
+        return self._client
+
+    def get(self):
+        """This process's pymongo Database"""
+        if self._pid != os.getpid():
+            self._connect()
+        return self._database
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+    def __getitem__(self, name):
+        return self.get()[name]
@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from werkzeug.security import generate_password_hash, check_password_hash
+import threading
+import os
+from utils.concurrency import gevent_patched, run_blocking
+
+# Password hashing is the most CPU-heavy part of a login. hashlib's scrypt
+# and pbkdf2 release the GIL, so hashes run in a small process-wide pool
+# sized to the CPUs; a semaphore bounds how many requests may wait for it
+# so a login storm gets a quick "busy" answer instead of an ever-growing
+# queue.
+DEFAULT_METHOD = 'scrypt'  # werkzeug's default, scrypt:32768:8:1
+
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+
+class PasswordHasherBusy(Exception):
+    """Raised when no hashing slot frees up within the queue timeout"""
+
+def _config():
+    """Hashing settings of the current app, or defaults outside a request"""
+    from flask import current_app, has_app_context
+    config = current_app.config if has_app_context() else {}
+    return {
+        'method': config.get('PASSWORD_HASH_METHOD') or DEFAULT_METHOD,
+        'workers': config.get('PASSWORD_HASH_WORKERS') or os.cpu_count() or 1,
+        'queue': config.get('PASSWORD_HASH_QUEUE', 32),
+        'timeout': config.get('PASSWORD_HASH_TIMEOUT', 5)
+    }
+
+def _get_executor(workers, queue):
+    """Return the process-wide hashing pool and its admission semaphore"""
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password')
+            _slots = threading.BoundedSemaphore(workers + queue)
+        return _executor, _slots
+
+def _run(func, *args):
+    """Run a hash in the pool; raises PasswordHasherBusy when the pool is saturated"""
+    config = _config()
+    executor, slots = _get_executor(config['workers'], config['queue'])
+    if not slots.acquire(timeout=config['timeout']):
+        raise PasswordHasherBusy()
+    try:
+        if gevent_patched():
+            # Pool "threads" would be greenlets here; hash in gevent's real threads
+            return run_blocking(func, *args)
+        return executor.submit(func, *args).result()
+    finally:
+        slots.release()
+
+@lru_cache(maxsize=8)
+def _full_method(method):
+    """Method string as stored in a hash, with werkzeug's defaults filled in"""
+    return generate_password_hash('', method).split('$', 1)[0]
+
+def hash_password(password):
+    """Hash a password with the configured method (PASSWORD_HASH_METHOD)"""
+    method = _config()['method']
+    return _run(generate_password_hash, password, method)
+
+def verify_password(stored_password, provided_password):
+    """Check a password against its stored hash in the hashing pool"""
+    return _run(check_password_hash, stored_password, provided_password)
+
+def needs_rehash(stored_password):
+    """True if a hash was made with other parameters than the configured method"""
+    return stored_password.split('$', 1)[0] != _full_method(_config()['method'])
@@ -6,99 +6,91 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
 from reportlab.lib import colors
+from reportlab.graphics.shapes import Drawing, Circle, String
+from io import BytesIO
+from xml.sax.saxutils import escape
+import threading
 import random
+import time
 import os
+from utils.metrics import time_export
 
-class PDFExporter:
-    """Export exam to PDF"""
-    
-    def __init__(self):
-        """Initialize PDF exporter with Vietnamese font support"""
-        # Try multiple font sources
-        self.font_name = 'Helvetica'
-        self.font_name_bold = 'Helvetica-Bold'
-        
-        # 1. Try DejaVu Sans from fonts folder
-        font_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fonts')
-        
-        try:
-            font_regular = os.path.join(font_path, 'DejaVuSans.ttf')
-            font_bold = os.path.join(font_path, 'DejaVuSans-Bold.ttf')
-            
-            if os.path.exists(font_regular) and os.path.exists(font_bold):
-                # Verify it's actually a TTF file
-                with open(font_regular, 'rb') as f:
-                    header = f.read(4)
-                    if header in [b'\x00\x01\x00\x00', b'true', b'typ1']:
-                        pdfmetrics.registerFont(TTFont('VietnameseFont', font_regular))
-                        pdfmetrics.registerFont(TTFont('VietnameseFont-Bold', font_bold))
-                        self.font_name = 'VietnameseFont'
-                        self.font_name_bold = 'VietnameseFont-Bold'
-                        print(f"✓ Loaded DejaVu Sans fonts from: {font_path}")
-                        return
-        except Exception as e:
-            print(f"⚠ Could not load DejaVu fonts: {e}")
-        
-        # 2. Try system Arial (macOS)
-        system_fonts = [
-            '/Library/Fonts/Arial Unicode.ttf',
-            '/System/Library/Fonts/Supplemental/Arial Unicode.ttf',
-            '/Library/Fonts/Arial.ttf',
-            '/System/Library/Fonts/Supplemental/Arial.ttf'
-        ]
-        
-        for arial_font in system_fonts:
-            if os.path.exists(arial_font):
-                try:
-                    pdfmetrics.registerFont(TTFont('VietnameseFont', arial_font))
-                    self.font_name = 'VietnameseFont'
-                    self.font_name_bold = 'VietnameseFont'
-                    print(f"✓ Using system Arial font: {arial_font}")
-                    return
-                except Exception as e:
-                    continue
+FONT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fonts')
+
+SYSTEM_FONTS = [
+    '/Library/Fonts/Arial Unicode.ttf',
+    '/System/Library/Fonts/Supplemental/Arial Unicode.ttf',
+    '/Library/Fonts/Arial.ttf',
+    '/System/Library/Fonts/Supplemental/Arial.ttf'
+]
+
+# Fonts and styles are process-wide: reportlab's font registry is global,
+# so they are resolved once (in the gunicorn master when warmed up before
+# fork) and shared by every export.
+_fonts = None
+_styles = None
+_exporter = None
+_setup_lock = threading.Lock()
+
+def _resolve_fonts():
+    """Register the Vietnamese font and return (font_name, font_name_bold)"""
+    # 1. Try DejaVu Sans from fonts folder
+    try:
+        font_regular = os.path.join(FONT_DIR, 'DejaVuSans.ttf')
+        font_bold = os.path.join(FONT_DIR, 'DejaVuSans-Bold.ttf')
         
-        # 3. Fallback to Helvetica
-        print(f"⚠ Using Helvetica (may not display Vietnamese correctly)")
-        print(f"⚠ To fix: Download Vietnamese fonts manually to {font_path}")
+        if os.path.exists(font_regular) and os.path.exists(font_bold):
+            # Verify it's actually a TTF file
+            with open(font_regular, 'rb') as f:
+                header = f.read(4)
+            if header in [b'\x00\x01\x00\x00', b'true', b'typ1']:
+                pdfmetrics.registerFont(TTFont('VietnameseFont', font_regular))
+                pdfmetrics.registerFont(TTFont('VietnameseFont-Bold', font_bold))
+                print(f"✓ Loaded DejaVu Sans fonts from: {FONT_DIR}")
+                return 'VietnameseFont', 'VietnameseFont-Bold'
+    except Exception as e:
+        print(f"⚠ Could not load DejaVu fonts: {e}")
     
-    def export_exam(self, exam, questions, output_path, shuffle_questions=False, shuffle_answers=False, include_answers=False):
-        """Export exam to PDF with beautiful formatting"""
-        
-        # Shuffle questions if requested
-        if shuffle_questions:
-            questions = random.sample(questions, len(questions))
-        
-        # Create PDF with margins
-        doc = SimpleDocTemplate(
-            output_path, 
-            pagesize=A4,
-            rightMargin=2*cm, 
-            leftMargin=2*cm,
-            topMargin=2.5*cm, 
-            bottomMargin=2*cm,
-            title=exam['title']
-        )
-        
-        # Container for the 'Flowable' objects
-        elements = []
-        
-        # Define styles with Vietnamese font support
-        styles = getSampleStyleSheet()
-        
+    # 2. Try system Arial (macOS)
+    for arial_font in SYSTEM_FONTS:
+        if os.path.exists(arial_font):
+            try:
+                pdfmetrics.registerFont(TTFont('VietnameseFont', arial_font))
+                print(f"✓ Using system Arial font: {arial_font}")
+                return 'VietnameseFont', 'VietnameseFont'
+            except Exception:
+                continue
+    
+    # 3. Fallback to Helvetica
+    print(f"⚠ Using Helvetica (may not display Vietnamese correctly)")
+    print(f"⚠ To fix: Download Vietnamese fonts manually to {FONT_DIR}")
+    return 'Helvetica', 'Helvetica-Bold'
+
+def get_fonts():
+    """Return (font_name, font_name_bold), registering fonts on first use"""
+    global _fonts
+    if _fonts is None:
+        with _setup_lock:
+            if _fonts is None:
+                _fonts = _resolve_fonts()
+    return _fonts
+
+def _build_styles(font_name, font_name_bold):
+    """Paragraph styles used by the exam layout"""
+    styles = getSampleStyleSheet()
+    return {
         # Header style - School/Department
-        header_style = ParagraphStyle(
+        'header': ParagraphStyle(
             'Header',
             parent=styles['Normal'],
             fontSize=11,
             textColor=colors.HexColor('#2C3E50'),
             alignment=TA_CENTER,
-            fontName=self.font_name_bold,
+            fontName=font_name_bold,
             spaceAfter=5
-        )
-        
+        ),
         # Title style
-        title_style = ParagraphStyle(
+        'title': ParagraphStyle(
             'CustomTitle',
             parent=styles['Heading1'],
             fontSize=16,
@@ -106,78 +98,166 @@ class PDFExporter:
             spaceAfter=10,
             spaceBefore=10,
             alignment=TA_CENTER,
-            fontName=self.font_name_bold,
+            fontName=font_name_bold,
             leading=20
-        )
-        
+        ),
         # Info box style
-        info_style = ParagraphStyle(
+        'info': ParagraphStyle(
             'InfoStyle',
             parent=styles['Normal'],
             fontSize=10,
             textColor=colors.HexColor('#34495E'),
             alignment=TA_CENTER,
-            fontName=self.font_name,
+            fontName=font_name,
             spaceAfter=20
-        )
-        
+        ),
         # Instruction style
-        instruction_style = ParagraphStyle(
+        'instruction': ParagraphStyle(
             'Instruction',
             parent=styles['Normal'],
             fontSize=10,
             textColor=colors.HexColor('#555555'),
             alignment=TA_JUSTIFY,
-            fontName=self.font_name,
+            fontName=font_name,
             spaceAfter=15,
             leftIndent=10,
             rightIndent=10
-        )
-        
+        ),
         # Question number style
-        question_num_style = ParagraphStyle(
+        'question_num': ParagraphStyle(
             'QuestionNum',
             parent=styles['Normal'],
             fontSize=11,
             textColor=colors.HexColor('#2C3E50'),
-            fontName=self.font_name_bold,
+            fontName=font_name_bold,
             spaceAfter=5
-        )
-        
+        ),
         # Question text style
-        question_text_style = ParagraphStyle(
+        'question_text': ParagraphStyle(
             'QuestionText',
             parent=styles['Normal'],
             fontSize=10.5,
             textColor=colors.HexColor('#2C3E50'),
-            fontName=self.font_name,
+            fontName=font_name,
             spaceAfter=8,
             leading=14
-        )
-        
+        ),
         # Option style
-        option_style = ParagraphStyle(
+        'option': ParagraphStyle(
             'Option',
             parent=styles['Normal'],
             fontSize=10,
             textColor=colors.HexColor('#34495E'),
             leftIndent=25,
             spaceAfter=4,
-            fontName=self.font_name,
+            fontName=font_name,
             leading=13
-        )
-        
+        ),
         # Answer style (if showing answers)
-        answer_style = ParagraphStyle(
+        'answer': ParagraphStyle(
             'Answer',
             parent=styles['Normal'],
             fontSize=9,
             textColor=colors.HexColor('#27ae60'),
             leftIndent=25,
             spaceAfter=5,
-            fontName=self.font_name_bold,
+            fontName=font_name_bold,
             leading=12
+        ),
+        'footer': ParagraphStyle(
+            'Footer',
+            parent=styles['Normal'],
+            fontSize=10,
+            alignment=TA_CENTER,
+            fontName=font_name_bold
         )
+    }
+
+def get_styles():
+    """Return the shared paragraph styles, building them on first use"""
+    global _styles
+    if _styles is None:
+        font_name, font_name_bold = get_fonts()
+        with _setup_lock:
+            if _styles is None:
+                _styles = _build_styles(font_name, font_name_bold)
+    return _styles
+
+def get_exporter():
+    """Return the process-wide PDFExporter"""
+    global _exporter
+    if _exporter is None:
+        exporter = PDFExporter()
+        with _setup_lock:
+            if _exporter is None:
+                _exporter = exporter
+    return _exporter
+
+def warm_up():
+    """Load fonts and styles and render a sample exam; returns seconds taken
+    
+    Called from gunicorn's master before forking so workers start with the
+    fonts parsed and reportlab's glyph caches filled.
+    """
+    start = time.perf_counter()
+    exporter = get_exporter()
+    sample_exam = {'title': 'Warm-up', 'duration': 1}
+    sample_questions = [{
+        'question_text': 'Tiếng Việt có dấu: ăâđêôơư ÀÁẠẢÃ?',
+        'question_type': 'multiple_choice',
+        'options': ['A. Một', 'B. Hai', 'C. Ba', 'D. Bốn'],
+        'correct_answer': 'A',
+        'explanation': 'Giải thích'
+    }]
+    exporter.export_exam(sample_exam, sample_questions, BytesIO(), include_answers=True)
+    return time.perf_counter() - start
+
+class PDFExporter:
+    """Export exam to PDF
+    
+    Creating an exporter is cheap: fonts and styles come from the
+    process-wide registry, so one instance (see get_exporter) is reused.
+    """
+    
+    def __init__(self):
+        """Initialize PDF exporter with Vietnamese font support"""
+        self.font_name, self.font_name_bold = get_fonts()
+        self.styles = get_styles()
+    
+    @time_export('exam')
+    def export_exam(self, exam, questions, output_path, shuffle_questions=False, shuffle_answers=False, include_answers=False,
+                    seed=None):
+        """Export exam to PDF with beautiful formatting
+        
+        The same ``seed`` always gives the same shuffle.
+        """
+        rng = random.Random(seed)
+        
+        # Shuffle questions if requested
+        if shuffle_questions:
+            questions = rng.sample(questions, len(questions))
+        
+        # Create PDF with margins
+        doc = SimpleDocTemplate(
+            output_path, 
+            pagesize=A4,
+            rightMargin=2*cm, 
+            leftMargin=2*cm,
+            topMargin=2.5*cm, 
+            bottomMargin=2*cm,
+            title=exam['title']
+        )
+        
+        # Container for the 'Flowable' objects
+        elements = []
+        
+        styles = self.styles
+        title_style = styles['title']
+        info_style = styles['info']
+        instruction_style = styles['instruction']
+        question_text_style = styles['question_text']
+        option_style = styles['option']
+        answer_style = styles['answer']
         
         # ===== DECORATIVE LINE =====
         # Decorative line at top
@@ -195,6 +275,9 @@ class PDFExporter:
         title = Paragraph(f"<b>{exam_type_text}</b><br/>{exam['title']}", title_style)
         elements.append(title)
         
+        if exam.get('variant_code'):
+            elements.append(Paragraph(f"<b>Mã đề: {exam['variant_code']}</b>", styles['header']))
+        
         # ===== INFO BOX =====
         info_data = []
         if exam.get('duration', 0) > 0:
@@ -267,7 +350,7 @@ class PDFExporter:
                             break
                     
                     # Shuffle
-                    random.shuffle(options)
+                    rng.shuffle(options)
                 
                 for option in options:
                     # Highlight correct answer if showing answers
@@ -306,13 +389,7 @@ class PDFExporter:
         elements.append(Spacer(1, 1*cm))
         
         footer_data = [[
-            Paragraph("<i>--- HẾT ---</i>", ParagraphStyle(
-                'Footer',
-                parent=styles['Normal'],
-                fontSize=10,
-                alignment=TA_CENTER,
-                fontName=self.font_name_bold
-            ))
+            Paragraph("<i>--- HẾT ---</i>", styles['footer'])
         ]]
         footer_table = Table(footer_data, colWidths=[doc.width])
         elements.append(footer_table)
@@ -320,3 +397,203 @@ class PDFExporter:
         # Build PDF
         doc.build(elements)
         return output_path
+    
+    @time_export('answer_key')
+    def export_answer_key(self, exam, codes, answers, output_path):
+        """Export the answer key of several variants as one table
+        
+        ``answers[i][j]`` is the answer of question j + 1 in variant codes[i].
+        """
+        doc = SimpleDocTemplate(
+            output_path,
+            pagesize=A4,
+            rightMargin=1.5*cm,
+            leftMargin=1.5*cm,
+            topMargin=2*cm,
+            bottomMargin=2*cm,
+            title=f"{exam['title']} - Đáp án"
+        )
+        styles = self.styles
+        elements = [
+            Paragraph(f"<b>ĐÁP ÁN</b><br/>{exam['title']}", styles['title']),
+            Spacer(1, 0.5*cm)
+        ]
+        
+        # Question number column plus up to 8 variants per table, so wide keys stay on the page
+        per_table = 8
+        num_questions = max((len(key) for key in answers), default=0)
+        for start in range(0, len(codes), per_table):
+            group = range(start, min(start + per_table, len(codes)))
+            data = [['Câu'] + [f"Mã {codes[i]}" for i in group]]
+            for j in range(num_questions):
+                data.append([str(j + 1)] + [answers[i][j] if j < len(answers[i]) else '' for i in group])
+            
+            table = Table(data, colWidths=[1.5*cm] + [(doc.width - 1.5*cm) / per_table] * len(group), repeatRows=1)
+            table.setStyle(TableStyle([
+                ('FONTNAME', (0, 0), (-1, -1), self.font_name),
+                ('FONTNAME', (0, 0), (-1, 0), self.font_name_bold),
+                ('FONTSIZE', (0, 0), (-1, -1), 9),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f8f9fa')),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dee2e6')),
+            ]))
+            elements.append(table)
+            elements.append(Spacer(1, 0.5*cm))
+        
+        doc.build(elements)
+        return output_path
+    
+    def _bubble(self, label):
+        """An empty answer bubble with its letter"""
+        drawing = Drawing(0.55*cm, 0.55*cm)
+        drawing.add(Circle(0.275*cm, 0.275*cm, 0.22*cm, strokeColor=colors.black, strokeWidth=0.6,
+                           fillColor=None))
+        drawing.add(String(0.275*cm, 0.17*cm, label, fontName=self.font_name, fontSize=6,
+                           textAnchor='middle'))
+        return drawing
+    
+    @time_export('answer_sheet')
+    def export_answer_sheet(self, exam, questions, output_path, variant_code=None, columns=4):
+        """Export a bubble answer sheet matching the printed question order
+        
+        ``questions`` are in printed order; multiple choice questions get one
+        bubble per option, true/false questions bubbles Đ and S, and essay
+        questions a TL (tự luận) mark instead of bubbles.
+        """
+        doc = SimpleDocTemplate(
+            output_path,
+            pagesize=A4,
+            rightMargin=1.5*cm,
+            leftMargin=1.5*cm,
+            topMargin=1.5*cm,
+            bottomMargin=1.5*cm,
+            title=f"{exam['title']} - Phiếu trả lời"
+        )
+        styles = self.styles
+        elements = [Paragraph(f"<b>PHIẾU TRẢ LỜI TRẮC NGHIỆM</b><br/>{exam['title']}", styles['title'])]
+        if variant_code:
+            elements.append(Paragraph(f"<b>Mã đề: {variant_code}</b>", styles['header']))
+        
+        info_table = Table([[
+            Paragraph("Họ và tên: ....................................................", styles['info']),
+            Paragraph("Tên đăng nhập: ..................................", styles['info'])
+        ]], colWidths=[doc.width * 0.6, doc.width * 0.4])
+        elements.append(info_table)
+        elements.append(Paragraph("<i>Tô kín một ô cho mỗi câu. Muốn đổi đáp án, xóa sạch ô đã tô.</i>",
+                                  styles['instruction']))
+        
+        max_options = max([len(q.get('options', [])) for q in questions if q['question_type'] == 'multiple_choice'] + [2])
+        rows = (len(questions) + columns - 1) // columns
+        block = [0.9*cm] + [0.6*cm] * max_options + [0.3*cm]
+        
+        data = []
+        for row in range(rows):
+            cells = []
+            for column in range(columns):
+                index = column * rows + row
+                if index >= len(questions):
+                    cells += [''] * len(block)
+                    continue
+                question = questions[index]
+                if question['question_type'] == 'multiple_choice':
+                    bubbles = [self._bubble(chr(ord('A') + i)) for i in range(len(question.get('options', [])))]
+                elif question['question_type'] == 'true_false':
+                    bubbles = [self._bubble('Đ'), self._bubble('S')]
+                else:
+                    bubbles = ['TL']
+                bubbles += [''] * (max_options - len(bubbles))
+                cells += [str(index + 1)] + bubbles + ['']
+            data.append(cells)
+        
+        sheet = Table(data, colWidths=block * columns, rowHeights=0.7*cm)
+        sheet.setStyle(TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), self.font_name_bold),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 1),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 1),
+            ('ROWBACKGROUNDS', (0, 0), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
+        ]))
+        elements.append(sheet)
+        
+        doc.build(elements)
+        return output_path
+    
+    def _report_card_elements(self, exam, student, attempt, questions, width):
+        """Flowables of one student's one-page result report"""
+        styles = self.styles
+        name = student.get('full_name') or student.get('username', '')
+        elements = [
+            Paragraph(f"<b>PHIẾU KẾT QUẢ</b><br/>{escape(exam['title'])}", styles['title']),
+            Paragraph(f"<b>Học sinh:</b> {escape(name)} (@{escape(student.get('username', ''))})", styles['question_text']),
+            Paragraph(
+                f"<b>Điểm:</b> {attempt.get('score', 0)}/{attempt.get('max_score', 0)} "
+                f"({attempt.get('percentage', 0)}%) - <b>{'Đạt' if attempt.get('passed') else 'Không đạt'}</b>",
+                styles['question_text']
+            ),
+            Spacer(1, 0.3*cm)
+        ]
+        
+        answers = attempt.get('answers', {})
+        data = [['Câu', 'Trả lời', 'Đáp án', 'Kết quả']]
+        wrong = []
+        for idx, question in enumerate(questions, 1):
+            student_answer = answers.get(str(question['_id']), '')
+            if question['question_type'] == 'essay':
+                data.append([str(idx), 'Tự luận', '', 'Chấm tay'])
+                continue
+            correct = student_answer.strip().upper() == question['correct_answer'].strip().upper()
+            data.append([str(idx), student_answer or '-', question['correct_answer'], 'Đúng' if correct else 'Sai'])
+            if not correct and question.get('explanation'):
+                wrong.append((idx, question['explanation']))
+        
+        # Several narrow columns side by side so long exams still fit on one page
+        per_column = 25
+        blocks = [data[0:1] + data[i:i + per_column] for i in range(1, len(data), per_column)] or [data]
+        tables = []
+        for block in blocks:
+            table = Table(block, colWidths=[0.9*cm, 1.5*cm, 1.5*cm, 1.5*cm], rowHeights=0.45*cm)
+            table.setStyle(TableStyle([
+                ('FONTNAME', (0, 0), (-1, -1), self.font_name),
+                ('FONTNAME', (0, 0), (-1, 0), self.font_name_bold),
+                ('FONTSIZE', (0, 0), (-1, -1), 7.5),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('GRID', (0, 0), (-1, -1), 0.4, colors.HexColor('#dee2e6')),
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f8f9fa')),
+            ] + [
+                ('TEXTCOLOR', (3, row), (3, row), colors.HexColor('#27ae60' if block[row][3] == 'Đúng' else '#c0392b'))
+                for row in range(1, len(block)) if block[row][3] in ('Đúng', 'Sai')
+            ]))
+            tables.append(table)
+        for start in range(0, len(tables), 3):
+            row = tables[start:start + 3]
+            elements.append(Table([row], colWidths=[width / 3] * len(row)))
+            elements.append(Spacer(1, 0.3*cm))
+        
+        if wrong:
+            elements.append(Paragraph("<b>Giải thích các câu sai</b>", styles['question_text']))
+            for idx, explanation in wrong:
+                text = explanation if len(explanation) <= 300 else explanation[:297] + '...'
+                elements.append(Paragraph(f"<b>Câu {idx}:</b> {escape(text)}", styles['answer']))
+        return elements
+    
+    @time_export('report_cards')
+    def export_report_cards(self, exam, questions, cards, output_path):
+        """Export result reports, one page per (student, attempt) in cards"""
+        doc = SimpleDocTemplate(
+            output_path,
+            pagesize=A4,
+            rightMargin=1.5*cm,
+            leftMargin=1.5*cm,
+            topMargin=1.5*cm,
+            bottomMargin=1.5*cm,
+            title=f"{exam['title']} - Phiếu kết quả"
+        )
+        elements = []
+        for index, (student, attempt) in enumerate(cards):
+            if index:
+                elements.append(PageBreak())
+            elements.extend(self._report_card_elements(exam, student, attempt, questions, doc.width))
+        doc.build(elements)
+        return output_path
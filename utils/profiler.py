@@ -0,0 +1,139 @@
+from collections import Counter
+from datetime import datetime
+import threading
+import random
+import hmac
+import json
+import sys
+import os
+import re
+import time
+
+# Sampling profiler for single requests. A helper thread looks at the
+# request thread's stack every few milliseconds (sys._current_frames) and
+# counts identical stacks; the request itself runs unmodified, so the cost
+# is a few microseconds per sample. Profiles are written in the folded
+# stack format ("frame;frame;frame count") read by flamegraph.pl and
+# speedscope, with a JSON file of request details next to them.
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval until stopped"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.stacks[fold_stack(frame)] += 1
+            self.samples += 1
+
+    def folded(self):
+        """Profile in folded stack format, one stack per line"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+def _frame_name(frame):
+    code = frame.f_code
+    path = code.co_filename
+    # Trim to the package path so stacks read the same on every machine
+    for marker in ('site-packages' + os.sep, os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep):
+        if marker in path:
+            path = path.split(marker, 1)[1]
+            break
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(';', ':')
+
+def fold_stack(frame):
+    """Stack of frame as 'outermost;...;innermost'"""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+def init_profiler(app):
+    """Profile requests that ask for it, or a sample of all requests
+
+    A request is profiled when its X-Profile header or _profile query
+    parameter equals PROFILE_TOKEN, or with probability
+    PROFILE_SAMPLE_RATE. Profiles go to PROFILE_DIR. When neither option is
+    set no hook is installed, so requests pay nothing.
+    """
+    token = app.config.get('PROFILE_TOKEN')
+    sample_rate = app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+    if not token and sample_rate <= 0:
+        return
+
+    from flask import request, session
+
+    directory = app.config.get('PROFILE_DIR') or os.path.join(app.root_path, 'profiles')
+    interval = app.config.get('PROFILE_INTERVAL_MS', 5) / 1000
+    os.makedirs(directory, exist_ok=True)
+
+    @app.before_request
+    def start_profiler():
+        given = request.headers.get('X-Profile') or request.args.get('_profile')
+        # Bytes: compare_digest raises TypeError on non-ASCII str
+        requested = bool(token and given) and hmac.compare_digest(token.encode('utf-8'), given.encode('utf-8'))
+        if requested or random.random() < sample_rate:
+            request.environ['profiler'] = (SamplingProfiler(threading.get_ident(), interval).start(),
+                                           time.perf_counter(), 'header' if requested else 'sampled')
+
+    @app.after_request
+    def save_profile(response):
+        profiling = request.environ.pop('profiler', None)
+        if profiling is None:
+            return response
+        profiler, start, trigger = profiling
+        duration = time.perf_counter() - start
+        profiler.stop()
+
+        endpoint = request.endpoint or 'unmatched'
+        safe_endpoint = re.sub(r'[^\w.-]+', '_', endpoint)
+        name = f"{datetime.utcnow():%Y%m%d-%H%M%S-%f}_{safe_endpoint}_{duration * 1000:.0f}ms"
+        details = {
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'role': session.get('role', 'anonymous'),
+            'duration_ms': round(duration * 1000, 1),
+            'samples': profiler.samples,
+            'interval_ms': interval * 1000,
+            'trigger': trigger,
+            'pid': os.getpid(),
+            'created_at': datetime.utcnow().isoformat()
+        }
+        try:
+            with open(os.path.join(directory, name + '.folded'), 'w', encoding='utf-8') as output:
+                output.write(profiler.folded())
+            with open(os.path.join(directory, name + '.json'), 'w', encoding='utf-8') as output:
+                json.dump(details, output, indent=2)
+        except OSError as e:
+            app.logger.warning(f"Could not save profile {name}: {e}")
+            return response
+        if trigger == 'header':
+            response.headers['X-Profile-Id'] = name
+        return response
+
+    @app.teardown_request
+    def stop_profiler(exc):
+        # after_request did not run (e.g. the response failed); never leave a sampler behind
+        profiling = request.environ.pop('profiler', None)
+        if profiling is not None:
+            profiling[0].stop()
@@ -0,0 +1,150 @@
+from collections import Counter
+from contextvars import ContextVar
+from pymongo import monitoring
+import json
+import time
+
+# MongoDB commands issued while handling one request. A single listener is
+# registered on the MongoClient; commands run on the thread (or greenlet)
+# that issued them, so the listener finds the current request's stats
+# through a context variable. Commands outside a request (background jobs)
+# are not recorded.
+_current = ContextVar('query_stats', default=None)
+
+# Commands that continue an earlier one rather than issue a new query
+CONTINUATIONS = {'getMore', 'killCursors', 'endSessions'}
+
+def _mask(value):
+    """Replace literal values with their type name, keeping keys and operators"""
+    if isinstance(value, dict):
+        return {key: _mask(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_mask(value[0])] if value else []
+    return type(value).__name__
+
+def command_shape(command_name, command):
+    """Collection and filter shape of a command, e.g. 'find users {"_id": "ObjectId"}'
+
+    Two commands with the same shape differ only in their values; many of
+    them in one request usually mean a query inside a loop (N+1).
+    """
+    collection = command.get(command_name)
+    if not isinstance(collection, str):
+        collection = command.get('collection', '')
+    if command_name == 'find':
+        query = command.get('filter', {})
+    elif command_name == 'aggregate':
+        query = [_mask(stage) for stage in command.get('pipeline', [])]
+    elif command_name in ('update', 'delete'):
+        statements = command.get('updates' if command_name == 'update' else 'deletes') or [{}]
+        query = statements[0].get('q', {})
+    elif command_name in ('count', 'distinct', 'findAndModify'):
+        query = command.get('query', {})
+    else:
+        query = {}
+    if command_name != 'aggregate':
+        query = _mask(query)
+    return f"{command_name} {collection} {json.dumps(query, sort_keys=True, default=str)}"
+
+class QueryStats:
+    """Count, total time, slowest command and repeated shapes of one request's commands"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest = None  # (seconds, shape)
+        self.shapes = Counter()
+        self.shape_seconds = Counter()
+        self._pending = {}
+
+    def start(self, request_id, shape):
+        self._pending[request_id] = shape
+
+    def finish(self, request_id, seconds):
+        shape = self._pending.pop(request_id, None)
+        if shape is None:
+            return
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[shape] += 1
+        self.shape_seconds[shape] += seconds
+        if self.slowest is None or seconds > self.slowest[0]:
+            self.slowest = (seconds, shape)
+
+    def repeated(self, threshold):
+        """Shapes issued at least threshold times, most frequent first"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def summary(self, threshold):
+        """One-line summary for the debug header"""
+        parts = [f"count={self.count}", f"time={self.seconds * 1000:.1f}ms"]
+        if self.slowest:
+            parts.append(f"slowest={self.slowest[1]} {self.slowest[0] * 1000:.1f}ms")
+        for shape, count in self.repeated(threshold):
+            parts.append(f"repeated={shape} x{count}")
+        return '; '.join(parts)
+
+    def breakdown(self):
+        """Shapes by total time, for the slow request log"""
+        return '\n'.join(f"  {count:>4} x {self.shape_seconds[shape] * 1000:>8.1f}ms  {shape}"
+                         for shape, count in sorted(self.shapes.items(), key=lambda item: -self.shape_seconds[item[0]]))
+
+class QueryListener(monitoring.CommandListener):
+    """Records commands into the current request's QueryStats"""
+
+    def started(self, event):
+        stats = _current.get()
+        if stats is not None and event.command_name not in CONTINUATIONS:
+            stats.start(event.request_id, command_shape(event.command_name, event.command))
+
+    def succeeded(self, event):
+        stats = _current.get()
+        if stats is not None:
+            stats.finish(event.request_id, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        self.succeeded(event)
+
+def init_query_stats(app):
+    """Record MongoDB commands per request; log slow requests and N+1 patterns
+
+    The MongoClient must be created with QueryListener() among its
+    event_listeners. Requests slower than SLOW_REQUEST_MS are logged with
+    their query breakdown; a shape repeated QUERY_REPEAT_THRESHOLD times
+    is logged once per endpoint. With QUERY_STATS_HEADER (or in debug) the
+    summary is returned in an X-Query-Stats response header.
+    """
+    from flask import request
+
+    threshold = app.config.get('QUERY_REPEAT_THRESHOLD', 5)
+    slow_seconds = app.config.get('SLOW_REQUEST_MS', 1000) / 1000
+    send_header = app.debug or app.config.get('QUERY_STATS_HEADER', False)
+    reported = set()  # (endpoint, shape) already logged as N+1 in this process
+
+    @app.before_request
+    def start_query_stats():
+        request.environ['query_stats.token'] = _current.set(QueryStats())
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = _current.get()
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats.started_at
+        if send_header:
+            response.headers['X-Query-Stats'] = stats.summary(threshold)
+        if elapsed >= slow_seconds:
+            app.logger.warning(f"Slow request {request.method} {request.path}: {elapsed * 1000:.0f}ms, "
+                               f"{stats.count} queries in {stats.seconds * 1000:.0f}ms\n{stats.breakdown()}")
+        for shape, count in stats.repeated(threshold):
+            if (request.endpoint, shape) not in reported:
+                reported.add((request.endpoint, shape))
+                app.logger.warning(f"Possible N+1 in {request.endpoint}: {count} x {shape}")
+        return response
+
+    @app.teardown_request
+    def stop_query_stats(exc):
+        token = request.environ.pop('query_stats.token', None)
+        if token is not None:
+            _current.reset(token)
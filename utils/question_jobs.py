@@ -0,0 +1,85 @@
+from models.exam import Exam
+from models.question import Question
+from models.job import Job
+from utils import dedup
+from utils.gemini_service import GeminiAI
+import threading
+
+class GeneratedQuestionWriter:
+    """Insert AI-generated questions, dropping near-duplicates of the bank and of each other"""
+
+    def __init__(self, db, exam_id, owner_id):
+        self.db = db
+        self.exam_id = exam_id
+        self.exam_ids = Exam.find_ids_by_owner(db, owner_id)
+        self.batch_index = dedup.LSHIndex()
+        self.lock = threading.Lock()
+
+    def insert(self, questions):
+        """Insert questions; returns (added, skipped)"""
+        added = 0
+        with self.lock:
+            for q in questions:
+                fp = dedup.fingerprint(q.get('question_text', ''), q.get('options', []))
+                if self.batch_index.query(fp['minhash'], fp['lsh_bands']) or \
+                        Question.find_near_duplicates(self.db, q.get('question_text', ''), q.get('options', []),
+                                                      self.exam_ids):
+                    continue
+                self.batch_index.add(len(self.batch_index.signatures), fp['minhash'], fp['lsh_bands'])
+                Question.create(
+                    self.db,
+                    self.exam_id,
+                    q.get('question_text', ''),
+                    q.get('question_type', 'multiple_choice'),
+                    q.get('options', []),
+                    q.get('correct_answer', ''),
+                    q.get('difficulty', 'medium'),
+                    1
+                )
+                added += 1
+            if added:
+                Exam.update_statistics(self.db, self.exam_id)
+        return added, len(questions) - added
+
+def generate_questions_job(db, job_id, config, exam_id, owner_id, content, easy, medium, hard, fresh=False):
+    """Background job: generate questions and insert each one as soon as it is parsed"""
+    gemini = GeminiAI.from_config(config, db)
+    writer = GeneratedQuestionWriter(db, exam_id, owner_id)
+    Job.start(db, job_id, total=len(gemini.plan_generation(content, easy, medium, hard)))
+
+    def on_batch(questions):
+        added, skipped = writer.insert(questions)
+        Job.advance(db, job_id, done=0, inserted=added, skipped=skipped)
+
+    def on_task_done(index):
+        Job.advance(db, job_id)
+
+    gemini.generate_mixed_difficulty_questions(content, easy=easy, medium=medium, hard=hard, fresh=fresh,
+                                               on_batch=on_batch, on_task_done=on_task_done)
+
+    job = Job.find_by_id(db, job_id)
+    result = job.get('result', {})
+    message = f"Đã tạo {result.get('inserted', 0)} câu hỏi bằng AI!"
+    if result.get('skipped'):
+        message += f" Bỏ qua {result['skipped']} câu trùng lặp."
+    Job.complete(db, job_id, message)
+
+def generate_explanations_job(db, job_id, config, exam_id):
+    """Background job: explain every question of an exam that has no explanation"""
+    questions = Question.find_without_explanation(db, exam_id)
+    if not questions:
+        Job.complete(db, job_id, 'Tất cả câu hỏi đã có giải thích')
+        return
+
+    gemini = GeminiAI.from_config(config, db)
+    max_tokens = config.get('GEMINI_EXPLANATION_BATCH_TOKENS', 3000)
+    Job.start(db, job_id, total=len(gemini.pack_explanation_batches(questions, max_tokens)))
+
+    def on_batch(explanations):
+        Job.advance(db, job_id, explained=len(explanations))
+
+    explanations = gemini.generate_explanations_batch(questions, max_tokens, on_batch=on_batch)
+    Question.set_explanations(db, explanations)
+
+    message = f"Đã tạo giải thích cho {len(explanations)}/{len(questions)} câu hỏi"
+    Job.complete(db, job_id, message)
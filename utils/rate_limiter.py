@@ -0,0 +1,229 @@
+import hashlib
+import random
+import sqlite3
+import threading
+import time
+
+# Priority classes: interactive calls (explanations a teacher is waiting on)
+# may use the whole bucket, bulk calls (question generation) must leave
+# BULK_RESERVE of it untouched so interactive calls are served first.
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+
+class RateLimitExceeded(Exception):
+    """No capacity became available within the wait timeout"""
+
+class CircuitOpenError(Exception):
+    """Recent calls failed repeatedly; calls are rejected until the cooldown ends"""
+
+def is_retryable(error):
+    """Whether an API error is worth retrying (quota, overload, timeouts)"""
+    try:
+        from google.api_core import exceptions as api_exceptions
+        if isinstance(error, (api_exceptions.ResourceExhausted, api_exceptions.ServiceUnavailable,
+                              api_exceptions.DeadlineExceeded, api_exceptions.InternalServerError,
+                              api_exceptions.TooManyRequests)):
+            return True
+    except ImportError:
+        pass
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    text = str(error).lower()
+    return '429' in text or 'quota' in text or 'rate limit' in text or 'unavailable' in text
+
+class GeminiScheduler:
+    """Token bucket, circuit breaker and retry shared by all workers on a host
+
+    State is kept in a SQLite file so every gunicorn worker draws from the
+    same buckets. Each API key has a request bucket and a token bucket that
+    refill continuously up to their per-minute limits.
+    """
+
+    BULK_RESERVE = 0.2
+
+    def __init__(self, path, requests_per_minute=60, tokens_per_minute=200000, failure_threshold=5,
+                 cooldown=30, max_retries=3, backoff_base=1.0, max_wait=60):
+        self.path = path
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown  # seconds the circuit stays open
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base  # seconds, doubled per retry
+        self.max_wait = max_wait  # seconds to wait for capacity
+        self._local = threading.local()
+        self._init_db()
+
+    def _connect(self):
+        """Per-thread SQLite connection in autocommit mode"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS buckets (
+            key TEXT PRIMARY KEY, requests REAL, tokens REAL, updated_at REAL)''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS breakers (
+            key TEXT PRIMARY KEY, failures INTEGER, open_until REAL)''')
+
+    @staticmethod
+    def _key(api_key):
+        """Never store the raw API key"""
+        return hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:16]
+
+    def _try_acquire(self, key, cost_tokens, priority):
+        """Take capacity if available; returns 0 on success or seconds to wait"""
+        reserve = self.BULK_RESERVE if priority == BULK else 0.0
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT requests, tokens, updated_at FROM buckets WHERE key = ?', (key,)).fetchone()
+            if row:
+                requests, tokens, updated_at = row
+                elapsed = max(0.0, now - updated_at)
+                requests = min(self.requests_per_minute, requests + elapsed * self.requests_per_minute / 60)
+                tokens = min(self.tokens_per_minute, tokens + elapsed * self.tokens_per_minute / 60)
+            else:
+                requests, tokens = self.requests_per_minute, self.tokens_per_minute
+
+            # A single call larger than the whole budget is let through once the bucket is full
+            cost_tokens = min(cost_tokens, self.tokens_per_minute * (1 - reserve))
+            need_requests = 1 + reserve * self.requests_per_minute - requests
+            need_tokens = cost_tokens + reserve * self.tokens_per_minute - tokens
+
+            if need_requests <= 0 and need_tokens <= 0:
+                requests -= 1
+                tokens -= cost_tokens
+                wait = 0
+            else:
+                wait = max(need_requests * 60 / self.requests_per_minute,
+                           need_tokens * 60 / self.tokens_per_minute)
+
+            conn.execute('INSERT OR REPLACE INTO buckets (key, requests, tokens, updated_at) VALUES (?, ?, ?, ?)',
+                         (key, requests, tokens, now))
+            conn.execute('COMMIT')
+            return wait
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def acquire(self, api_key, cost_tokens, priority=BULK):
+        """Block until the call may proceed, or raise RateLimitExceeded"""
+        key = self._key(api_key)
+        deadline = time.time() + self.max_wait
+        while True:
+            wait = self._try_acquire(key, cost_tokens, priority)
+            if wait <= 0:
+                return
+            if time.time() + wait > deadline:
+                raise RateLimitExceeded(f"Gemini rate limit: no capacity within {self.max_wait}s")
+            time.sleep(min(wait, 1.0) + random.uniform(0, 0.05))
+
+    def check_circuit(self, api_key):
+        """Raise CircuitOpenError while the breaker for this key is open"""
+        row = self._connect().execute('SELECT open_until FROM breakers WHERE key = ?',
+                                      (self._key(api_key),)).fetchone()
+        if row and row[0] and row[0] > time.time():
+            raise CircuitOpenError(f"Gemini tạm thời không khả dụng, thử lại sau {int(row[0] - time.time()) + 1}s")
+
+    def record_success(self, api_key):
+        """Close the breaker"""
+        self._connect().execute('INSERT OR REPLACE INTO breakers (key, failures, open_until) VALUES (?, 0, 0)',
+                                (self._key(api_key),))
+
+    def record_failure(self, api_key):
+        """Count a failure and open the breaker once the threshold is reached"""
+        key = self._key(api_key)
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT failures FROM breakers WHERE key = ?', (key,)).fetchone()
+            failures = (row[0] if row else 0) + 1
+            open_until = time.time() + self.cooldown if failures >= self.failure_threshold else 0
+            conn.execute('INSERT OR REPLACE INTO breakers (key, failures, open_until) VALUES (?, ?, ?)',
+                         (key, failures, open_until))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def call(self, api_key, func, cost_tokens=0, priority=BULK):
+        """Run func() under rate limit and circuit breaker, retrying transient errors
+
+        Retries use exponential backoff with jitter. After the circuit opens,
+        calls fail fast with CircuitOpenError instead of piling onto the API.
+        """
+        attempt = 0
+        while True:
+            self.check_circuit(api_key)
+            self.acquire(api_key, cost_tokens, priority)
+            try:
+                result = func()
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self.record_failure(api_key)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_base * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay / 2))
+                attempt += 1
+                continue
+            self.record_success(api_key)
+            return result
+
+    def stream(self, api_key, func, cost_tokens=0, priority=BULK):
+        """Like call() for a streaming func() that returns an iterator of chunks
+
+        Errors are retried only until the first chunk has been yielded;
+        after that the partial stream belongs to the caller. Success is
+        recorded on the first chunk, since callers may stop reading (or
+        close the stream) once they have what they need.
+        """
+        attempt = 0
+        while True:
+            self.check_circuit(api_key)
+            self.acquire(api_key, cost_tokens, priority)
+            started = False
+            try:
+                for chunk in func():
+                    if not started:
+                        started = True
+                        self.record_success(api_key)
+                    yield chunk
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self.record_failure(api_key)
+                if started or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_base * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay / 2))
+                attempt += 1
+                continue
+            if not started:
+                self.record_success(api_key)  # an empty stream is still a successful call
+            return
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+def get_scheduler(config):
+    """Return the process-wide scheduler configured by the Flask config"""
+    path = config.get('GEMINI_SCHEDULER_DB')
+    with _schedulers_lock:
+        if path not in _schedulers:
+            _schedulers[path] = GeminiScheduler(
+                path,
+                requests_per_minute=config.get('GEMINI_RPM', 60),
+                tokens_per_minute=config.get('GEMINI_TPM', 200000),
+                failure_threshold=config.get('GEMINI_BREAKER_FAILURES', 5),
+                cooldown=config.get('GEMINI_BREAKER_COOLDOWN', 30),
+                max_retries=config.get('GEMINI_MAX_RETRIES', 3)
+            )
+        return _schedulers[path]
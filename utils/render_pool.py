@@ -0,0 +1,28 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import threading
+from utils.pdf_exporter import warm_up
+
+# Rendering is CPU bound, so batch exports (variants, report cards) run in
+# separate processes. Spawned workers don't inherit the server's threads or
+# sockets, and each one warms up its fonts once and is reused across exports.
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+def get_render_pool(max_workers):
+    """Return the process-wide pool used to render PDFs"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=max_workers,
+                                                mp_context=multiprocessing.get_context('spawn'),
+                                                initializer=warm_up)
+        return _process_pool
+
+def reset_render_pool():
+    """Drop a broken pool (e.g. a worker was killed); a fresh one starts on next use"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
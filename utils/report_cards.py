@@ -0,0 +1,117 @@
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from PyPDF2 import PdfReader, PdfWriter
+import hashlib
+import zipfile
+import io
+import os
+import re
+from utils.pdf_exporter import get_exporter
+from utils.render_pool import get_render_pool, reset_render_pool
+from utils.export_cache import get_export_cache, export_version
+
+# Reports rendered per pool task: large enough to amortize pickling the
+# exam's questions, small enough to spread a class over all processes
+CHUNK_SIZE = 25
+
+def latest_graded_attempts(db, exam_id):
+    """Latest graded attempt of every student of an exam, with the student, ordered by username"""
+    attempts = {}
+    for attempt in db.exam_attempts.find({'exam_id': exam_id, 'status': 'graded'},
+                                         {'student_id': 1, 'answers': 1, 'score': 1, 'max_score': 1,
+                                          'percentage': 1, 'passed': 1, 'submitted_at': 1}).sort('_id', 1):
+        attempts[attempt['student_id']] = attempt
+    students = {user['_id']: user for user in db.users.find({'_id': {'$in': list(attempts)}},
+                                                             {'username': 1, 'full_name': 1})}
+    cards = [(students.get(student_id, {'username': 'N/A'}), attempt) for student_id, attempt in attempts.items()]
+    cards.sort(key=lambda card: card[0].get('username', ''))
+    return cards
+
+def _render_chunk(exam, questions, cards, separate):
+    """Render a chunk of reports (runs in a pool process)
+
+    Returns one PDF with a page per report, or with ``separate`` a list of
+    (student, PDF) pairs.
+    """
+    exporter = get_exporter()
+    if not separate:
+        buffer = io.BytesIO()
+        exporter.export_report_cards(exam, questions, cards, buffer)
+        return buffer.getvalue()
+    pdfs = []
+    for student, attempt in cards:
+        buffer = io.BytesIO()
+        exporter.export_report_cards(exam, questions, [(student, attempt)], buffer)
+        pdfs.append((student, buffer.getvalue()))
+    return pdfs
+
+def _file_name(student):
+    name = student.get('username') or 'hoc_sinh'
+    return re.sub(r'[^\w.-]+', '_', name) + '.pdf'
+
+def render_report_cards(exam, questions, cards, output, file_format='pdf', max_workers=None, on_chunk=None):
+    """Render report cards across the render pool into one merged PDF or a ZIP
+
+    ``on_chunk(count)`` is called as each chunk of reports finishes.
+    """
+    chunks = [cards[i:i + CHUNK_SIZE] for i in range(0, len(cards), CHUNK_SIZE)]
+    separate = file_format == 'zip'
+    pool = get_render_pool(max_workers or os.cpu_count() or 1)
+    results = [None] * len(chunks)
+    try:
+        futures = {pool.submit(_render_chunk, exam, questions, chunk, separate): index
+                   for index, chunk in enumerate(chunks)}
+        for future in as_completed(futures):
+            index = futures[future]
+            results[index] = future.result()
+            if on_chunk:
+                on_chunk(len(chunks[index]))
+    except BrokenProcessPool:
+        reset_render_pool()
+        raise
+
+    if separate:
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+            for pdfs in results:
+                for student, pdf in pdfs:
+                    archive.writestr(_file_name(student), pdf)
+    else:
+        writer = PdfWriter()
+        for pdf in results:
+            for page in PdfReader(io.BytesIO(pdf)).pages:
+                writer.add_page(page)
+        writer.write(output)
+
+def report_cards_key(cache, exam, questions, cards, file_format):
+    """Export cache key of the reports: exam version plus the attempts included"""
+    attempts = hashlib.sha256(','.join(sorted(str(attempt['_id']) for _, attempt in cards)).encode()).hexdigest()
+    return cache.make_key(export_version(exam, questions), report_cards=attempts, format=file_format)
+
+def generate_report_cards_job(db, job_id, config, exam_id, file_format='pdf'):
+    """Background job: render the report cards of an exam into the export cache"""
+    from models.exam import Exam
+    from models.question import Question
+    from models.job import Job
+
+    exam = Exam.find_by_id(db, exam_id)
+    questions = Question.find_by_exam(db, exam['_id'])
+    cards = latest_graded_attempts(db, exam['_id'])
+    if not cards:
+        Job.complete(db, job_id, 'Chưa có bài làm nào được chấm')
+        return
+    Job.start(db, job_id, total=len(cards))
+
+    cache = get_export_cache(config)
+    key = report_cards_key(cache, exam, questions, cards, file_format)
+    suffix = '.zip' if file_format == 'zip' else '.pdf'
+
+    def on_chunk(count):
+        Job.advance(db, job_id, done=count)
+
+    def render(path):
+        render_report_cards(exam, questions, cards, path, file_format,
+                            max_workers=config.get('EXPORT_WORKERS'), on_chunk=on_chunk)
+
+    cache.get_or_render(key, render, suffix=suffix)
+    Job.update(db, job_id, {'progress.done': len(cards), 'result.key': key, 'result.suffix': suffix})
+    Job.complete(db, job_id, f"Đã tạo {len(cards)} phiếu kết quả")
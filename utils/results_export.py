@@ -0,0 +1,99 @@
+from tempfile import SpooledTemporaryFile
+import csv
+import io
+
+HEADER = ['Đề thi', 'Tên đăng nhập', 'Họ và tên', 'Điểm', 'Điểm tối đa', 'Phần trăm', 'Kết quả',
+          'Hình thức', 'Mã đề', 'Thời gian nộp']
+
+ATTEMPT_FIELDS = {'exam_id': 1, 'student_id': 1, 'score': 1, 'max_score': 1, 'percentage': 1, 'passed': 1,
+                  'source': 1, 'variant_code': 1, 'submitted_at': 1}
+
+# Text starting with these is read as a formula by Excel
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def _cell(value):
+    """Escape user-controlled text so spreadsheets show it instead of evaluating it"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def iter_result_rows(db, exam_ids, batch_size=1000):
+    """Yield one row per graded attempt of the exams, in constant memory
+
+    Attempts come from a projected cursor; student names are joined with
+    one $in lookup per batch of attempts instead of one query per row.
+    """
+    titles = {exam['_id']: exam.get('title', '') for exam in db.exams.find({'_id': {'$in': exam_ids}}, {'title': 1})}
+    cursor = db.exam_attempts.find(
+        {'exam_id': {'$in': exam_ids}, 'status': 'graded'}, ATTEMPT_FIELDS
+    ).sort('_id', 1).batch_size(batch_size)
+
+    batch = []
+    for attempt in cursor:
+        batch.append(attempt)
+        if len(batch) >= batch_size:
+            yield from _rows(db, batch, titles)
+            batch = []
+    if batch:
+        yield from _rows(db, batch, titles)
+
+def _rows(db, attempts, titles):
+    student_ids = list({attempt['student_id'] for attempt in attempts})
+    students = {user['_id']: user for user in db.users.find({'_id': {'$in': student_ids}},
+                                                             {'username': 1, 'full_name': 1})}
+    for attempt in attempts:
+        student = students.get(attempt['student_id'], {})
+        submitted_at = attempt.get('submitted_at')
+        yield [
+            _cell(titles.get(attempt['exam_id'], '')),
+            _cell(student.get('username', 'N/A')),
+            _cell(student.get('full_name', '')),
+            attempt.get('score', 0),
+            attempt.get('max_score', 0),
+            attempt.get('percentage', 0),
+            'Đạt' if attempt.get('passed') else 'Không đạt',
+            'Giấy' if attempt.get('source') == 'paper' else 'Trực tuyến',
+            _cell(attempt.get('variant_code', '')),
+            submitted_at.strftime('%d/%m/%Y %H:%M') if submitted_at else ''
+        ]
+
+def iter_csv(rows, flush_rows=500):
+    """Encode rows as UTF-8 CSV chunks (with a BOM so Excel detects the encoding)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(HEADER)
+    # Send the header at once so the download starts before the first batch is read
+    yield buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % flush_rows == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+def write_xlsx(rows, max_memory=4 * 1024 * 1024):
+    """Write rows to an XLSX workbook in write-only mode; returns (fileobj, length)
+
+    An XLSX file is a ZIP that can only be finished once every row is
+    known, so it is built first (rows are not kept in memory, the file
+    spills to disk above max_memory) and then streamed.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Kết quả')
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+
+    output = SpooledTemporaryFile(max_size=max_memory)
+    workbook.save(output)
+    length = output.tell()
+    output.seek(0)
+    return output, length